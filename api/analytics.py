@@ -0,0 +1,103 @@
+from django.db import connections, router
+from . import models
+
+
+def increment(model, key_fields, rows, batch_size=500):
+    """
+    Adds the counter values of each row to the summary row with the same key, creating
+    it when missing, with INSERT ... ON CONFLICT DO UPDATE statements of up to batch_size
+    rows. Rows are dicts keyed by field name; every field that is not part of the key
+    is a counter.
+    """
+    merged = {}
+    for row in rows:
+        key = tuple(row[field] for field in key_fields)
+        if key in merged:
+            for field, value in row.items():
+                if field not in key_fields:
+                    merged[key][field] += value
+        else:
+            merged[key] = dict(row)
+    if not merged:
+        return
+
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    opts = model._meta
+    table = qn(opts.db_table)
+    fields = [opts.get_field(name) for name in next(iter(merged.values()))]
+    columns = [qn(field.column) for field in fields]
+    counters = [qn(field.column) for field in fields if field.name not in key_fields]
+    keys = [qn(opts.get_field(name).column) for name in key_fields]
+
+    placeholders = f'({", ".join(["%s"] * len(fields))})'
+    update = ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in counters)
+
+    rows = list(merged.values())
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = (
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {update}'
+            )
+            params = [field.get_db_prep_save(row[field.name], connection) for row in batch for field in fields]
+            cursor.execute(sql, params)
+
+
+def record_sales(order, order_items, sign=1):
+    increment(models.DailySales, ['date'], [
+        {'date': order.date, 'orders': sign, 'revenue': sign * order.total},
+    ])
+    increment(models.DailyMenuItemSales, ['date', 'menuitem'], [
+        {'date': order.date, 'menuitem': item.menuitem_id, 'quantity': sign * item.quantity, 'revenue': sign * item.price}
+        for item in order_items
+    ])
+
+
+def get_delivery_rows(order, delivery_crew_id, status, sign=1):
+    if status and delivery_crew_id is not None:
+        return [{'date': order.date, 'delivery_crew': delivery_crew_id, 'delivered': sign}]
+    return []
+
+
+def record_delivery(order, delivery_crew_id, status, sign=1):
+    increment(models.DailyDeliveries, ['date', 'delivery_crew'], get_delivery_rows(order, delivery_crew_id, status, sign))
+
+
+def record_order(order, order_items):
+    """
+    Adds a new order to the summaries. Call it in the transaction that creates the order.
+    """
+    record_sales(order, order_items)
+    record_delivery(order, order.delivery_crew_id, order.status)
+
+
+def record_order_update(order, old_delivery_crew_id, old_status):
+    """
+    Moves a delivered order between crew members' counts when its status or delivery
+    crew changed. Call it in the transaction that updates the order.
+    """
+    record_order_updates([(order, old_delivery_crew_id, old_status)])
+
+
+def record_order_updates(updates):
+    """
+    record_order_update() for many (order, old_delivery_crew_id, old_status) tuples,
+    merging their changes into one upsert.
+    """
+    rows = []
+    for order, old_delivery_crew_id, old_status in updates:
+        if (old_delivery_crew_id, old_status) == (order.delivery_crew_id, order.status):
+            continue
+        rows += get_delivery_rows(order, old_delivery_crew_id, old_status, sign=-1)
+        rows += get_delivery_rows(order, order.delivery_crew_id, order.status)
+    increment(models.DailyDeliveries, ['date', 'delivery_crew'], rows)
+
+
+def remove_order(order):
+    """
+    Takes an order out of the summaries. Call it in the transaction that deletes the order.
+    """
+    record_sales(order, order.orderitem_set.all(), sign=-1)
+    record_delivery(order, order.delivery_crew_id, order.status, sign=-1)
@@ -0,0 +1,16 @@
+from django.urls import path
+from . import async_views
+from . import urls
+
+
+app_name = 'api'
+
+# Served under ASGI: the read-heavy and streaming endpoints use async views, everything else the regular views
+urlpatterns = [
+    path('categories/', async_views.CategoriesView.as_view(), name='categories'),
+    path('menu-items/', async_views.MenuItemsView.as_view(), name='menu-items'),
+    path('orders/', async_views.OrderView.as_view(), name='order-list-create'),
+    path('orders/export/', async_views.OrderExportView.as_view(), name='order-export'),
+    path('orders/events/', async_views.OrderEventsView.as_view(), name='order-events'),
+    path('orders/<int:pk>/', async_views.OrderDetailView.as_view(), name='order-detail'),
+] + urls.urlpatterns
@@ -0,0 +1,99 @@
+import heapq
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models import Count, Q
+from . import events
+from . import models
+from . import roles
+
+
+def bulk_update_delivery_crew(orders):
+    """
+    Saves the delivery crew of the orders with one UPDATE ... FROM (VALUES ...) statement.
+    QuerySet.bulk_update() builds a CASE with a WHEN per order, which costs more to
+    compile and to run than the update itself for batches of this size.
+    """
+    if not orders:
+        return
+
+    connection = connections[router.db_for_write(models.Order)]
+    qn = connection.ops.quote_name
+    opts = models.Order._meta
+    table = qn(opts.db_table)
+    pk = qn(opts.pk.column)
+    delivery_crew = qn(opts.get_field('delivery_crew').column)
+
+    values = ', '.join(['(%s, %s)'] * len(orders))
+    params = [value for order in orders for value in (order.pk, order.delivery_crew_id)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {delivery_crew} = assignment.column2 FROM (VALUES {values}) AS assignment '
+            f'WHERE {table}.{pk} = assignment.column1',
+            params,
+        )
+
+
+class CrewAssigner:
+    """
+    Hands unassigned open orders to the active delivery crew member with the fewest
+    open orders. The loads are read into a min-heap of (open orders, user id) with one
+    aggregate query per run, and updated in memory as orders are assigned, so a batch
+    costs one select and one update no matter how many crew members there are.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.heap = []
+
+    def rebuild(self):
+        # Orders point to their crew member with related_name='delivery_crew'
+        self.heap = list(
+            User.objects.filter(groups__name=roles.DELIVERY_CREW, is_active=True).annotate(
+                open_orders=Count('delivery_crew', filter=Q(delivery_crew__status=False))
+            ).values_list('open_orders', 'id')
+        )
+        heapq.heapify(self.heap)
+
+    def loads(self):
+        return {user_id: open_orders for open_orders, user_id in self.heap}
+
+    def assign(self, limit=None):
+        """
+        Assigns up to `limit` unassigned open orders (all of them by default), oldest
+        first, and returns how many were assigned.
+        """
+        self.rebuild()
+        if not self.heap:
+            return 0
+
+        assigned = 0
+        while limit is None or assigned < limit:
+            batch_size = self.batch_size if limit is None else min(self.batch_size, limit - assigned)
+            count = self.assign_batch(batch_size)
+            assigned += count
+            if count < batch_size:
+                break
+        return assigned
+
+    @transaction.atomic
+    def assign_batch(self, batch_size):
+        orders = list(
+            models.Order.objects.select_for_update().filter(delivery_crew__isnull=True, status=False).order_by(
+                'id'
+            ).only('id', 'delivery_crew', 'status')[:batch_size]
+        )
+        for order in orders:
+            open_orders, user_id = self.heap[0]
+            order.delivery_crew_id = user_id
+            heapq.heapreplace(self.heap, (open_orders + 1, user_id))
+
+        # Open orders are not counted in the delivery summaries, so only the crew is told
+        bulk_update_delivery_crew(orders)
+        transaction.on_commit(lambda: self.publish(orders))
+        return len(orders)
+
+    def publish(self, orders):
+        # One transaction for the whole batch, with backends that store the events
+        with transaction.atomic():
+            for order in orders:
+                events.publish_order_update(order, None, order.status)
@@ -0,0 +1,348 @@
+import asyncio
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db import NotSupportedError
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework import status
+from . import events
+from . import renderers
+from . import roles
+from . import views
+from .caching import MenuCacheMixin, aget_menu_version
+from .fast_serializers import ValuesListMixin
+from .request_stats import span
+from .routers import RoutingState, ReplicaReadMixin, ais_pinned, apin, current_state, get_user_scope
+
+
+async def aprefetch_related(instances, lookups):
+    """
+    Async replacement for prefetch_related(), which QuerySet.aiterator() does not support.
+    Only reverse foreign key lookups (e.g. 'orderitem_set') are handled.
+    """
+    if not instances:
+        return
+
+    model = type(instances[0])
+    for lookup in lookups:
+        if not isinstance(lookup, Prefetch):
+            lookup = Prefetch(lookup)
+        if '__' in lookup.prefetch_through:
+            raise NotSupportedError(f'Nested prefetch lookups are not supported: {lookup.prefetch_through}')
+
+        field = getattr(model, lookup.prefetch_through).field
+        queryset = lookup.queryset if lookup.queryset is not None else field.model._default_manager.all()
+
+        related = defaultdict(list)
+        queryset = queryset.filter(**{f'{field.name}__in': [instance.pk for instance in instances]})
+        async for obj in queryset.aiterator():
+            related[getattr(obj, field.attname)].append(obj)
+
+        for instance in instances:
+            related_objects = related[instance.pk]
+            for obj in related_objects:
+                field.set_cached_value(obj, instance)
+            if not hasattr(instance, '_prefetched_objects_cache'):
+                instance._prefetched_objects_cache = {}
+            instance._prefetched_objects_cache[lookup.prefetch_to] = related_objects
+
+
+async def afetch(queryset):
+    lookups = queryset._prefetch_related_lookups
+    instances = [obj async for obj in queryset.prefetch_related(None).aiterator()]
+    await aprefetch_related(instances, lookups)
+    return instances
+
+
+async def afetch_chunks(queryset, chunk_size):
+    """
+    Yields the instances of the queryset in lists of up to `chunk_size`, with their
+    prefetches, like QuerySet.iterator(chunk_size) does with prefetch_related().
+    """
+    lookups = queryset._prefetch_related_lookups
+    chunk = []
+    async for obj in queryset.prefetch_related(None).aiterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            await aprefetch_related(chunk, lookups)
+            yield chunk
+            chunk = []
+    if chunk:
+        await aprefetch_related(chunk, lookups)
+        yield chunk
+
+
+class AsyncReadView:
+    """
+    Serves GET requests for a DRF generic view natively under ASGI.
+
+    The DRF view is reused for content negotiation, permissions, querysets, serializers
+    and rendering, which need no I/O once the user and their roles are loaded. Only the
+    authentication, throttling and database reads are awaited. Other methods, and
+    requests the async path does not cover (browsable API, cursor pagination), are
+    handed to the synchronous view. Subclasses serve the request in the coroutine
+    `get(view, request, *args, **kwargs)`.
+    """
+    sync_view_class = None
+
+    @classmethod
+    def as_view(cls):
+        sync_view = cls.sync_view_class.as_view()
+
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET' or not cls.is_supported(request):
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            return await cls().dispatch(request, *args, **kwargs)
+
+        view.csrf_exempt = True
+        view.view_class = cls
+        return view
+
+    @classmethod
+    def is_supported(cls, request):
+        if 'format' in request.GET or 'cursor' in request.GET:
+            return False
+        return 'text/html' not in request.headers.get('Accept', '')
+
+    async def dispatch(self, request, *args, **kwargs):
+        view = self.sync_view_class()
+        view.setup(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        request = view.initialize_request(request, *args, **kwargs)
+        view.request = request
+
+        # Database routing as in ReplicaReadMixin.dispatch()
+        state = RoutingState()
+        token = current_state.set(state)
+        try:
+            await self.authenticate(request)
+            await self.initial(view, request, *args, **kwargs)
+            response = await self.get(view, request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        finally:
+            current_state.reset(token)
+
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            await apin(get_user_scope(user.pk))
+
+        response = view.finalize_response(request, response, *args, **kwargs)
+        return response.render() if isinstance(response, Response) else response
+
+    async def authenticate(self, request):
+        for authenticator in request.authenticators:
+            if hasattr(authenticator, 'aauthenticate'):
+                user_auth_tuple = await authenticator.aauthenticate(request)
+            else:
+                user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                break
+        else:
+            request._authenticator = None
+            request._not_authenticated()
+
+        # Load the roles now, so the synchronous role checks below need no I/O
+        await roles.aget_group_names(request.user)
+
+    async def initial(self, view, request, *args, **kwargs):
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+
+        neg = view.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = view.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        view.check_permissions(request)
+        if view.get_throttles():
+            await sync_to_async(view.check_throttles)(request)
+
+        if isinstance(view, ReplicaReadMixin) and view.can_read_replica(request):
+            scopes = view.get_replica_pin_scopes(request)
+            current_state.get().replica = not (scopes and await ais_pinned(*scopes))
+
+
+class AsyncListView(AsyncReadView):
+    async def get(self, view, request, *args, **kwargs):
+        if isinstance(view, MenuCacheMixin):
+            return await self.cached_list(view, request)
+        return await self.list(view, request)
+
+    async def list(self, view, request):
+        if isinstance(view, ValuesListMixin):
+            return await self.values_list(view, request)
+
+        queryset = view.filter_queryset(view.get_queryset())
+
+        page = await self.paginate_queryset(view, queryset)
+        if page is not None:
+            serializer = view.get_serializer(page, many=True)
+            return view.get_paginated_response(serializer.data)
+
+        serializer = view.get_serializer(await afetch(queryset), many=True)
+        return Response(serializer.data)
+
+    async def values_list(self, view, request):
+        values_serializer = view.get_values_serializer()
+        queryset = values_serializer.values(view.filter_queryset(view.get_queryset()))
+
+        page = await self.paginate_queryset(view, queryset)
+        if page is not None:
+            with span('serialize'):
+                data = await values_serializer.ato_representation(page)
+            return view.get_paginated_response(data)
+
+        rows = await afetch(queryset)
+        with span('serialize'):
+            data = await values_serializer.ato_representation(rows)
+        return Response(data)
+
+    async def cached_list(self, view, request):
+        version = await aget_menu_version()
+        etag = view.get_etag(request, version, request.accepted_renderer.format)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if view.is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = view.get_cache_key(request, version)
+        data = await cache.aget(key)
+        if data is None:
+            data = (await self.list(view, request)).data
+            await cache.aset(key, data, timeout=view.get_cache_timeout())
+
+        return Response(data, headers=headers)
+
+    async def paginate_queryset(self, view, queryset):
+        # Mirrors PageNumberPagination.paginate_queryset() with async count and fetch
+        paginator = view.paginator
+        if paginator is None:
+            return None
+
+        request = view.request
+        page_size = paginator.get_page_size(request)
+        if not page_size:
+            return None
+
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        django_paginator.count = await queryset.acount()
+        page_number = paginator.get_page_number(request, django_paginator)
+
+        try:
+            page = django_paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = paginator.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        page.object_list = await afetch(page.object_list)
+        paginator.page = page
+        paginator.request = request
+        if django_paginator.num_pages > 1 and paginator.template is not None:
+            paginator.display_page_controls = True
+        return page.object_list
+
+
+class AsyncRetrieveView(AsyncReadView):
+    async def get(self, view, request, *args, **kwargs):
+        queryset = view.filter_queryset(view.get_queryset())
+
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        filter_kwargs = {view.lookup_field: view.kwargs[lookup_url_kwarg]}
+        instances = await afetch(queryset.filter(**filter_kwargs)[:1])
+        if not instances:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        instance = instances[0]
+
+        view.check_object_permissions(request, instance)
+        serializer = view.get_serializer(instance)
+        return Response(serializer.data)
+
+
+class CategoriesView(AsyncListView):
+    sync_view_class = views.CategoriesView
+
+
+class MenuItemsView(AsyncListView):
+    sync_view_class = views.MenuItemsView
+
+
+class OrderView(AsyncListView):
+    sync_view_class = views.OrderView
+
+
+class OrderDetailView(AsyncRetrieveView):
+    sync_view_class = views.OrderDetailView
+
+
+class OrderExportView(AsyncReadView):
+    """
+    Streams the order export from an async generator, one chunk of orders at a time.
+    The ASGI handler reads a synchronous iterator to the end before sending anything,
+    which would hold the whole export in memory.
+    """
+    sync_view_class = views.OrderExportView
+
+    @classmethod
+    def is_supported(cls, request):
+        # The export has no browsable API, and selects its renderer with ?format=
+        return True
+
+    async def get(self, view, request, *args, **kwargs):
+        queryset = view.filter_queryset(view.get_queryset())
+        return view.get_streaming_response(self.stream(view, queryset))
+
+    async def stream(self, view, queryset):
+        if header := ''.join(view.get_header_rows()):
+            yield header
+        async for orders in afetch_chunks(queryset, view.chunk_size):
+            yield ''.join(view.get_order_rows(orders))
+
+
+class OrderEventsView(AsyncReadView):
+    """
+    Serves delivery crew events as a Server-Sent Events stream when the client accepts
+    text/event-stream, and long-polls otherwise. Open connections wait on their own
+    queue, fed by the process-wide notifier, and use no thread or database connection.
+    Streams end after `stream_timeout` seconds; EventSource clients reconnect and resume
+    from the Last-Event-ID they send.
+    """
+    sync_view_class = views.OrderEventsView
+    heartbeat = 15
+    stream_timeout = 5 * 60
+    retry = 3000  # ms
+
+    async def get(self, view, request, *args, **kwargs):
+        wait, after = view.get_query()
+        if request.accepted_renderer.format != renderers.EventStreamRenderer.format:
+            async with events.AsyncSubscription(request.user.pk, after) as subscription:
+                messages = await subscription.wait(wait)
+            return view.get_response(messages, after)
+
+        response = StreamingHttpResponse(
+            self.stream(request.user.pk, after),
+            content_type=f'{renderers.EventStreamRenderer.media_type}; charset={renderers.EventStreamRenderer.charset}',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+        return response
+
+    async def stream(self, user_id, after):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.stream_timeout
+        # Subscribe before sending anything, so no event is missed between chunks
+        async with events.AsyncSubscription(user_id, after) as subscription:
+            yield f'retry: {self.retry}\n\n'
+            while (remaining := deadline - loop.time()) > 0:
+                messages = await subscription.wait(min(self.heartbeat, remaining))
+                if not messages:
+                    yield ': keep-alive\n\n'
+                for message in messages:
+                    yield renderers.EventStreamRenderer.format_event(message['type'], message['data'], message['id'])
@@ -0,0 +1,137 @@
+import hashlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import DEFERRED
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from . import roles
+from .caching import is_shared_cache
+from .request_stats import span
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """
+    Token authentication that can also authenticate requests served by async views.
+    """
+
+    def get_key(self, request):
+        auth = authentication.get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. Token string should not contain spaces.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. Token string should not contain invalid characters.')
+            raise exceptions.AuthenticationFailed(msg)
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        with span('auth'):
+            return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        with span('auth'):
+            return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+
+def from_fields(model, **values):
+    # An instance as loaded from the database with only these fields; the others are
+    # deferred, and loaded when first read
+    fields = model._meta.concrete_fields
+    return model.from_db(
+        None, [field.attname for field in fields], [values.get(field.attname, DEFERRED) for field in fields]
+    )
+
+
+def get_cache_key(key):
+    # Hashed, so tokens do not show up in the cache backend
+    return f'auth_token_{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def get_cache_timeout():
+    return getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+
+
+def invalidate_tokens(*keys):
+    cache.delete_many([get_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(*user_ids):
+    invalidate_tokens(*Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that keeps the token's user id, flags and group names in the
+    cache for AUTH_TOKEN_CACHE_TIMEOUT seconds, so authenticated requests usually need
+    no query before the view runs. Entries are dropped when the token is deleted (e.g.
+    on logout), the user is saved or deleted, or their groups change (see signals).
+
+    The user is rebuilt with only these fields loaded; the others are loaded from the
+    database when first read. Tokens are only cached when the cache is shared by all
+    worker processes. With a per-process cache, other workers would keep accepting a
+    revoked token.
+    """
+    user_fields = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+    def authenticate_credentials(self, key):
+        if not is_shared_cache():
+            return super().authenticate_credentials(key)
+        cache_key = get_cache_key(key)
+        entry = cache.get(cache_key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            entry = self.get_entry(user, roles.get_group_names(user))
+            cache.set(cache_key, entry, timeout=get_cache_timeout())
+        return self.get_credentials(key, entry)
+
+    async def aauthenticate_credentials(self, key):
+        if not is_shared_cache():
+            return await super().aauthenticate_credentials(key)
+        cache_key = get_cache_key(key)
+        entry = await cache.aget(cache_key)
+        if entry is None:
+            user, token = await super().aauthenticate_credentials(key)
+            entry = self.get_entry(user, await roles.aget_group_names(user))
+            await cache.aset(cache_key, entry, timeout=get_cache_timeout())
+        return self.get_credentials(key, entry)
+
+    def get_entry(self, user, group_names):
+        return (tuple(getattr(user, name) for name in self.user_fields), group_names)
+
+    def get_credentials(self, key, entry):
+        values, group_names = entry
+        user = from_fields(get_user_model(), **dict(zip(self.user_fields, values)))
+        user._group_names = group_names
+        token = from_fields(self.get_model(), key=key, user_id=user.pk)
+        token.user = user
+        return (user, token)
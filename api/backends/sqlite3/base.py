@@ -0,0 +1,13 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend whose transactions take the write lock when they begin. A deferred
+    transaction that reads and then writes fails at once with "database is locked" if
+    another connection wrote in between, whatever the busy timeout. (Django 5.1 adds
+    OPTIONS['transaction_mode'] for this.)
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,92 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from . import routers
+
+
+MENU_VERSION_KEY = 'menu_version'
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Whether the cache is shared by all worker processes. LocMemCache and DummyCache
+    are not: entries set or deleted in one process are not seen by the others.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def get_menu_version():
+    # Seed the counter with the current time, so an evicted counter never reuses an old version
+    cache.add(MENU_VERSION_KEY, int(time.time() * 1000), timeout=None)
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        return bump_menu_version()
+    return version
+
+
+async def aget_menu_version():
+    await cache.aadd(MENU_VERSION_KEY, int(time.time() * 1000), timeout=None)
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        await cache.aset(MENU_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def bump_menu_version():
+    # Until the write has reached the replica, menu reads would cache stale data under the new version
+    routers.pin('menu')
+    try:
+        return cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(MENU_VERSION_KEY, version, timeout=None)
+        return version
+
+
+class MenuCacheMixin:
+    """
+    Caches list responses per URL under the current menu version, and answers
+    If-None-Match requests with 304 Not Modified without touching the database.
+    """
+    cache_prefix = 'menu'
+
+    def get_cache_timeout(self):
+        return getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60)
+
+    def get_cache_key(self, request, version):
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return f'{self.cache_prefix}_{version}_{url_hash}'
+
+    def get_etag(self, request, version, format):
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return f'"{self.cache_prefix}-{version}-{url_hash}-{format}"'
+
+    def is_not_modified(self, request, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        etags = parse_etags(if_none_match)
+        return etag in etags or '*' in etags
+
+    def list(self, request, *args, **kwargs):
+        version = get_menu_version()
+        etag = self.get_etag(request, version, request.accepted_renderer.format)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if self.is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = self.get_cache_key(request, version)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, timeout=self.get_cache_timeout())
+
+        return Response(data, headers=headers)
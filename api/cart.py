@@ -0,0 +1,52 @@
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+from . import models
+from . import serializers
+from .caching import get_menu_version, is_shared_cache
+
+
+def get_cache_keys(user_id, version):
+    # Keyed by menu version too: menu changes rename items and can delete cart rows
+    return {
+        False: f'cart_summary_{user_id}_{version}',
+        True: f'cart_summary_items_{user_id}_{version}',
+    }
+
+
+def get_cart_summary(user, include_items=False):
+    """
+    Returns the number of lines, the total quantity and the subtotal of the user's
+    cart, and with include_items its lines. Kept in the cache until the cart changes,
+    if the cache is shared by all worker processes.
+    """
+    # With a per-process cache, a change made through one worker would leave the
+    # summary cached by the others stale
+    if not is_shared_cache():
+        return summarize_cart(user, include_items)
+
+    key = get_cache_keys(user.pk, get_menu_version())[include_items]
+    data = cache.get(key)
+    if data is None:
+        data = summarize_cart(user, include_items)
+        cache.set(key, data, timeout=getattr(settings, 'CART_SUMMARY_CACHE_TIMEOUT', 5 * 60))
+    return data
+
+
+def summarize_cart(user, include_items):
+    carts = models.Cart.objects.filter(user=user)
+    summary = carts.aggregate(
+        lines=Count('id'),
+        quantity=Coalesce(Sum('quantity'), 0),
+        subtotal=Coalesce(Sum('price'), Value(Decimal('0.00'))),
+    )
+    if include_items:
+        summary['items'] = carts.select_related('menuitem').order_by('id')
+    return serializers.CartSummarySerializer(summary).data
+
+
+def invalidate_cart_summary(user_id):
+    if is_shared_cache():
+        cache.delete_many(get_cache_keys(user_id, get_menu_version()).values())
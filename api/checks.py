@@ -0,0 +1,21 @@
+from django.core.checks import Tags, Warning, register
+from .caching import is_shared_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared_cache():
+        return []
+    return [
+        Warning(
+            'The default cache is local to each process.',
+            hint=(
+                'With more than one worker process, a menu change only invalidates the menu cache '
+                'of the process that made it, and the others keep serving the old menu for up to '
+                'MENU_CACHE_TIMEOUT. Tokens, roles and cart summaries are not cached across requests, '
+                'and replica pins only keep the reads of the writing process on the primary. Set '
+                'REDIS_URL, or configure another shared CACHES backend.'
+            ),
+            id='api.W001',
+        )
+    ]
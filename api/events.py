@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import timedelta
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryPubSub:
+    """
+    Delivers published messages to the listeners of the current process. Enough when
+    one process both saves the orders and serves the connections, and in tests.
+    """
+
+    def __init__(self):
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def publish(self, message):
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(message)
+
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            self.listeners.remove(listener)
+
+
+class DatabasePubSub:
+    """
+    Delivers published messages to the listeners of every process, through the
+    DeliveryEvent table, so it needs no broker. Messages are delivered to the listeners
+    of the publishing process once the transaction commits. The other processes poll
+    the table every `poll_interval` seconds, from a thread started by the first
+    subscription, with a query that finds nothing most of the time. Messages older
+    than `retention` seconds are deleted.
+
+    With poll_interval None no thread is started, and poll() must be called directly.
+    """
+    prune_interval = 60
+
+    def __init__(self, poll_interval=1.0, retention=60 * 60):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.source = uuid.uuid4().hex
+        self.local = InMemoryPubSub()
+        self.started = timezone.now()
+        self.last_id = None
+        self.pruned = time.monotonic()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def publish(self, message):
+        models.DeliveryEvent.objects.create(source=self.source, message=message)
+        transaction.on_commit(lambda: self.local.publish(message))
+
+    def subscribe(self, listener):
+        self.local.subscribe(listener)
+        self.start()
+
+    def unsubscribe(self, listener):
+        self.local.unsubscribe(listener)
+
+    def start(self):
+        if self.poll_interval is None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='delivery-events', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception('Could not read the delivery events.')
+            finally:
+                # Like a request, drop the connection if it is past CONN_MAX_AGE or broken
+                close_old_connections()
+
+    def poll(self):
+        """
+        Delivers the messages other processes published since the last poll.
+        """
+        rows = models.DeliveryEvent.objects.order_by('id')
+        if self.last_id is None:
+            # Only what was published once this process was listening
+            rows = rows.filter(created__gte=self.started)
+        else:
+            rows = rows.filter(id__gt=self.last_id)
+
+        for id, source, message in rows.values_list('id', 'source', 'message'):
+            self.last_id = id
+            if source != self.source:
+                self.local.publish(message)
+
+        if time.monotonic() - self.pruned >= self.prune_interval:
+            self.prune()
+
+    def prune(self):
+        self.pruned = time.monotonic()
+        models.DeliveryEvent.objects.filter(created__lt=timezone.now() - timedelta(seconds=self.retention)).delete()
+
+
+class Notifier:
+    """
+    Fans delivery events out to the open connections of the current process. It listens
+    to the pub/sub backend once, and calls the callback of every connection of the user
+    an event is for, so an idle connection costs a dictionary entry and a queue. The last
+    `backlog` events of each user are kept, so clients can resume after a reconnect.
+    """
+
+    def __init__(self, pubsub, backlog=50):
+        self.pubsub = pubsub
+        self.subscribers = defaultdict(set)
+        self.recent = defaultdict(lambda: deque(maxlen=backlog))
+        self.lock = threading.Lock()
+        self.last_id = 0
+        pubsub.subscribe(self.dispatch)
+
+    def next_id(self):
+        # Microsecond timestamps, so ids keep increasing across restarts and processes
+        with self.lock:
+            self.last_id = max(self.last_id + 1, time.time_ns() // 1000)
+            return self.last_id
+
+    def publish(self, user_id, type, data):
+        self.pubsub.publish({'id': self.next_id(), 'user_id': user_id, 'type': type, 'data': data})
+
+    def dispatch(self, message):
+        with self.lock:
+            self.recent[message['user_id']].append(message)
+            callbacks = list(self.subscribers.get(message['user_id'], ()))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, user_id, callback, after=None):
+        """
+        Calls `callback` with every later event for the user, and returns the kept
+        events with an id greater than `after`.
+        """
+        with self.lock:
+            self.subscribers[user_id].add(callback)
+            if after is None:
+                return []
+            return [message for message in self.recent.get(user_id, ()) if message['id'] > after]
+
+    def unsubscribe(self, user_id, callback):
+        with self.lock:
+            callbacks = self.subscribers.get(user_id)
+            if callbacks is not None:
+                callbacks.discard(callback)
+                if not callbacks:
+                    del self.subscribers[user_id]
+
+
+class Subscription:
+    """
+    Blocking subscription to a user's events, for long-polling from a worker thread.
+    """
+
+    def __init__(self, user_id, after=None, notifier=None):
+        self.user_id = user_id
+        self.after = after
+        self.notifier = notifier or get_notifier()
+        self.queue = queue.SimpleQueue()
+
+    def __enter__(self):
+        for message in self.notifier.subscribe(self.user_id, self.queue.put, self.after):
+            self.queue.put(message)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.notifier.unsubscribe(self.user_id, self.queue.put)
+
+    def wait(self, timeout):
+        """
+        Returns the pending events, waiting up to `timeout` seconds for the first one.
+        """
+        try:
+            messages = [self.queue.get(timeout=timeout)] if timeout > 0 else []
+        except queue.Empty:
+            return []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return messages
+
+
+class AsyncSubscription:
+    """
+    Subscription to a user's events for async views. Events published from other
+    threads are handed to the event loop of the connection.
+    """
+
+    def __init__(self, user_id, after=None, notifier=None):
+        self.user_id = user_id
+        self.after = after
+        self.notifier = notifier or get_notifier()
+        self.queue = asyncio.Queue()
+
+    def put(self, message):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        for message in self.notifier.subscribe(self.user_id, self.put, self.after):
+            self.queue.put_nowait(message)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.notifier.unsubscribe(self.user_id, self.put)
+
+    async def wait(self, timeout):
+        try:
+            messages = [await asyncio.wait_for(self.queue.get(), timeout)] if timeout > 0 else []
+        except asyncio.TimeoutError:
+            return []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return messages
+
+
+def publish_order_update(order, old_delivery_crew_id, old_status):
+    """
+    Tells delivery crew about an order assigned to or taken from them, and about status
+    changes of their orders. Call it once the update is committed.
+    """
+    notifier = get_notifier()
+    data = {'order': order.pk, 'status': order.status}
+    if order.delivery_crew_id != old_delivery_crew_id:
+        if old_delivery_crew_id is not None:
+            notifier.publish(old_delivery_crew_id, 'order.unassigned', data)
+        if order.delivery_crew_id is not None:
+            notifier.publish(order.delivery_crew_id, 'order.assigned', data)
+    elif order.status != old_status and order.delivery_crew_id is not None:
+        notifier.publish(order.delivery_crew_id, 'order.status', data)
+
+
+def serialize_event(message):
+    return {'id': message['id'], 'type': message['type'], 'data': message['data']}
+
+
+_notifier = None
+
+
+def get_notifier():
+    """
+    Returns the notifier for the pub/sub backend configured by DELIVERY_EVENTS, created
+    once per process.
+    """
+    global _notifier
+    if _notifier is None:
+        config = getattr(settings, 'DELIVERY_EVENTS', {})
+        backend = import_string(config.get('BACKEND', 'api.events.InMemoryPubSub'))
+        _notifier = Notifier(backend(**config.get('OPTIONS', {})), backlog=config.get('BACKLOG', 50))
+    return _notifier
+
+
+@receiver(setting_changed)
+def reset_notifier(setting, **kwargs):
+    global _notifier
+    if setting == 'DELIVERY_EVENTS':
+        _notifier = None
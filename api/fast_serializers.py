@@ -0,0 +1,268 @@
+from collections import defaultdict
+from rest_framework import serializers as drf_serializers
+from rest_framework.response import Response
+from . import serializers
+from .fieldsets import Fieldset
+from .request_stats import span
+
+
+# Fields whose representation of a values() column is the column value itself. Related
+# fields are mapped to the column that already holds their representation (a pk or title).
+PASSTHROUGH_FIELDS = (
+    drf_serializers.CharField,
+    drf_serializers.IntegerField,
+    drf_serializers.BooleanField,
+    drf_serializers.RelatedField,
+)
+
+
+class Many:
+    """
+    A nested list of related rows, fetched with one extra query for the whole page.
+    """
+    def __init__(self, values_serializer_class, related_field, ordering=('id',)):
+        self.values_serializer = values_serializer_class()
+        self.related_field = related_field
+        self.ordering = ordering
+
+
+class ValuesSerializer:
+    """
+    Read-only list serialization straight from QuerySet.values(), producing the same
+    data as serializer_class(many=True) without building model instances or running
+    DRF fields per row.
+
+    `fields` maps every readable field of serializer_class, in order, to a values()
+    lookup, a dict for a nested serializer, or Many() for a nested list. Values are
+    converted with the serializer's own fields where the representation differs from
+    the column value (decimals, dates). `compact_fields` maps the expandable fields of a
+    SparseFieldsMixin serializer to the lookup for their compact form.
+    """
+    serializer_class = None
+    fields = {}
+    compact_fields = {}
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        # The mapping only depends on the class, so it is built once
+        if cls.__dict__.get('_instance') is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, fields=None, serializer=None):
+        if fields is not None:
+            self.fields = fields
+        if serializer is None:
+            serializer = self.serializer_class()
+        self.columns = []
+        self.related = {}
+        self.restricted = {}
+        self.mapping = self.build_mapping(self.fields, serializer.fields)
+
+    def restrict(self, fieldset):
+        """
+        Returns the serializer for the fields and expansions of `fieldset`, which only
+        selects their columns and only runs the Many() queries of expanded relations.
+        """
+        if fieldset.is_default():
+            return self
+        if fieldset.key not in self.restricted:
+            # The serializer drops the same fields, and rejects unknown ones
+            serializer = self.serializer_class()
+            serializer.apply_fieldset(fieldset)
+            fields = {
+                name: lookup if fieldset.expands(name) else self.compact_fields.get(name, lookup)
+                for name, lookup in self.fields.items() if name in serializer.fields
+            }
+            self.restricted[fieldset.key] = type(self)(fields, serializer)
+        return self.restricted[fieldset.key]
+
+    def narrow(self, queryset):
+        """
+        Limits a model queryset to the columns, joins and prefetches the mapping reads,
+        for serializing instances with the matching serializer_class.
+        """
+        relations = {column.rsplit('__', 1)[0] for column in self.columns if '__' in column}
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        if not self.related:
+            queryset = queryset.prefetch_related(None)
+        return queryset.only(*self.columns, *relations)
+
+    def build_mapping(self, fields, serializer_fields):
+        readable = [name for name, field in serializer_fields.items() if not field.write_only]
+        assert list(fields) == readable, (
+            f'{type(self).__name__}.fields must map {readable}, in order, got {list(fields)}.'
+        )
+
+        mapping = []
+        for name, lookup in fields.items():
+            field = serializer_fields[name]
+            if isinstance(lookup, Many):
+                self.related[name] = lookup
+                mapping.append((name, lookup, None))
+            elif isinstance(lookup, dict):
+                mapping.append((name, self.build_mapping(lookup, field.fields), None))
+            else:
+                self.columns.append(lookup)
+                convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+                mapping.append((name, lookup, convert))
+        return mapping
+
+    def values(self, queryset, *extra):
+        columns = [*self.columns, *extra]
+        # Many() and keyset pagination need the id, even when it is not a requested field
+        if 'id' not in columns:
+            columns.append('id')
+        # Related rows are joined in by the lookups, or fetched by Many()
+        return queryset.prefetch_related(None).values(*columns)
+
+    def get_related_rows(self, many, ids):
+        serializer = many.values_serializer
+        queryset = serializer.serializer_class.Meta.model._default_manager.filter(
+            **{f'{many.related_field}__in': ids}
+        ).order_by(*many.ordering)
+        return serializer.values(queryset, many.related_field)
+
+    def group_related(self, many, related_rows):
+        grouped = defaultdict(list)
+        data = many.values_serializer.to_representation(related_rows)
+        for row, item in zip(related_rows, data):
+            grouped[row[many.related_field]].append(item)
+        return grouped
+
+    def to_representation(self, rows):
+        related = {}
+        if self.related:
+            ids = [row['id'] for row in rows]
+            related = {
+                name: self.group_related(many, list(self.get_related_rows(many, ids)))
+                for name, many in self.related.items()
+            }
+        return [self.represent_row(row, self.mapping, related) for row in rows]
+
+    async def ato_representation(self, rows):
+        related = {}
+        if self.related:
+            ids = [row['id'] for row in rows]
+            related = {
+                name: self.group_related(many, [row async for row in self.get_related_rows(many, ids)])
+                for name, many in self.related.items()
+            }
+        return [self.represent_row(row, self.mapping, related) for row in rows]
+
+    def represent_row(self, row, mapping, related):
+        data = {}
+        for name, lookup, convert in mapping:
+            if isinstance(lookup, Many):
+                data[name] = related[name].get(row['id'], [])
+            elif isinstance(lookup, list):
+                data[name] = self.represent_row(row, lookup, related)
+            else:
+                value = row[lookup]
+                data[name] = convert(value) if convert is not None and value is not None else value
+        return data
+
+
+class ValuesListMixin:
+    """
+    Serves list requests through values_serializer_class instead of the view's
+    serializer. Filtering, ordering and pagination work on the values() queryset.
+    """
+    values_serializer_class = None
+
+    def get_values_serializer(self):
+        return self.values_serializer_class.get_instance().restrict(Fieldset.from_request(self.request))
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.get_values_serializer()
+        queryset = values_serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            with span('serialize'):
+                data = values_serializer.to_representation(page)
+            return self.get_paginated_response(data)
+
+        with span('serialize'):
+            data = values_serializer.to_representation(queryset)
+        return Response(data)
+
+
+class FieldsetQuerysetMixin:
+    """
+    Narrows get_queryset() to what the requested fieldset serializes, using the
+    columns of values_serializer_class. For views that serialize model instances.
+    """
+    values_serializer_class = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = Fieldset.from_request(self.request)
+        if fieldset.is_default():
+            return queryset
+        return self.values_serializer_class.get_instance().restrict(fieldset).narrow(queryset)
+
+
+class CategoryValuesSerializer(ValuesSerializer):
+    serializer_class = serializers.CategorySerializer
+    fields = {
+        'id': 'id',
+        'title': 'title',
+    }
+
+
+class MenuItemValuesSerializer(ValuesSerializer):
+    serializer_class = serializers.MenuItemSerializer
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'price': 'price',
+        'category': {
+            'id': 'category__id',
+            'title': 'category__title',
+        },
+        'featured': 'featured',
+    }
+    compact_fields = {
+        'category': 'category',
+    }
+
+
+class CartValuesSerializer(ValuesSerializer):
+    serializer_class = serializers.CartSerializer
+    fields = {
+        'id': 'id',
+        'user': 'user',
+        'menuitem': 'menuitem__title',
+        'quantity': 'quantity',
+        'unit_price': 'menuitem__price',
+        'price': 'price',
+    }
+
+
+class OrderItemValuesSerializer(ValuesSerializer):
+    serializer_class = serializers.OrderItemSerializer
+    fields = {
+        'id': 'id',
+        'menuitem': 'menuitem__title',
+        'quantity': 'quantity',
+        'unit_price': 'unit_price',
+        'price': 'price',
+    }
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    serializer_class = serializers.OrderSerializer
+    fields = {
+        'id': 'id',
+        'user': 'user__username',
+        'delivery_crew': 'delivery_crew__username',
+        'order_items': Many(OrderItemValuesSerializer, 'order'),
+        'status': 'status',
+        'total': 'total',
+        'date': 'date',
+    }
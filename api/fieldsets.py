@@ -0,0 +1,77 @@
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    return tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+
+class Fieldset:
+    """
+    The fields (?fields=id,status) and nested relations (?expand=order_items) a read
+    request asks for. None stands for all of them, which is what requests without the
+    parameters, and all writes, get.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return cls()
+        params = request.query_params
+        return cls(
+            fields=frozenset(parse_names(params['fields'])) if 'fields' in params else None,
+            expand=frozenset(parse_names(params['expand'])) if 'expand' in params else None,
+        )
+
+    @property
+    def key(self):
+        return self.fields, self.expand
+
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return self.expand is None or name in self.expand
+
+    def validate(self, readable, expandable):
+        errors = {}
+        if self.fields is not None and (unknown := sorted(self.fields - set(readable))):
+            errors['fields'] = [f'Unknown fields: {", ".join(unknown)}. Choose from {", ".join(readable)}.']
+        if self.expand is not None and (unknown := sorted(self.expand - set(expandable))):
+            errors['expand'] = [f'Unknown relations: {", ".join(unknown)}. Choose from {", ".join(expandable)}.']
+        if errors:
+            raise ValidationError(errors)
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin that leaves out the fields a read request did not ask for.
+    `expandable_fields` maps each nested relation to a factory for its compact form,
+    used when the request sends ?expand= without it, or to None to leave it out then.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = Fieldset.from_request(self.context.get('request'))
+        if not fieldset.is_default():
+            self.apply_fieldset(fieldset)
+
+    def apply_fieldset(self, fieldset):
+        readable = [name for name, field in self.fields.items() if not field.write_only]
+        fieldset.validate(readable, list(self.expandable_fields))
+        for name in readable:
+            if not fieldset.includes(name):
+                del self.fields[name]
+            elif name in self.expandable_fields and not fieldset.expands(name):
+                compact = self.expandable_fields[name]
+                if compact is None:
+                    del self.fields[name]
+                else:
+                    self.fields[name] = compact()
@@ -5,4 +5,7 @@ from . import models
 class OrderStatusFilter(filters.FilterSet):
     class Meta:
         model = models.Order
-        fields = ['status']
+        fields = {
+            'status': ['exact'],
+            'date': ['exact', 'gte', 'lte'],
+        }
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.assignment import CrewAssigner
+
+
+class Command(BaseCommand):
+    help = (
+        'Assigns unassigned open orders to the delivery crew members with the fewest open orders. '
+        'With --interval it keeps running and assigns new orders every that many seconds. '
+        'Crew members are sent order.assigned events through the DELIVERY_EVENTS backend, which '
+        'must reach the serving processes (the default DatabasePubSub does).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--limit', type=int, help='Assign at most this many orders per run.')
+        parser.add_argument('--interval', type=float, help='Run again every this many seconds.')
+
+    def handle(self, *args, **options):
+        assigner = CrewAssigner(batch_size=options['batch_size'])
+        while True:
+            start = time.perf_counter()
+            assigned = assigner.assign(limit=options['limit'])
+            if not assigner.heap:
+                self.stderr.write('There are no active delivery crew members.')
+            elif assigned or options['interval'] is None:
+                loads = assigner.loads().values()
+                self.stdout.write(self.style.SUCCESS(
+                    f'Assigned {assigned} orders to {len(assigner.heap)} crew members in '
+                    f'{time.perf_counter() - start:.2f}s; open orders per crew member: {min(loads)}-{max(loads)}.'
+                ))
+            if options['interval'] is None:
+                break
+            # Like a request, drop the connection if it is past CONN_MAX_AGE or broken
+            close_old_connections()
+            time.sleep(options['interval'])
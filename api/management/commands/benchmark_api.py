@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from statistics import quantiles
+from unittest import mock
+import django
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from api import models
+from api import roles
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway database and drives the API endpoints at several concurrency levels, '
+        'reporting latency percentiles, throughput and queries per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--menu-items', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=50)
+        parser.add_argument('--managers', type=int, default=2)
+        parser.add_argument('--delivery-crew', type=int, default=10)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--cart-items', type=int, default=5)
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16])
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and concurrency level.')
+        parser.add_argument('--endpoints', nargs='+', help='Only run the endpoints with these labels.')
+        parser.add_argument('--throttle', action='store_true', help='Keep the throttle classes enabled.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # A file database, unlike the default in-memory test database, is shared by the worker threads
+        directory = tempfile.TemporaryDirectory()
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory.name, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            dataset = self.seed(options)
+            endpoints = self.get_endpoints(dataset)
+            if options['endpoints']:
+                endpoints = [endpoint for endpoint in endpoints if endpoint[0] in options['endpoints']]
+
+            # Expected 4xx responses (e.g. throttling) are counted as errors instead of being logged
+            logger = logging.getLogger('django.request')
+            level = logger.level
+            logger.setLevel(logging.ERROR)
+            try:
+                with mock.patch.object(APIView, 'throttle_classes', APIView.throttle_classes if options['throttle'] else []):
+                    results = self.run(endpoints, dataset['tokens'], options['concurrency'], options['requests'])
+            finally:
+                logger.setLevel(level)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            directory.cleanup()
+
+        if options['output']:
+            report = {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': {key: options[key] for key in (
+                    'categories', 'menu_items', 'customers', 'managers', 'delivery_crew',
+                    'orders', 'items_per_order', 'cart_items',
+                )},
+                'results': results,
+            }
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def seed(self, options):
+        categories = models.Category.objects.bulk_create(
+            models.Category(slug=f'category-{i}', title=f'Category {i}') for i in range(options['categories'])
+        )
+        menu_items = models.MenuItem.objects.bulk_create(
+            models.MenuItem(
+                title=f'Menu item {i}',
+                price=Decimal(random.randint(100, 5000)) / 100,
+                featured=i % 10 == 0,
+                category=categories[i % len(categories)]
+            )
+            for i in range(options['menu_items'])
+        )
+
+        users = {}
+        for role, count in (('customer', options['customers']), ('manager', options['managers']),
+                            ('delivery_crew', options['delivery_crew'])):
+            users[role] = User.objects.bulk_create(
+                User(username=f'benchmark-{role}-{i}', password='!') for i in range(count)
+            )
+        for group_name, role in ((roles.MANAGER, 'manager'), (roles.DELIVERY_CREW, 'delivery_crew')):
+            group, _ = Group.objects.get_or_create(name=group_name)
+            User.groups.through.objects.bulk_create(
+                User.groups.through(user=user, group=group) for user in users[role]
+            )
+        tokens = {
+            role: [token.key for token in Token.objects.bulk_create(
+                Token(key=Token.generate_key(), user=user) for user in role_users
+            )]
+            for role, role_users in users.items()
+        }
+
+        orders = models.Order.objects.bulk_create(
+            models.Order(
+                user=random.choice(users['customer']),
+                delivery_crew=random.choice(users['delivery_crew'] or [None]),
+                status=random.random() < 0.5
+            )
+            for _ in range(options['orders'])
+        )
+        order_items = []
+        for order in orders:
+            for menu_item in random.sample(menu_items, min(options['items_per_order'], len(menu_items))):
+                quantity = random.randint(1, 5)
+                order_items.append(models.OrderItem(
+                    order=order, menuitem=menu_item, quantity=quantity,
+                    unit_price=menu_item.price, price=menu_item.price * quantity
+                ))
+        models.OrderItem.objects.bulk_create(order_items, batch_size=5000)
+
+        carts = []
+        for user in users['customer']:
+            for menu_item in random.sample(menu_items, min(options['cart_items'], len(menu_items))):
+                carts.append(models.Cart(
+                    user=user, menuitem=menu_item, quantity=1, unit_price=menu_item.price, price=menu_item.price
+                ))
+        models.Cart.objects.bulk_create(carts)
+
+        return {
+            'tokens': tokens,
+            'menu_item': menu_items[0].pk,
+            'category': categories[0].pk,
+            'order': orders[-1].pk,
+            'last_page': max(len(orders) // api_settings.PAGE_SIZE, 1),
+        }
+
+    def get_endpoints(self, dataset):
+        # (label, method, path, role); role None means anonymous
+        return [
+            ('categories', 'get', reverse('api:categories'), None),
+            ('categories-detail', 'get', reverse('api:categories-detail', args=[dataset['category']]), None),
+            ('menu-items', 'get', reverse('api:menu-items'), None),
+            ('menu-items search', 'get', reverse('api:menu-items') + '?search=item 1&ordering=-price', None),
+            ('menu-item-detail', 'get', reverse('api:menu-item-detail', args=[dataset['menu_item']]), None),
+            ('cart-items', 'get', reverse('api:cart-items'), 'customer'),
+            ('order-list-create (customer)', 'get', reverse('api:order-list-create'), 'customer'),
+            ('order-list-create (delivery crew)', 'get', reverse('api:order-list-create'), 'delivery_crew'),
+            ('order-list-create (manager)', 'get', reverse('api:order-list-create'), 'manager'),
+            ('order-list-create (manager, deep page)', 'get',
+             reverse('api:order-list-create') + f'?page={dataset["last_page"]}', 'manager'),
+            ('order-list-create (manager, keyset)', 'get', reverse('api:order-list-create') + '?cursor=', 'manager'),
+            ('order-detail', 'get', reverse('api:order-detail', args=[dataset['order']]), 'manager'),
+            ('manager-users', 'get', reverse('api:manager-users'), 'manager'),
+            ('delivery-crew-users', 'get', reverse('api:delivery-crew-users'), 'manager'),
+        ]
+
+    def run(self, endpoints, tokens, concurrency_levels, requests):
+        results = []
+        self.stdout.write(
+            f'{"endpoint":<40} {"conc":>4} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>8} {"queries":>8} {"errors":>6}'
+        )
+        for label, method, path, role in endpoints:
+            for concurrency in concurrency_levels:
+                result = self.run_endpoint(method, path, tokens.get(role), concurrency, requests)
+                result.update({'endpoint': label, 'method': method.upper(), 'path': path, 'concurrency': concurrency})
+                results.append(result)
+                self.stdout.write(
+                    f'{label:<40} {concurrency:>4} {result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                    f'{result["p99_ms"]:>8.2f} {result["throughput"]:>8.1f} {result["queries_per_request"]:>8.1f} '
+                    f'{result["errors"]:>6}'
+                )
+        return results
+
+    def run_endpoint(self, method, path, tokens, concurrency, requests):
+        def send(index):
+            headers = {}
+            if tokens:
+                headers['HTTP_AUTHORIZATION'] = f'Token {tokens[index % len(tokens)]}'
+            client = Client()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = getattr(client, method)(path, **headers)
+                elapsed = (time.perf_counter() - start) * 1000
+            return elapsed, len(context), response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(send, range(requests)))
+        duration = time.perf_counter() - start
+
+        timings = [elapsed for elapsed, _, _ in samples]
+        percentiles = quantiles(timings, n=100, method='inclusive')
+        return {
+            'requests': requests,
+            'errors': sum(1 for _, _, status_code in samples if status_code >= 400),
+            'p50_ms': percentiles[49],
+            'p95_ms': percentiles[94],
+            'p99_ms': percentiles[98],
+            'throughput': requests / duration,
+            'queries_per_request': sum(queries for _, queries, _ in samples) / requests,
+        }
@@ -0,0 +1,120 @@
+import asyncio
+import time
+import tracemalloc
+from statistics import quantiles
+from urllib.parse import urlsplit
+from django.core.handlers.asgi import ASGIHandler
+from django.urls import resolve
+from api.async_views import AsyncReadView
+from littlelemon.asgi import AsyncURLconfASGIHandler
+from . import benchmark_api
+
+
+class Command(benchmark_api.Command):
+    help = (
+        'Compares the sync views and the async read views under ASGI, reporting requests/sec, '
+        'latency and memory per concurrent connection.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(concurrency=[1, 16, 64], requests=500)
+
+    def get_endpoints(self, dataset):
+        # Only the endpoints that have an async view
+        return [
+            endpoint for endpoint in super().get_endpoints(dataset)
+            if issubclass(getattr(resolve(urlsplit(endpoint[2]).path, urlconf='littlelemon.asgi_urls').func,
+                                  'view_class', object), AsyncReadView)
+        ]
+
+    def run(self, endpoints, tokens, concurrency_levels, requests):
+        applications = {'sync': ASGIHandler(), 'async': AsyncURLconfASGIHandler()}
+        results = []
+        self.stdout.write(
+            f'{"endpoint":<40} {"mode":>5} {"conc":>4} {"p50 ms":>8} {"p99 ms":>8} {"req/s":>8} {"KiB/conn":>9} {"errors":>6}'
+        )
+        for label, method, path, role in endpoints:
+            for concurrency in concurrency_levels:
+                for mode, application in applications.items():
+                    result = asyncio.run(
+                        self.run_application(application, path, tokens.get(role), concurrency, requests)
+                    )
+                    result.update({'endpoint': label, 'mode': mode, 'path': path, 'concurrency': concurrency})
+                    results.append(result)
+                    self.stdout.write(
+                        f'{label:<40} {mode:>5} {concurrency:>4} {result["p50_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+                        f'{result["throughput"]:>8.1f} {result["memory_per_connection_kib"]:>9.1f} {result["errors"]:>6}'
+                    )
+        return results
+
+    async def run_application(self, application, path, tokens, concurrency, requests):
+        url = urlsplit(path)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(index):
+            headers = [(b'host', b'testserver'), (b'accept', b'application/json')]
+            if tokens:
+                headers.append((b'authorization', f'Token {tokens[index % len(tokens)]}'.encode()))
+            async with semaphore:
+                start = time.perf_counter()
+                status_code = await self.call(application, url.path, url.query, headers)
+                return (time.perf_counter() - start) * 1000, status_code
+
+        # Warm up, then measure memory while one full batch of connections is in flight
+        await send(0)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await asyncio.gather(*(send(index) for index in range(concurrency)))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        samples = await asyncio.gather(*(send(index) for index in range(requests)))
+        duration = time.perf_counter() - start
+
+        timings = [elapsed for elapsed, _ in samples]
+        percentiles = quantiles(timings, n=100, method='inclusive')
+        return {
+            'requests': requests,
+            'errors': sum(1 for _, status_code in samples if status_code >= 400),
+            'p50_ms': percentiles[49],
+            'p95_ms': percentiles[94],
+            'p99_ms': percentiles[98],
+            'throughput': requests / duration,
+            'memory_per_connection_kib': (peak - baseline) / concurrency / 1024,
+        }
+
+    async def call(self, application, path, query_string, headers):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query_string.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+        disconnected = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        status_code = None
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+
+        await application(scope, receive, send)
+        disconnected.set()
+        return status_code
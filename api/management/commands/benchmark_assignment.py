@@ -0,0 +1,77 @@
+import random
+import time
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from api import models
+from api import roles
+from api.assignment import CrewAssigner
+from . import benchmark_api
+
+
+class Command(benchmark_api.Command):
+    help = (
+        'Seeds a throwaway database with unassigned orders and unevenly loaded delivery crew, '
+        'then times CrewAssigner and reports the queries it ran and the resulting balance.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--open-orders', type=int, default=20, help='Most open orders a crew member starts with.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.set_defaults(orders=100000, delivery_crew=500, customers=100)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        super().handle(*args, **options)
+
+    def seed(self, options):
+        customers = User.objects.bulk_create(
+            User(username=f'benchmark-customer-{i}', password='!') for i in range(options['customers'])
+        )
+        crew = User.objects.bulk_create(
+            User(username=f'benchmark-delivery_crew-{i}', password='!') for i in range(options['delivery_crew'])
+        )
+        group, _ = Group.objects.get_or_create(name=roles.DELIVERY_CREW)
+        User.groups.through.objects.bulk_create(User.groups.through(user=user, group=group) for user in crew)
+
+        # Start unbalanced: each crew member has up to --open-orders open orders
+        assigned = [
+            models.Order(user=random.choice(customers), delivery_crew=user)
+            for user in crew for _ in range(random.randint(0, options['open_orders']))
+        ]
+        unassigned = [models.Order(user=random.choice(customers)) for _ in range(options['orders'])]
+        models.Order.objects.bulk_create(assigned + unassigned, batch_size=5000)
+        return {'tokens': {}}
+
+    def get_endpoints(self, dataset):
+        return []
+
+    def run(self, endpoints, tokens, concurrency_levels, requests):
+        assigner = CrewAssigner(batch_size=self.batch_size)
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            assigned = assigner.assign()
+            elapsed = time.perf_counter() - start
+
+        loads = list(
+            models.Order.objects.filter(status=False, delivery_crew__isnull=False).values('delivery_crew').annotate(
+                open_orders=Count('id')
+            ).values_list('open_orders', flat=True)
+        )
+        result = {
+            'assigned': assigned,
+            'crew': len(assigner.heap),
+            'seconds': elapsed,
+            'orders_per_second': assigned / elapsed if elapsed else 0,
+            'queries': len(context),
+            'min_open_orders': min(loads),
+            'max_open_orders': max(loads),
+        }
+        self.stdout.write(
+            f'Assigned {assigned} orders to {result["crew"]} crew members in {elapsed:.2f}s '
+            f'({result["orders_per_second"]:.0f} orders/s, {result["queries"]} queries); '
+            f'open orders per crew member: {result["min_open_orders"]}-{result["max_open_orders"]}'
+        )
+        return [result]
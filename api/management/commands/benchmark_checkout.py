@@ -0,0 +1,59 @@
+import time
+from decimal import Decimal
+from statistics import median
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api import models
+from api import views
+
+
+class Command(BaseCommand):
+    help = 'Measures queries and latency per order checkout for different cart sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 5, 20, 50])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Run inside a transaction that is rolled back, so no benchmark data is left behind
+        with transaction.atomic():
+            self.run(options['sizes'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, sizes, repeat):
+        category = models.Category.objects.create(slug='benchmark', title='Benchmark')
+        menu_items = models.MenuItem.objects.bulk_create(
+            models.MenuItem(title=f'Benchmark item {i}', price=Decimal('9.99'), featured=False, category=category)
+            for i in range(max(sizes))
+        )
+        user = User.objects.create_user(username='benchmark-customer')
+
+        factory = APIRequestFactory()
+        view = views.OrderView.as_view(throttle_classes=[])
+
+        self.stdout.write(f'{"cart size":>10} {"queries":>8} {"p50 ms":>8} {"max ms":>8}')
+        for size in sizes:
+            timings = []
+            queries = 0
+            for _ in range(repeat):
+                models.Cart.objects.bulk_create(
+                    models.Cart(user=user, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+                    for item in menu_items[:size]
+                )
+                request = factory.post('/api/orders/')
+                force_authenticate(request, user=user)
+
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = view(request)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = len(context)
+
+                if response.status_code != 201:
+                    self.stderr.write(f'Checkout failed with status {response.status_code}: {response.data}')
+                    return
+
+            self.stdout.write(f'{size:>10} {queries:>8} {median(timings):>8.2f} {max(timings):>8.2f}')
@@ -0,0 +1,67 @@
+import time
+from statistics import median
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api import models
+from api import views
+from api.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    help = 'Compares deep-page latency of page number and keyset pagination on the order list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        # Run inside a transaction that is rolled back, so no benchmark data is left behind
+        with transaction.atomic():
+            self.run(options['sizes'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, sizes, repeat):
+        manager = User.objects.create_superuser(username='benchmark-manager')
+        customer = User.objects.create_user(username='benchmark-customer')
+        self.factory = APIRequestFactory(SERVER_NAME='localhost')
+        self.view = views.OrderView.as_view(throttle_classes=[])
+        self.manager = manager
+        page_size = views.OrderView.pagination_class.page_size
+
+        self.stdout.write(f'{"orders":>10} {"mode":>8} {"queries":>8} {"p50 ms":>8}')
+        created = 0
+        for size in sorted(sizes):
+            self.seed(customer, size - created)
+            created = size
+
+            # Measure the last page, where offset scans are most expensive
+            last_page = (size + page_size - 1) // page_size
+            self.report(size, 'page', f'/api/orders/?page={last_page}', repeat)
+
+            last_id = models.Order.objects.order_by('-id').values_list('id', flat=True)[page_size]
+            paginator = KeysetPagination()
+            paginator.base_url = 'http://localhost/api/orders/'
+            url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(last_id)))
+            self.report(size, 'keyset', url, repeat)
+
+    def seed(self, user, count, batch_size=10_000):
+        for start in range(0, count, batch_size):
+            models.Order.objects.bulk_create(
+                models.Order(user=user, total=0) for _ in range(min(batch_size, count - start))
+            )
+
+    def report(self, size, mode, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            request = self.factory.get(url)
+            force_authenticate(request, user=self.manager)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = self.view(request)
+                response.render()
+                timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(f'{size:>10} {mode:>8} {len(context):>8} {median(timings):>8.2f}')
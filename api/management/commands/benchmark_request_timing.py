@@ -0,0 +1,99 @@
+import time
+from unittest import mock
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+from api.middleware import RequestTimingMiddleware
+from api.request_stats import RequestStats, record_query, span
+from . import benchmark_api
+
+
+MIDDLEWARE = 'api.middleware.RequestTimingMiddleware'
+
+
+def mock_stats():
+    # Record into a throwaway instance, so the benchmark does not show up in the real statistics
+    return mock.patch('api.middleware.stats', RequestStats())
+
+
+class Command(benchmark_api.Command):
+    help = (
+        'Measures the latency overhead of RequestTimingMiddleware, by running the API endpoints '
+        'without it, with it, and with it and the Server-Timing header.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--rounds', type=int, default=3, help='Alternate the modes this many times.')
+        parser.set_defaults(concurrency=[1], requests=500)
+
+    def handle(self, *args, **options):
+        self.rounds = options['rounds']
+        super().handle(*args, **options)
+
+    def run(self, endpoints, tokens, concurrency_levels, requests):
+        without_middleware = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+        modes = {
+            'off': {'MIDDLEWARE': without_middleware},
+            'on': {'MIDDLEWARE': [MIDDLEWARE, *without_middleware], 'SERVER_TIMING': False},
+            'header': {'MIDDLEWARE': [MIDDLEWARE, *without_middleware], 'SERVER_TIMING': True},
+        }
+
+        self.measure_fixed_cost()
+
+        results = []
+        self.stdout.write(
+            f'{"endpoint":<40} {"mode":>6} {"conc":>4} {"p50 ms":>8} {"p99 ms":>8} {"req/s":>8} {"overhead us":>12}'
+        )
+        for label, method, path, role in endpoints:
+            for concurrency in concurrency_levels:
+                # Alternate the modes and keep each mode's fastest run, so drift and noise
+                # between runs do not show up as overhead
+                best = {}
+                for _ in range(self.rounds):
+                    for mode, overrides in modes.items():
+                        with override_settings(**overrides):
+                            result = self.run_endpoint(method, path, tokens.get(role), concurrency, requests)
+                        if mode not in best or result['p50_ms'] < best[mode]['p50_ms']:
+                            best[mode] = result
+
+                baseline = best['off']['p50_ms']
+                for mode, result in best.items():
+                    result.update({'endpoint': label, 'mode': mode, 'path': path, 'concurrency': concurrency})
+                    results.append(result)
+                    overhead = (result['p50_ms'] - baseline) * 1000
+                    self.stdout.write(
+                        f'{label:<40} {mode:>6} {concurrency:>4} {result["p50_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+                        f'{result["throughput"]:>8.1f} {overhead:>+12.0f}'
+                    )
+        return results
+
+    def measure_fixed_cost(self, iterations=20000):
+        # The middleware around a view that does nothing, with ten queries and three spans
+        def execute(sql, params, many, context):
+            return None
+
+        def view(request):
+            for _ in range(10):
+                record_query(execute, 'SELECT 1', (), False, {})
+            for name in ('auth', 'roles', 'serialize'):
+                with span(name):
+                    pass
+            return HttpResponse()
+
+        request = RequestFactory().get(reverse('api:menu-items'))
+        request.resolver_match = resolve(request.path)
+        timings = {}
+        for mode, overrides in (('off', {}), ('on', {'SERVER_TIMING': False}), ('header', {'SERVER_TIMING': True})):
+            middleware = view if mode == 'off' else RequestTimingMiddleware(view)
+            with override_settings(**overrides), mock_stats():
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    middleware(request)
+                timings[mode] = (time.perf_counter() - start) / iterations * 1_000_000
+
+        self.stdout.write(
+            f'Fixed cost per request (10 queries, 3 spans): {timings["on"] - timings["off"]:.1f} us, '
+            f'{timings["header"] - timings["off"]:.1f} us with the Server-Timing header\n'
+        )
@@ -0,0 +1,77 @@
+import random
+import time
+from decimal import Decimal
+from statistics import median
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api import models
+from api import views
+from api.search import MenuSearchFilter
+
+
+WORDS = [
+    'grilled', 'roasted', 'spicy', 'smoked', 'crispy', 'lemon', 'garlic', 'herb', 'honey', 'pepper',
+    'chicken', 'lamb', 'salmon', 'shrimp', 'tofu', 'beef', 'falafel', 'halloumi', 'feta', 'olive',
+    'salad', 'soup', 'pasta', 'risotto', 'pita', 'wrap', 'platter', 'skewer', 'bowl', 'tart',
+]
+CATEGORIES = ['Starters', 'Mains', 'Desserts', 'Drinks', 'Sides', 'Specials']
+
+
+class Command(BaseCommand):
+    help = 'Compares menu item search with the LIKE-based SearchFilter and the FTS5 MenuSearchFilter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100_000)
+        parser.add_argument('--terms', nargs='+', default=['chicken', 'lem', 'spicy lamb', 'desserts', 'zzz'])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        # Run inside a transaction that is rolled back, so no benchmark data is left behind
+        with transaction.atomic():
+            self.run(options['items'], options['terms'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, items, terms, repeat):
+        self.seed(items)
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        view = views.MenuItemsView()
+        page_size = views.MenuItemsView.pagination_class.page_size
+
+        self.stdout.write(f'{"term":>12} {"backend":>8} {"matches":>8} {"p50 ms":>8} {"max ms":>8}')
+        for term in terms:
+            request = Request(factory.get('/api/menu-items/', {'search': term}))
+            for name, backend, search_fields in [
+                ('like', SearchFilter(), ['title']),
+                ('fts5', MenuSearchFilter(), views.MenuItemsView.search_fields),
+            ]:
+                view.search_fields = search_fields
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    # What the paginated list does: count the matches and load the first page
+                    queryset = backend.filter_queryset(request, view.get_queryset(), view)
+                    matches = queryset.count()
+                    list(queryset[:page_size])
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f'{term:>12} {name:>8} {matches:>8} {median(timings):>8.2f} {max(timings):>8.2f}')
+
+    def seed(self, items):
+        categories = models.Category.objects.bulk_create(
+            models.Category(slug=title.lower(), title=title) for title in CATEGORIES
+        )
+        rng = random.Random(0)
+        models.MenuItem.objects.bulk_create(
+            (
+                models.MenuItem(
+                    title=' '.join(rng.sample(WORDS, 3)).capitalize() + f' {i}',
+                    price=Decimal('9.99'),
+                    featured=False,
+                    category=rng.choice(categories),
+                )
+                for i in range(items)
+            ),
+            batch_size=5000,
+        )
@@ -0,0 +1,97 @@
+import time
+from decimal import Decimal
+from statistics import median
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from api import fast_serializers
+from api import models
+from api import serializers
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the CPU time of serializing 1000 menu items, cart rows and orders with the DRF '
+        'serializers and with the values() fast path, and checks that both render the same JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        # Run inside a transaction that is rolled back, so no benchmark data is left behind
+        with transaction.atomic():
+            self.run(options['rows'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, rows, repeat):
+        customer = User.objects.create_user(username='benchmark-customer')
+        category = models.Category.objects.create(slug='benchmark', title='Benchmark')
+        menu_items = models.MenuItem.objects.bulk_create(
+            models.MenuItem(title=f'Benchmark item {i}', price=Decimal('9.99'), featured=False, category=category)
+            for i in range(rows)
+        )
+        models.Cart.objects.bulk_create(
+            models.Cart(user=customer, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in menu_items
+        )
+        orders = models.Order.objects.bulk_create(
+            models.Order(user=customer, total=Decimal('29.97')) for _ in range(rows)
+        )
+        models.OrderItem.objects.bulk_create(
+            models.OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for order in orders for item in menu_items[:3]
+        )
+
+        cases = [
+            (
+                'menu items',
+                models.MenuItem.objects.select_related('category').filter(category=category).order_by('id'),
+                serializers.MenuItemSerializer,
+                fast_serializers.MenuItemValuesSerializer,
+            ),
+            (
+                'cart',
+                models.Cart.objects.select_related('menuitem').filter(user=customer).order_by('id'),
+                serializers.CartSerializer,
+                fast_serializers.CartValuesSerializer,
+            ),
+            (
+                'orders',
+                models.Order.objects.select_related('user', 'delivery_crew').prefetch_related(
+                    Prefetch(
+                        'orderitem_set', queryset=models.OrderItem.objects.select_related('menuitem').order_by('id')
+                    )
+                ).filter(user=customer).order_by('id'),
+                serializers.OrderSerializer,
+                fast_serializers.OrderValuesSerializer,
+            ),
+        ]
+
+        renderer = JSONRenderer()
+        self.stdout.write(f'{"list":>12} {"serializer ms/1000":>20} {"values ms/1000":>16} {"speedup":>8}')
+        for name, queryset, serializer_class, values_serializer_class in cases:
+            values_serializer = values_serializer_class.get_instance()
+
+            slow = renderer.render(serializer_class(queryset.all(), many=True).data)
+            fast = renderer.render(values_serializer.to_representation(list(values_serializer.values(queryset.all()))))
+            if slow != fast:
+                raise CommandError(f'The values() output for {name} differs from {serializer_class.__name__}.')
+
+            # Both timings include fetching the rows, which is where model instances are built
+            before = self.measure(lambda: serializer_class(queryset.all(), many=True).data, repeat) / rows * 1000
+            after = self.measure(
+                lambda: values_serializer.to_representation(list(values_serializer.values(queryset.all()))), repeat
+            ) / rows * 1000
+            self.stdout.write(f'{name:>12} {before:>20.2f} {after:>16.2f} {before / after:>7.1f}x')
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.process_time()
+            func()
+            timings.append((time.process_time() - start) * 1000)
+        return median(timings)
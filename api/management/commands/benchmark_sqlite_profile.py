@@ -0,0 +1,144 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import Client
+from django.urls import reverse
+from api import models
+from . import benchmark_api
+
+
+DEFAULT_PROFILE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'CONN_MAX_AGE': 0,
+    'CONN_HEALTH_CHECKS': False,
+    'PRAGMAS': {'journal_mode': 'DELETE'},
+}
+
+
+class Command(benchmark_api.Command):
+    help = (
+        'Runs mixed checkout and menu read traffic against the default SQLite configuration '
+        'and SQLITE_PRODUCTION_PROFILE, reporting throughput, latency and "database is locked" errors.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per profile and concurrency level.')
+        parser.add_argument('--write-ratio', type=float, default=0.25, help='Share of the threads that check out.')
+        parser.set_defaults(concurrency=[4, 16])
+
+    def handle(self, *args, **options):
+        self.duration = options['duration']
+        self.write_ratio = options['write_ratio']
+        super().handle(*args, **options)
+
+    def get_endpoints(self, dataset):
+        return []
+
+    def run(self, endpoints, tokens, concurrency_levels, requests):
+        self.customer_tokens = tokens['customer']
+        self.menu_item_ids = list(models.MenuItem.objects.values_list('id', flat=True))
+        # "database is locked" errors are counted instead of being logged; the base command restores the level
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        profiles = {'default': DEFAULT_PROFILE, 'production': settings.SQLITE_PRODUCTION_PROFILE}
+        # Connections are created from this dict, so the worker threads pick up the profile
+        settings_dict = connection.settings_dict
+        original = {key: settings_dict.get(key) for key in ('ENGINE', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'PRAGMAS')}
+
+        results = []
+        self.stdout.write(
+            f'{"profile":<11} {"conc":>4} {"reads/s":>8} {"read p50":>9} {"read p99":>9} '
+            f'{"orders/s":>9} {"order p50":>10} {"order p99":>10} {"locked":>7} {"errors":>7}'
+        )
+        try:
+            for concurrency in concurrency_levels:
+                for name, profile in profiles.items():
+                    settings_dict.update(profile)
+                    # Reconnect, so the journal mode of the database file is switched too
+                    connection.close()
+                    connection.ensure_connection()
+
+                    result = self.run_traffic(concurrency)
+                    result.update({'profile': name, 'concurrency': concurrency})
+                    results.append(result)
+                    self.stdout.write(
+                        f'{name:<11} {concurrency:>4} {result["reads_per_second"]:>8.1f} '
+                        f'{result["read_p50_ms"]:>9.2f} {result["read_p99_ms"]:>9.2f} '
+                        f'{result["orders_per_second"]:>9.1f} {result["order_p50_ms"]:>10.2f} '
+                        f'{result["order_p99_ms"]:>10.2f} {result["locked"]:>7} {result["errors"]:>7}'
+                    )
+        finally:
+            settings_dict.update(original)
+            connection.close()
+        return results
+
+    def run_traffic(self, concurrency):
+        writers = max(1, round(concurrency * self.write_ratio))
+        deadline = time.perf_counter() + self.duration
+        lock = threading.Lock()
+        samples = {'read': [], 'order': []}
+        failures = {'locked': 0, 'errors': 0}
+
+        def request(client, method, path, **kwargs):
+            try:
+                response = getattr(client, method)(path, **kwargs)
+                failed = response.status_code >= 400
+            except OperationalError as exc:
+                failed = True
+                if 'locked' in str(exc):
+                    with lock:
+                        failures['locked'] += 1
+                    return False
+            finally:
+                # What the request_finished signal does behind a real server
+                close_old_connections()
+            if failed:
+                with lock:
+                    failures['errors'] += 1
+            return not failed
+
+        def write(index):
+            client = Client()
+            headers = {'HTTP_AUTHORIZATION': f'Token {self.customer_tokens[index % len(self.customer_tokens)]}'}
+            while time.perf_counter() < deadline:
+                cart = [{'menuitem_id': menu_item_id, 'quantity': 1} for menu_item_id in random.sample(self.menu_item_ids, 3)]
+                start = time.perf_counter()
+                if request(client, 'post', reverse('api:cart-items'), data=json.dumps(cart),
+                           content_type='application/json', **headers) \
+                        and request(client, 'post', reverse('api:order-list-create'), **headers):
+                    with lock:
+                        samples['order'].append((time.perf_counter() - start) * 1000)
+
+        def read(index):
+            client = Client()
+            while time.perf_counter() < deadline:
+                path = reverse('api:menu-item-detail', args=[random.choice(self.menu_item_ids)])
+                start = time.perf_counter()
+                if request(client, 'get', path):
+                    with lock:
+                        samples['read'].append((time.perf_counter() - start) * 1000)
+
+        def worker(index):
+            try:
+                write(index) if index < writers else read(index)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(worker, range(concurrency)))
+
+        result = {**failures}
+        for kind, timings in samples.items():
+            plural = 'reads' if kind == 'read' else 'orders'
+            percentiles = quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else [0.0] * 99
+            result[f'{plural}_per_second'] = len(timings) / self.duration
+            result[f'{kind}_p50_ms'] = percentiles[49]
+            result[f'{kind}_p99_ms'] = percentiles[98]
+        return result
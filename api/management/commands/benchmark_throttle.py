@@ -0,0 +1,35 @@
+import time
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from api.throttle import GroupBasedThrottle
+from api.throttle_stores import CacheThrottleStore
+
+
+class Command(BaseCommand):
+    help = 'Compares the per-request cost and state size of the throttle algorithms.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rates', nargs='+', default=['15/min', '1000/hour', '10000/hour'])
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"algorithm":>15} {"rate":>11} {"us/request":>11} {"state bytes":>12}')
+        for rate in options['rates']:
+            for algorithm in GroupBasedThrottle.algorithms:
+                elapsed, state_size = self.measure(algorithm, rate, options['requests'])
+                self.stdout.write(f'{algorithm:>15} {rate:>11} {elapsed:>11.2f} {state_size:>12}')
+
+    def measure(self, algorithm, rate, requests):
+        throttle = GroupBasedThrottle()
+        throttle.store = CacheThrottleStore(LocMemCache(f'benchmark-{algorithm}-{rate}', {}))
+        throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+        check = getattr(throttle, algorithm)
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            check('benchmark')
+        elapsed = (time.perf_counter() - start) / requests * 1_000_000
+
+        # LocMemCache stores pickled values, so the pickled size is the state kept per user
+        state_size = sum(len(value) for value in throttle.store.cache._cache.values())
+        return elapsed, state_size
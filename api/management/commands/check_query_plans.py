@@ -0,0 +1,79 @@
+import re
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api import models
+from api import roles
+from api import views
+from api.fast_serializers import ValuesListMixin
+
+
+# Plan lines that read a whole table, or all of one of its indexes, instead of seeking
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW|SUBQUERY)(\w+)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Runs the main view querysets under EXPLAIN and fails if any of them scans a full table.'
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Query plans cannot be checked on {connection.vendor}.')
+
+        failures = []
+        for label, queryset in self.get_querysets():
+            plan = queryset.explain()
+            scans = [match.group(1) for line in plan.splitlines() if (match := pattern.search(line.strip()))]
+            if scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'FULL SCAN  {label}: {", ".join(scans)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK         {label}'))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{len(failures)} queryset(s) fall back to a full table scan.')
+
+    def get_querysets(self):
+        customer = self.get_user(group_names=[])
+        delivery_crew = self.get_user(group_names=[roles.DELIVERY_CREW])
+        today = date.today()
+
+        return [
+            ('orders (customer)', self.get_view_queryset(views.OrderView, customer)),
+            ('orders (customer, status)', self.get_view_queryset(views.OrderView, customer, {'status': 'true'})),
+            ('orders (delivery crew)', self.get_view_queryset(views.OrderView, delivery_crew)),
+            ('orders (delivery crew, status)', self.get_view_queryset(views.OrderView, delivery_crew, {'status': 'false'})),
+            ('order detail', self.get_view_queryset(views.OrderDetailView, customer, pk=1)),
+            ('order items', models.OrderItem.objects.filter(order__in=[1, 2, 3]).order_by('id')),
+            ('orders by date', models.Order.objects.filter(date__range=(today - timedelta(days=30), today), status=True)),
+            ('cart', self.get_view_queryset(views.CartView, customer)),
+            ('cart item detail', self.get_view_queryset(views.CartItemDetailView, customer, pk=1)),
+            ('menu item detail', self.get_view_queryset(views.MenuItemDetailView, customer, pk=1)),
+        ]
+
+    def get_user(self, group_names):
+        # An unsaved user with preset roles, so no fixtures are needed
+        user = User(pk=1, username='query-plans')
+        user._group_names = frozenset(group_names)
+        return user
+
+    def get_view_queryset(self, view_class, user, query=None, pk=None):
+        request = Request(APIRequestFactory().get('/', data=query))
+        request.user = user
+        view = view_class(request=request, args=(), kwargs={}, format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+
+        # Detail views look up one row, list views read one page with the columns they serialize
+        if pk is not None:
+            return queryset.filter(pk=pk)
+        if isinstance(view, ValuesListMixin):
+            queryset = view.get_values_serializer().values(queryset)
+        return queryset[:view.paginator.page_size]
@@ -0,0 +1,53 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from api import serializers
+from api.menu_import import MenuImport, parse_menu_file
+
+
+class Command(BaseCommand):
+    help = 'Creates and updates menu items from a CSV or JSON menu file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension.')
+        parser.add_argument('--dry-run', action='store_true', help='Show the changes without writing them.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if format not in ('csv', 'json'):
+            raise CommandError('Cannot tell the file format from its extension, use --format.')
+
+        try:
+            with open(path, encoding='utf-8-sig') as file:
+                data = parse_menu_file(file, format)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Could not read {path}: {exc}')
+
+        serializer = serializers.MenuImportSerializer(data=data, many=True, allow_empty=False)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, dict):
+                raise CommandError(errors)
+            for line, row_errors in enumerate(errors, start=1):
+                for field, messages in row_errors.items():
+                    self.stderr.write(f'Row {line}: {field}: {" ".join(messages)}')
+            raise CommandError('The menu file is invalid, nothing was imported.')
+
+        menu_import = MenuImport(serializer.validated_data)
+        if options['dry_run']:
+            for change in menu_import.changes:
+                if change['action'] == 'create':
+                    self.stdout.write(f'+ {change["title"]} ({change["price"]}, category {change["category_id"]})')
+                else:
+                    diff = ', '.join(f'{field}: {old} -> {new}' for field, (old, new) in change['changes'].items())
+                    self.stdout.write(f'~ #{change["id"]} {diff}')
+        else:
+            menu_import.apply()
+
+        summary = menu_import.summary()
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would create" if options["dry_run"] else "Created"} {summary["created"]}, '
+            f'{"update" if options["dry_run"] else "updated"} {summary["updated"]}, '
+            f'{summary["unchanged"]} unchanged.'
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from api import analytics
+from api import models
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the daily sales, menu item and delivery summaries from the order history. '
+        'Orders are aggregated in batches of consecutive ids, inside one transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for model in (models.DailySales, models.DailyMenuItemSales, models.DailyDeliveries):
+            model.objects.all().delete()
+
+        batch_size = options['batch_size']
+        last_id = 0
+        batches = orders = 0
+        while True:
+            ids = list(
+                models.Order.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            self.add_batch(last_id, ids[-1])
+            last_id = ids[-1]
+            batches += 1
+            orders += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the sales summaries from {orders} orders in {batches} batches.'))
+
+    def add_batch(self, first_id, last_id):
+        # Aggregate in the database, so only one row per day (and item or crew member) is loaded
+        orders = models.Order.objects.filter(id__gt=first_id, id__lte=last_id)
+        order_items = models.OrderItem.objects.filter(order_id__gt=first_id, order_id__lte=last_id)
+
+        analytics.increment(models.DailySales, ['date'], [
+            {'date': row['date'], 'orders': row['orders'], 'revenue': row['revenue']}
+            for row in orders.order_by().values('date').annotate(orders=Count('id'), revenue=Sum('total'))
+        ])
+        analytics.increment(models.DailyMenuItemSales, ['date', 'menuitem'], [
+            {'date': row['order__date'], 'menuitem': row['menuitem'], 'quantity': row['quantity'], 'revenue': row['revenue']}
+            for row in order_items.order_by().values('order__date', 'menuitem').annotate(
+                quantity=Sum('quantity'), revenue=Sum('price')
+            )
+        ])
+        analytics.increment(models.DailyDeliveries, ['date', 'delivery_crew'], [
+            {'date': row['date'], 'delivery_crew': row['delivery_crew'], 'delivered': row['delivered']}
+            for row in orders.filter(status=True, delivery_crew__isnull=False).order_by().values(
+                'date', 'delivery_crew'
+            ).annotate(delivered=Count('id'))
+        ])
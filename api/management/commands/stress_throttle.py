@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import tempfile
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.throttle import GroupBasedThrottle
+
+
+def fire_requests(requests):
+    # A customer whose groups are already known, so no database is needed
+    user = User(pk=1, username='stress')
+    user._group_names = frozenset()
+    request = Request(APIRequestFactory().get('/api/orders/'))
+    request.user = user
+
+    throttled = 0
+    for _ in range(requests):
+        # Like APIView.check_throttles(), with a new throttle per request
+        try:
+            GroupBasedThrottle().allow_request(request, None)
+        except Throttled:
+            throttled += 1
+    return throttled
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends requests of one user through GroupBasedThrottle.allow_request() from parallel workers '
+        'and fails unless exactly the requests over the limit were throttled (429).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', choices=['sqlite', 'cache'], default='sqlite')
+        parser.add_argument('--algorithm', choices=GroupBasedThrottle.algorithms, default='sliding_log')
+        parser.add_argument('--rate', default='100/hour')
+        parser.add_argument('--processes', type=int, default=8, help='Worker processes, or threads for --store cache.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per worker.')
+
+    def handle(self, *args, **options):
+        num_requests, _ = GroupBasedThrottle().parse_rate(options['rate'])
+        total = options['processes'] * options['requests']
+        expected = max(total - num_requests, 0)
+        rates = {'default': f'{options["rate"]}:{options["algorithm"]}'}
+
+        with tempfile.TemporaryDirectory() as directory:
+            if options['store'] == 'sqlite':
+                store = {
+                    'BACKEND': 'api.throttle_stores.SQLiteThrottleStore',
+                    'OPTIONS': {'path': os.path.join(directory, 'throttle.sqlite3')},
+                }
+                # Forked workers each open their own connection to the shared file
+                pool_class = multiprocessing.get_context('fork').Pool
+            else:
+                # The cache store only locks within one process, so its workers are threads
+                store = {
+                    'BACKEND': 'api.throttle_stores.CacheThrottleStore',
+                    'OPTIONS': {'cache': LocMemCache('stress_throttle', {})},
+                }
+                pool_class = ThreadPool
+
+            # Workers are started inside, so forked processes inherit the settings
+            with override_settings(
+                THROTTLE_STORE=store,
+                REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+            ), pool_class(options['processes']) as pool:
+                throttled = sum(pool.map(fire_requests, [options['requests']] * options['processes']))
+
+        self.stdout.write(f'{total} requests, {throttled} throttled (429), {expected} expected')
+        if throttled != expected:
+            raise CommandError(
+                f'Throttle let {expected - throttled} request(s) over the limit through.' if throttled < expected
+                else f'Throttle rejected {throttled - expected} request(s) under the limit.'
+            )
@@ -0,0 +1,42 @@
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from api import routers
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the primary SQLite database to the replica file, standing in for replication '
+        'when testing the read replica locally. With --interval it keeps copying, so the '
+        'replica lags the primary by up to that many seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Copy again every this many seconds.')
+
+    def handle(self, *args, **options):
+        alias = routers.get_replica_alias()
+        if alias is None:
+            raise CommandError('No replica is configured, set DATABASE_REPLICA.')
+        primary, replica = connections['default'].settings_dict, connections[alias].settings_dict
+        if primary['ENGINE'] != replica['ENGINE'] or connections[alias].vendor != 'sqlite':
+            raise CommandError('Only SQLite databases can be copied.')
+
+        while True:
+            start = time.perf_counter()
+            self.copy(primary['NAME'], replica['NAME'])
+            self.stdout.write(f'Copied {primary["NAME"]} to {replica["NAME"]} in {(time.perf_counter() - start) * 1000:.0f} ms')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_path, target_path):
+        # The backup API copies a consistent snapshot, even while the primary is written to
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+from django.db import transaction
+from . import models
+from .caching import bump_menu_version
+
+
+IMPORT_FIELDS = ['title', 'price', 'category', 'featured']
+
+
+def parse_menu_file(file, format):
+    """
+    Reads a menu file into a list of rows. CSV files need a header row with the
+    column names (id, title, price, category_id, featured); JSON files hold a list
+    of objects with the same keys. Empty CSV cells are left out of the row.
+    """
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    if format == 'json':
+        return json.loads(content)
+    elif format == 'csv':
+        reader = csv.DictReader(io.StringIO(content))
+        return [{key: value for key, value in row.items() if key and value != ''} for row in reader]
+    raise ValueError(f'Unsupported menu file format: {format}')
+
+
+class MenuImport:
+    """
+    Applies validated menu rows (from serializers.MenuImportSerializer) to the menu.
+    Rows with an id update that menu item, rows without one create a new item.
+    """
+    batch_size = 500
+
+    def __init__(self, rows):
+        self.to_create = []
+        self.to_update = []
+        self.changes = []
+        self.unchanged = 0
+
+        for row in rows:
+            menuitem = row.get('menuitem')
+            if menuitem is None:
+                row.setdefault('featured', False)
+                self.to_create.append(models.MenuItem(**{field: row[field] for field in IMPORT_FIELDS}))
+                self.changes.append({
+                    'action': 'create',
+                    'title': row['title'],
+                    'price': str(row['price']),
+                    'category_id': row['category'].pk,
+                    'featured': row['featured'],
+                })
+                continue
+
+            changes = {}
+            for field in IMPORT_FIELDS:
+                # Fields the row leaves out keep their current value
+                if field not in row:
+                    continue
+                old, new = getattr(menuitem, field), row[field]
+                if old != new:
+                    changes[field] = [old, new]
+                    setattr(menuitem, field, new)
+
+            if changes:
+                if 'price' in changes:
+                    changes['price'] = [str(value) for value in changes['price']]
+                if 'category' in changes:
+                    changes['category_id'] = [value.pk for value in changes.pop('category')]
+                self.to_update.append(menuitem)
+                self.changes.append({'action': 'update', 'id': menuitem.pk, 'changes': changes})
+            else:
+                self.unchanged += 1
+
+    def summary(self, include_changes=False):
+        summary = {
+            'created': len(self.to_create),
+            'updated': len(self.to_update),
+            'unchanged': self.unchanged,
+        }
+        if include_changes:
+            summary['changes'] = self.changes
+        return summary
+
+    @transaction.atomic
+    def apply(self):
+        models.MenuItem.objects.bulk_create(self.to_create, batch_size=self.batch_size)
+        models.MenuItem.objects.bulk_update(self.to_update, IMPORT_FIELDS, batch_size=self.batch_size)
+
+        # Bulk writes do not send post_save signals, so invalidate the menu cache here
+        if self.to_create or self.to_update:
+            transaction.on_commit(bump_menu_version)
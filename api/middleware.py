@@ -0,0 +1,64 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .request_stats import RequestTiming, current_timing, stats
+
+
+class RequestTimingMiddleware:
+    """
+    Records the query count and time, the time spent in authentication, throttling,
+    permission checks, role lookups and serialization, and the total time of every
+    request. The metrics of API requests are added to per URL name histograms (see
+    request_stats) and, when the SERVER_TIMING setting is enabled, returned in a
+    Server-Timing header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        self.finish(request, response, timing)
+        return response
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        self.finish(request, response, timing)
+        return response
+
+    def finish(self, request, response, timing):
+        metrics = timing.metrics()
+
+        # Only the API's views, not the admin, auth or unmatched URLs, which would
+        # otherwise add a histogram for every URL scanned by a crawler
+        match = request.resolver_match
+        if match is not None and match.url_name and match.namespace == 'api':
+            stats.record(match.view_name, metrics)
+
+        if getattr(settings, 'SERVER_TIMING', False):
+            response['Server-Timing'] = self.get_server_timing(metrics)
+
+    def get_server_timing(self, metrics):
+        entries = [f'db;dur={metrics["db"]:.2f};desc="{metrics["queries"]} queries"']
+        entries += [
+            f'{name};dur={value:.2f}' for name, value in metrics.items() if name not in ('db', 'queries', 'total')
+        ]
+        entries.append(f'total;dur={metrics["total"]:.2f}')
+        return ', '.join(entries)
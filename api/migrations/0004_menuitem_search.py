@@ -0,0 +1,80 @@
+from django.db import migrations
+
+
+# Triggers keep the index in sync with every write, including bulk_create()/bulk_update()
+# and raw SQL, which send no model signals.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE api_menuitem_fts USING fts5(
+        title, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    # Rank matches with bm25(), weighting title matches above category matches
+    "INSERT INTO api_menuitem_fts (api_menuitem_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    INSERT INTO api_menuitem_fts (rowid, title, category)
+    SELECT api_menuitem.id, api_menuitem.title, api_category.title
+    FROM api_menuitem JOIN api_category ON api_category.id = api_menuitem.category_id
+    """,
+    """
+    CREATE TRIGGER api_menuitem_fts_insert AFTER INSERT ON api_menuitem BEGIN
+        INSERT INTO api_menuitem_fts (rowid, title, category)
+        SELECT new.id, new.title, title FROM api_category WHERE id = new.category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_menuitem_fts_update AFTER UPDATE OF title, category_id ON api_menuitem BEGIN
+        DELETE FROM api_menuitem_fts WHERE rowid = old.id;
+        INSERT INTO api_menuitem_fts (rowid, title, category)
+        SELECT new.id, new.title, title FROM api_category WHERE id = new.category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_menuitem_fts_delete AFTER DELETE ON api_menuitem BEGIN
+        DELETE FROM api_menuitem_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_category_fts_update AFTER UPDATE OF title ON api_category BEGIN
+        UPDATE api_menuitem_fts SET category = new.title
+        WHERE rowid IN (SELECT id FROM api_menuitem WHERE category_id = new.id);
+    END
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS api_category_fts_update',
+    'DROP TRIGGER IF EXISTS api_menuitem_fts_delete',
+    'DROP TRIGGER IF EXISTS api_menuitem_fts_update',
+    'DROP TRIGGER IF EXISTS api_menuitem_fts_insert',
+    'DROP TABLE IF EXISTS api_menuitem_fts',
+]
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        # The full-text index needs SQLite with FTS5; without it, search falls back to LIKE
+        if not has_fts5(schema_editor.connection):
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_sales_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.18 on 2026-10-18 01:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_menuitem_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemSearch',
+            fields=[
+                ('menuitem', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='api.menuitem')),
+                ('title', models.TextField()),
+                ('category', models.TextField()),
+                ('document', models.TextField(db_column='api_menuitem_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'api_menuitem_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -21,7 +21,7 @@ class MenuItem(models.Model):
 
 
 class Cart(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
@@ -32,6 +32,10 @@ class Cart(models.Model):
 
     class Meta:
         unique_together = ('user', 'menuitem')
+        indexes = [
+            # Covers the cart listing and summary, which read nothing else from the cart table
+            models.Index(fields=['user', 'id', 'menuitem', 'quantity', 'price'], name='cart_user_covering_idx'),
+        ]
 
 
 class Order(models.Model):
@@ -41,6 +45,13 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     date = models.DateField(db_index=False, auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status', 'id'], name='order_user_status_idx'),
+            models.Index(fields=['delivery_crew', 'status', 'id'], name='order_crew_status_idx'),
+            models.Index(fields=['date', 'status'], name='order_date_status_idx'),
+        ]
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
@@ -54,3 +65,76 @@ class OrderItem(models.Model):
 
     class Meta:
         unique_together = ('order', 'menuitem')
+
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f'Sales on {self.date}'
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+
+
+class DailyMenuItemSales(models.Model):
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f'Sales of {self.menuitem.title} on {self.date}'
+
+    class Meta:
+        verbose_name_plural = 'daily menu item sales'
+        unique_together = ('date', 'menuitem')
+
+
+class DailyDeliveries(models.Model):
+    date = models.DateField()
+    delivery_crew = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_deliveries')
+    delivered = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'Deliveries by {self.delivery_crew.username} on {self.date}'
+
+    class Meta:
+        verbose_name_plural = 'daily deliveries'
+        unique_together = ('date', 'delivery_crew')
+
+
+class DeliveryEvent(models.Model):
+    """
+    A delivery crew event, stored by events.DatabasePubSub for the other processes
+    to read. `source` identifies the publishing process.
+    """
+    source = models.CharField(max_length=32)
+    message = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.message["type"]} for user {self.message["user_id"]}'
+
+
+class MenuItemSearch(models.Model):
+    """
+    The full-text index of menu item and category titles, created by migration 0004 on
+    SQLite only, for joining it to menu items in searches (see api.search). `document`
+    is the FTS5 column named after the table, which takes the search query, and `rank`
+    its relevance for that query.
+    """
+    menuitem = models.OneToOneField(
+        MenuItem, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_index',
+    )
+    title = models.TextField()
+    category = models.TextField()
+    document = models.TextField(db_column='api_menuitem_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'api_menuitem_fts'
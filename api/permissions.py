@@ -1,4 +1,5 @@
 from rest_framework.permissions import BasePermission
+from . import roles
 
 
 class IsManagerOrSuperuser(BasePermission):
@@ -7,7 +8,7 @@ class IsManagerOrSuperuser(BasePermission):
     """
     def has_permission(self, request, view):
         # Check if the user belongs to the 'Manager' group or superuser
-        return request.user.groups.filter(name='Manager').exists() or request.user.is_superuser
+        return roles.is_manager(request.user)
 
 
 class IsCustomer(BasePermission):
@@ -17,7 +18,7 @@ class IsCustomer(BasePermission):
 
     def has_permission(self, request, view):
         # Check if the user does not belong to any group
-        return not request.user.groups.exists()
+        return roles.is_customer(request.user)
 
 
 class IsNotCustomer(BasePermission):
@@ -27,4 +28,13 @@ class IsNotCustomer(BasePermission):
 
     def has_permission(self, request, view):
         # Check if the user belongs to any group
-        return request.user.groups.exists()
+        return not roles.is_customer(request.user)
+
+
+class IsDeliveryCrew(BasePermission):
+    """
+    Allows access only to users who belong to the delivery crew.
+    """
+
+    def has_permission(self, request, view):
+        return roles.is_delivery_crew(request.user)
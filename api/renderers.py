@@ -0,0 +1,67 @@
+import csv
+import json
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class Echo:
+    """
+    A file-like object that returns what is written to it, so csv.writer can produce
+    one line at a time for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for non-streamed responses, such as errors
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        writer = csv.writer(Echo())
+        header = list(data[0].keys()) if data else []
+        lines = [writer.writerow(header)] + [writer.writerow([row.get(key) for key in header]) for row in data]
+        return ''.join(lines).encode(self.charset)
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    @staticmethod
+    def dumps(row):
+        return json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for non-streamed responses, such as errors
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return ''.join(self.dumps(row) for row in data).encode(self.charset)
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    @staticmethod
+    def format_event(type, data, id=None):
+        lines = [f'id: {id}'] if id is not None else []
+        lines += [f'event: {type}', f'data: {NDJSONRenderer.dumps(data)}']
+        return '\n'.join(lines) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for non-streamed responses, such as errors
+        if data is None:
+            return b''
+        return self.format_event('error', data).encode(self.charset)
@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from django.conf import settings
+
+
+# Upper bounds of the histogram buckets; the last bucket counts everything above
+DURATION_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # ms
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+current_timing = ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    """
+    Query count and time, and the durations of named spans, for one request.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.spans = {'db': 0.0}
+
+    def add(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def metrics(self):
+        metrics = {name: duration * 1000 for name, duration in self.spans.items()}
+        metrics['total'] = (time.perf_counter() - self.start) * 1000
+        metrics['queries'] = self.queries
+        return metrics
+
+
+@contextmanager
+def span(name):
+    """
+    Adds the time spent in the block to the current request's span `name`.
+    """
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+
+class TimedDataMixin:
+    @property
+    def data(self):
+        with span('serialize'):
+            return super().data
+
+
+@lru_cache(maxsize=None)
+def get_timed_serializer_class(serializer_class):
+    return type(serializer_class.__name__, (TimedDataMixin, serializer_class), {})
+
+
+class TimedViewMixin:
+    """
+    Records the time a DRF view spends checking permissions and serializing its
+    response data, in the permissions and serialize spans.
+    """
+
+    def check_permissions(self, request):
+        with span('permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with span('permissions'):
+            super().check_object_permissions(request, obj)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        # many=True returns the list serializer of the class, so the instance is retyped
+        serializer.__class__ = get_timed_serializer_class(type(serializer))
+        return serializer
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every database connection with connection.execute_wrapper()
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.queries += 1
+        timing.spans['db'] += time.perf_counter() - start
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        # The upper bound of the bucket holding the q-th percentile, capped by the maximum
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.sum / self.count, 3) if self.count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': round(self.max, 3),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                '+Inf': self.counts[-1],
+            },
+        }
+
+
+class RequestStats:
+    """
+    Rolling histograms of request metrics per URL name, kept in process memory. Each
+    interval gets its own histograms; intervals older than the window are dropped.
+    Every worker process keeps its own statistics.
+    """
+
+    def __init__(self, window=None, interval=None):
+        self.window = window
+        self.interval = interval
+        self.intervals = deque()
+        self.lock = threading.Lock()
+
+    def get_window(self):
+        return self.window or getattr(settings, 'REQUEST_STATS_WINDOW', 60 * 60)
+
+    def get_interval(self):
+        return self.interval or getattr(settings, 'REQUEST_STATS_INTERVAL', 60)
+
+    def record(self, url_name, metrics):
+        now = time.time()
+        interval = self.get_interval()
+        start = now - now % interval
+
+        with self.lock:
+            if not self.intervals or self.intervals[-1][0] != start:
+                self.intervals.append((start, {}))
+                self.expire(now)
+            histograms = self.intervals[-1][1].setdefault(url_name, {})
+            for name, value in metrics.items():
+                if name not in histograms:
+                    histograms[name] = Histogram(QUERY_BUCKETS if name == 'queries' else DURATION_BUCKETS)
+                histograms[name].add(value)
+
+    def expire(self, now):
+        while self.intervals and self.intervals[0][0] <= now - self.get_window():
+            self.intervals.popleft()
+
+    def snapshot(self):
+        merged = {}
+        with self.lock:
+            self.expire(time.time())
+            for _, url_names in self.intervals:
+                for url_name, histograms in url_names.items():
+                    for name, histogram in histograms.items():
+                        target = merged.setdefault(url_name, {}).setdefault(name, Histogram(histogram.buckets))
+                        target.merge(histogram)
+
+        return {
+            url_name: {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+            for url_name, histograms in sorted(merged.items())
+        }
+
+    def reset(self):
+        with self.lock:
+            self.intervals.clear()
+
+
+stats = RequestStats()
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from .caching import is_shared_cache
+from .request_stats import span
+
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'DeliveryCrew'
+
+
+def get_cache_key(user_id):
+    return f'user_groups_{user_id}'
+
+
+def get_group_names(user):
+    """
+    Returns the names of the groups the user belongs to. The result is kept on the
+    user object for the rest of the request, and in the cache across requests if the
+    cache is shared by all worker processes. A per-process cache would let other
+    workers keep a revoked role until ROLE_CACHE_TIMEOUT.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    group_names = getattr(user, '_group_names', None)
+    if group_names is None:
+        with span('roles'):
+            key = get_cache_key(user.pk)
+            shared = is_shared_cache()
+            group_names = cache.get(key) if shared else None
+            if group_names is None:
+                group_names = frozenset(user.groups.values_list('name', flat=True))
+                if shared:
+                    cache.set(key, group_names, timeout=getattr(settings, 'ROLE_CACHE_TIMEOUT', 5 * 60))
+        user._group_names = group_names
+    return group_names
+
+
+async def aget_group_names(user):
+    """
+    Async version of get_group_names(), which also primes the user object so later
+    synchronous role checks in the same request need no I/O.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    group_names = getattr(user, '_group_names', None)
+    if group_names is None:
+        with span('roles'):
+            key = get_cache_key(user.pk)
+            shared = is_shared_cache()
+            group_names = await cache.aget(key) if shared else None
+            if group_names is None:
+                group_names = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+                if shared:
+                    await cache.aset(key, group_names, timeout=getattr(settings, 'ROLE_CACHE_TIMEOUT', 5 * 60))
+        user._group_names = group_names
+    return group_names
+
+
+def invalidate_group_names(*user_ids):
+    cache.delete_many([get_cache_key(user_id) for user_id in user_ids])
+
+
+def is_manager(user):
+    return user.is_superuser or MANAGER in get_group_names(user)
+
+
+def is_delivery_crew(user):
+    return DELIVERY_CREW in get_group_names(user)
+
+
+def is_customer(user):
+    return not get_group_names(user)
@@ -0,0 +1,120 @@
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+class RoutingState:
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+current_state = ContextVar('current_routing_state', default=None)
+
+
+def get_replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE', 'replica')
+    return alias if alias in connections.settings else None
+
+
+def get_pin_key(scope):
+    return f'replica_pin_{scope}'
+
+
+def get_user_scope(user_id):
+    return f'user_{user_id}'
+
+
+def pin(*scopes):
+    """
+    Sends the reads of the given scopes to the primary for REPLICA_PIN_SECONDS, so
+    they see a write before it has reached the replica.
+    """
+    if get_replica_alias() is None:
+        return
+    timeout = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    cache.set_many({get_pin_key(scope): True for scope in scopes}, timeout=timeout)
+
+
+async def apin(*scopes):
+    if get_replica_alias() is None:
+        return
+    timeout = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    await cache.aset_many({get_pin_key(scope): True for scope in scopes}, timeout=timeout)
+
+
+def is_pinned(*scopes):
+    return bool(cache.get_many([get_pin_key(scope) for scope in scopes]))
+
+
+async def ais_pinned(*scopes):
+    return bool(await cache.aget_many([get_pin_key(scope) for scope in scopes]))
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica while the current request allows it (see
+    ReplicaReadMixin), and everything else to the primary. Once a request writes,
+    its later reads go to the primary as well.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if state is not None and state.replica and not state.wrote:
+            return get_replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary; it is never migrated on its own
+        return db != get_replica_alias()
+
+
+class ReplicaReadMixin:
+    """
+    Serves safe requests from the read replica once authentication, permission and
+    throttle checks are done. Users are pinned to the primary for a short window after
+    they write through the view, and `replica_pin_scopes` name shared data (such as
+    the menu) whose writes pin every reader. The async views (see async_views) apply
+    the same checks through can_read_replica() and get_replica_pin_scopes().
+    """
+    replica_pin_scopes = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        state = RoutingState()
+        token = current_state.set(state)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            current_state.reset(token)
+
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin(get_user_scope(user.pk))
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.can_read_replica(request):
+            scopes = self.get_replica_pin_scopes(request)
+            current_state.get().replica = not (scopes and is_pinned(*scopes))
+
+    def can_read_replica(self, request):
+        return request.method in SAFE_METHODS and get_replica_alias() is not None
+
+    def get_replica_pin_scopes(self, request):
+        scopes = list(self.replica_pin_scopes)
+        if request.user.is_authenticated:
+            scopes.append(get_user_scope(request.user.pk))
+        return scopes
@@ -0,0 +1,59 @@
+from functools import lru_cache
+from django.db import connections
+from django.db.models import F
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+from . import models
+
+
+FTS_TABLE = models.MenuItemSearch._meta.db_table
+
+
+@lru_cache(maxsize=None)
+def has_fts_table(alias, name):
+    """
+    Whether the database has the full-text index, which migration 0004 leaves out
+    when SQLite is built without FTS5. Checked once per database, on the raw
+    connection, so it is not counted as a request query.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return False
+    connection.ensure_connection()
+    row = connection.connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [FTS_TABLE]
+    ).fetchone()
+    return row is not None
+
+
+class MenuSearchFilter(SearchFilter):
+    """
+    Ranked full-text search over menu item and category titles, using the FTS5 index
+    created by migration 0004 on SQLite. Every search term also matches as a prefix
+    ("chick" finds "Chicken"), for type-ahead. Results are ordered by relevance unless
+    an ordering is requested. Databases without the index fall back to SearchFilter.
+    """
+
+    def has_index(self, connection):
+        return has_fts_table(connection.alias, connection.settings_dict['NAME'])
+
+    def filter_queryset(self, request, queryset, view):
+        if not self.has_index(connections[queryset.db]):
+            return super().filter_queryset(request, queryset, view)
+
+        query = self.get_match_query(self.get_search_terms(request))
+        if not query:
+            return queryset
+
+        # Join the index once. A correlated subquery would run the MATCH again for every
+        # row. FTS5 compares its table-named column with a query as MATCH does.
+        queryset = queryset.filter(search_index__document=query)
+        if api_settings.ORDERING_PARAM in request.query_params:
+            return queryset
+        # The index's rank is bm25() with title matches weighted above category matches
+        return queryset.annotate(search_rank=F('search_index__rank')).order_by('search_rank', 'id')
+
+    def get_match_query(self, terms):
+        # Quote every term, so FTS5 operators in user input are matched literally
+        terms = [term.replace('"', '') for term in terms]
+        return ' '.join(f'"{term}"*' for term in terms if term.strip())
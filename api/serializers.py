@@ -1,8 +1,12 @@
 from django.contrib.auth.models import User
+from django.db import connections, router, transaction
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
+from datetime import date, timedelta
 from decimal import Decimal
+from functools import partial
 from . import models
+from .fieldsets import SparseFieldsMixin
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -11,7 +15,9 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'title']
 
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'category': partial(serializers.PrimaryKeyRelatedField, read_only=True)}
+
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=models.Category.objects.all().order_by('id'), source='category', write_only=True
     )
@@ -71,6 +77,196 @@ class CartSerializer(serializers.ModelSerializer):
 
         return cart_item
 
+    def update(self, instance, validated_data):
+        # Keep the stored prices in line with the quantity, as create() does
+        menuitem = validated_data.get('menuitem', instance.menuitem)
+        validated_data['unit_price'] = menuitem.price
+        validated_data['price'] = menuitem.price * validated_data.get('quantity', instance.quantity)
+        return super().update(instance, validated_data)
+
+
+class CartBulkListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+
+        # Resolve every menu item in one query, instead of one per item
+        menuitems = models.MenuItem.objects.in_bulk({item['menuitem_id'] for item in items})
+        errors = [
+            {} if item['menuitem_id'] in menuitems else
+            {'menuitem_id': [f'Invalid pk "{item["menuitem_id"]}" - object does not exist.']}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        # Merge repeated menu items, which a single upsert cannot touch twice
+        merged = {}
+        for item in items:
+            if item['menuitem_id'] in merged:
+                merged[item['menuitem_id']]['quantity'] += item['quantity']
+            else:
+                merged[item['menuitem_id']] = {'menuitem': menuitems[item['menuitem_id']], 'quantity': item['quantity']}
+
+        errors = [{} for item in items]
+        for index, item in enumerate(items):
+            line = merged[item['menuitem_id']]
+            if error := self.check_line(line['menuitem'], line['quantity']):
+                errors[index] = {'quantity': [error]}
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return list(merged.values())
+
+    def check_line(self, menuitem, quantity):
+        """
+        Returns why a cart line with this quantity of the menu item cannot be stored,
+        or None if it fits the quantity and price columns.
+        """
+        max_quantity = self.child.fields['quantity'].max_value
+        if quantity > max_quantity:
+            return f'The total quantity of this menu item in the cart would be {quantity}, more than {max_quantity}.'
+        price_field = models.Cart._meta.get_field('price')
+        max_price = Decimal(10) ** (price_field.max_digits - price_field.decimal_places) - Decimal(10) ** -price_field.decimal_places
+        if menuitem.price * quantity > max_price:
+            return f'The price of this menu item in the cart would be {menuitem.price * quantity}, more than {max_price}.'
+        return None
+
+    def create(self, validated_data):
+        """
+        Adds the items to the user's cart with one INSERT ... ON CONFLICT statement,
+        adding to the quantity of items already in the cart. Prices are taken from
+        the current menu item prices.
+        """
+        user = validated_data[0]['user']
+        connection = connections[router.db_for_write(models.Cart)]
+        qn = connection.ops.quote_name
+        opts = models.Cart._meta
+        table = qn(opts.db_table)
+        unit_price_field = opts.get_field('unit_price')
+        price_field = opts.get_field('price')
+
+        params = []
+        for item in validated_data:
+            menuitem = item['menuitem']
+            params += [
+                user.pk,
+                menuitem.pk,
+                item['quantity'],
+                unit_price_field.get_db_prep_save(menuitem.price, connection),
+                price_field.get_db_prep_save(menuitem.price * item['quantity'], connection),
+            ]
+
+        user_id, menuitem_id, quantity, unit_price, price = (
+            qn(opts.get_field(name).column) for name in ('user', 'menuitem', 'quantity', 'unit_price', 'price')
+        )
+        sql = (
+            f'INSERT INTO {table} ({user_id}, {menuitem_id}, {quantity}, {unit_price}, {price}) '
+            f'VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(validated_data))} '
+            f'ON CONFLICT ({user_id}, {menuitem_id}) DO UPDATE SET '
+            f'{quantity} = {table}.{quantity} + excluded.{quantity}, '
+            f'{unit_price} = excluded.{unit_price}, '
+            f'{price} = excluded.{unit_price} * ({table}.{quantity} + excluded.{quantity})'
+        )
+
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            # The upsert adds to the quantities already in the cart, which must still fit the columns
+            existing = dict(
+                models.Cart.objects.using(connection.alias).select_for_update().filter(
+                    user=user, menuitem__in=[item['menuitem'] for item in validated_data]
+                ).values_list('menuitem', 'quantity')
+            )
+            errors = [
+                f'Menu item {item["menuitem"].pk}: {error}' for item in validated_data
+                if (error := self.check_line(item['menuitem'], existing.get(item['menuitem'].pk, 0) + item['quantity']))
+            ]
+            if errors:
+                raise serializers.ValidationError(errors)
+
+            cursor.execute(sql, params)
+            return list(
+                models.Cart.objects.using(connection.alias).select_related('menuitem').filter(
+                    user=user, menuitem__in=[item['menuitem'] for item in validated_data]
+                ).order_by('id')
+            )
+
+
+class CartBulkSerializer(serializers.Serializer):
+    menuitem_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767)
+
+    class Meta:
+        list_serializer_class = CartBulkListSerializer
+
+
+class CartSummaryLineSerializer(serializers.ModelSerializer):
+    menuitem_id = serializers.IntegerField()
+    title = serializers.CharField(source='menuitem.title')
+
+    class Meta:
+        model = models.Cart
+        fields = ['id', 'menuitem_id', 'title', 'quantity', 'unit_price', 'price']
+
+
+class CartSummarySerializer(serializers.Serializer):
+    lines = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    items = CartSummaryLineSerializer(many=True, required=False)
+
+
+class MenuImportListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        rows = super().to_internal_value(data)
+
+        # Resolve every category and existing menu item in one query each
+        categories = models.Category.objects.in_bulk({row['category_id'] for row in rows})
+        menuitems = models.MenuItem.objects.in_bulk({row['id'] for row in rows if row.get('id') is not None})
+
+        errors = []
+        seen_ids = set()
+        for row in rows:
+            row_errors = {}
+            if row['category_id'] not in categories:
+                row_errors['category_id'] = [f'Invalid pk "{row["category_id"]}" - object does not exist.']
+            else:
+                row['category'] = categories[row['category_id']]
+
+            menuitem_id = row.get('id')
+            if menuitem_id is not None:
+                if menuitem_id not in menuitems:
+                    row_errors['id'] = [f'Invalid pk "{menuitem_id}" - object does not exist.']
+                elif menuitem_id in seen_ids:
+                    row_errors['id'] = ['This menu item appears more than once.']
+                else:
+                    row['menuitem'] = menuitems[menuitem_id]
+                seen_ids.add(menuitem_id)
+            errors.append(row_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+
+
+class MenuImportSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False, allow_null=True)
+    title = serializers.CharField(max_length=255)
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=Decimal('0.00'))
+    category_id = serializers.IntegerField()
+    # Left out, it keeps the current value of updated items, and is False for new ones
+    featured = serializers.BooleanField(required=False)
+
+    class Meta:
+        list_serializer_class = MenuImportListSerializer
+
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    def get_attribute(self, instance):
+        # Items created with the order in the same request are passed in the context
+        # (see OrderView.perform_create), instead of being read back
+        created = self.context.get('order_items', {}).get(instance.pk)
+        if created is not None:
+            return created
+        return super().get_attribute(instance)
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
     order_id = serializers.PrimaryKeyRelatedField(
@@ -85,6 +281,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.OrderItem
         fields = ['id', 'order_id', 'menuitem', 'menuitem_id', 'quantity', 'unit_price', 'price']
+        list_serializer_class = OrderItemListSerializer
 
         validators = [
             UniqueTogetherValidator(
@@ -101,7 +298,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
         }
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'order_items': None}
+
     user = serializers.StringRelatedField(read_only=True)
     delivery_crew = serializers.StringRelatedField(read_only=True)
     delivery_crew_id = serializers.PrimaryKeyRelatedField(
@@ -119,8 +318,64 @@ class OrderSerializer(serializers.ModelSerializer):
         }
 
 
+class OrderBatchUpdateSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
+    status = serializers.BooleanField(required=False)
+    delivery_crew_id = serializers.PrimaryKeyRelatedField(
+        queryset=models.User.objects.all(), source='delivery_crew', allow_null=True, required=False
+    )
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+    def validate(self, attrs):
+        if 'status' not in attrs and 'delivery_crew' not in attrs:
+            raise serializers.ValidationError('Provide status, delivery_crew_id or both.')
+        return attrs
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
         read_only_fields = ['email']
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    top = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    default_days = 30
+
+    def validate(self, attrs):
+        # Orders are dated with date.today() (auto_now_add), so the default range is too
+        attrs['end'] = attrs.get('end') or date.today()
+        attrs['start'] = attrs.get('start') or attrs['end'] - timedelta(days=self.default_days - 1)
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'start': ['Start date must not be after the end date.']})
+        return attrs
+
+
+class DailyRevenueSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    orders = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class MenuItemSalesSerializer(serializers.Serializer):
+    menuitem_id = serializers.IntegerField()
+    title = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class CrewDeliveriesSerializer(serializers.Serializer):
+    delivery_crew_id = serializers.IntegerField()
+    username = serializers.CharField()
+    delivered = serializers.IntegerField()
+
+
+class OrderEventsQuerySerializer(serializers.Serializer):
+    wait = serializers.IntegerField(min_value=0, max_value=30, default=25)
+    after = serializers.IntegerField(min_value=0, required=False)
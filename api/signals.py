@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User, Group
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from . import authentication
+from . import models
+from . import roles
+from . import request_stats
+from .caching import bump_menu_version, is_shared_cache
+
+
+@receiver([post_save, post_delete], sender=models.Category)
+@receiver([post_save, post_delete], sender=models.MenuItem)
+def invalidate_menu_cache(sender, **kwargs):
+    # Any menu write (API views, admin or shell) makes cached menu responses stale
+    bump_menu_version()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Counts queries and their time for request_stats; the wrapper list outlives reconnects
+    if request_stats.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(request_stats.record_query)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    # PRAGMAS from the database settings (see SQLITE_PRODUCTION_PROFILE). They are run on
+    # the raw connection, so they are not counted as queries.
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in connection.settings_dict.get('PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if isinstance(instance, User) and action.startswith('post_'):
+        instance.__dict__.pop('_group_names', None)
+    # Group names and tokens are only cached in a shared cache, so there is nothing to
+    # invalidate otherwise, and the users and tokens need not be looked up
+    if not is_shared_cache():
+        return
+
+    if action == 'pre_clear' and not isinstance(instance, User):
+        # group.user_set.clear() does not say which users it removed
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+        return
+    # Invalidate after the change, so a concurrent request cannot cache the old groups again
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if isinstance(instance, User):
+        user_ids = [instance.pk]
+    elif action == 'post_clear':
+        user_ids = instance.__dict__.pop('_cleared_user_ids', [])
+    else:
+        user_ids = pk_set
+    roles.invalidate_group_names(*user_ids)
+    authentication.invalidate_user_tokens(*user_ids)
+
+
+@receiver([post_save, pre_delete], sender=Group)
+def invalidate_group_members(sender, instance, created=False, **kwargs):
+    if created or not is_shared_cache():
+        return
+    user_ids = list(instance.user_set.values_list('pk', flat=True))
+    roles.invalidate_group_names(*user_ids)
+    authentication.invalidate_user_tokens(*user_ids)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    # Logging out with djoser deletes the token
+    if is_shared_cache():
+        authentication.invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    # Deactivation, permission and profile changes; logging in only updates last_login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    if is_shared_cache():
+        authentication.invalidate_user_tokens(instance.pk)
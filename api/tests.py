@@ -0,0 +1,1691 @@
+import csv
+import json
+from asgiref.sync import async_to_sync
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import NotSupportedError, connection
+from django.db.models import Prefetch
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import generics
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from . import async_views
+from . import authentication
+from . import events
+from . import models
+from . import roles
+from . import routers
+from . import search
+from . import views
+from .assignment import CrewAssigner
+from .fast_serializers import ValuesListMixin
+from .request_stats import stats
+from .search import MenuSearchFilter
+from .throttle import GroupBasedThrottle
+
+
+def shared_cache(test):
+    # Runs the test as if the cache were shared by all worker processes, which turns on
+    # what is only cached then, and its invalidation
+    for module in ('api.authentication', 'api.cart', 'api.roles', 'api.signals'):
+        test = mock.patch(f'{module}.is_shared_cache', new=lambda: True)(test)
+    return test
+
+
+# Events are delivered in-process, without the table and its polling thread
+@override_settings(DELIVERY_EVENTS={'BACKEND': 'api.events.InMemoryPubSub'})
+class APITestCase(TestCase):
+    """
+    Base class for the API tests: throttling is turned off and the cache is cleared
+    before each test, so responses and query counts do not depend on earlier tests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(APIView, 'throttle_classes', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def create_user(self, username, group=None):
+        user = User.objects.create_user(username, password='secret')
+        if group:
+            user.groups.add(Group.objects.get_or_create(name=group)[0])
+        return user
+
+    def create_menu(self, count=5):
+        category = models.Category.objects.create(slug='mains', title='Mains')
+        return [
+            models.MenuItem.objects.create(
+                title=f'Item {i}', price=Decimal('2.50') + i, featured=i % 2 == 0, category=category
+            )
+            for i in range(count)
+        ]
+
+    def create_orders(self, user, menu_items, count, delivery_crew=None):
+        for _ in range(count):
+            order = models.Order.objects.create(user=user, delivery_crew=delivery_crew, total=Decimal('0.00'))
+            for menu_item in menu_items[:3]:
+                models.OrderItem.objects.create(
+                    order=order, menuitem=menu_item, quantity=2, unit_price=menu_item.price, price=menu_item.price * 2
+                )
+
+    def authenticate(self, user=None):
+        # A fresh user object per request, so group names cached on it do not hide queries
+        self.client.force_authenticate(User.objects.get(pk=user.pk) if user else None)
+        cache.clear()
+
+
+class OrderListQueryCountTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu()
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.delivery_crew = self.create_user('crew', roles.DELIVERY_CREW)
+        self.customer = self.create_user('customer')
+
+    def assert_constant_queries(self, user, url, counts):
+        # Group names, count, page of orders, their order items
+        for count in counts:
+            models.Order.objects.all().delete()
+            self.create_orders(self.customer, self.menu_items, count, delivery_crew=self.delivery_crew)
+            self.authenticate(user)
+            with self.assertNumQueries(4):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), count)
+
+    def test_manager(self):
+        self.assert_constant_queries(self.manager, '/api/orders/', [1, 3])
+
+    def test_delivery_crew(self):
+        self.assert_constant_queries(self.delivery_crew, '/api/orders/', [1, 3])
+
+    def test_customer(self):
+        self.assert_constant_queries(self.customer, '/api/orders/', [1, 3])
+
+    def test_order_detail(self):
+        self.create_orders(self.customer, self.menu_items, 1)
+        order = models.Order.objects.get()
+        self.authenticate(self.customer)
+        # Group names, order, its order items
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/orders/{order.pk}/')
+        self.assertEqual(len(response.data['order_items']), 3)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu()
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.customer = self.create_user('customer')
+
+    def test_large_pages_take_constant_queries(self):
+        # Keyset pages do not count the rows, and can be larger than the page size
+        for count in (2, 40):
+            models.Order.objects.all().delete()
+            self.create_orders(self.customer, self.menu_items, count)
+            self.authenticate(self.manager)
+            # Group names, page of orders, their order items
+            with self.assertNumQueries(3):
+                response = self.client.get('/api/orders/?cursor=&page_size=50')
+            self.assertEqual(len(response.data['results']), count)
+            self.assertIsNone(response.data['next'])
+
+    def test_pages_cover_every_order_once(self):
+        self.create_orders(self.customer, self.menu_items, 7)
+        self.authenticate(self.manager)
+        ids = []
+        url = '/api/orders/?cursor=&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            ids += [order['id'] for order in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, list(models.Order.objects.order_by('id').values_list('id', flat=True)))
+
+
+class RoleCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('manager', roles.MANAGER)
+
+    def get_group_names(self):
+        return roles.get_group_names(User.objects.get(pk=self.user.pk))
+
+    def test_not_cached_without_shared_cache(self):
+        self.get_group_names()
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(roles.get_group_names(user), {roles.MANAGER})
+
+    @shared_cache
+    def test_cached_with_shared_cache(self):
+        self.get_group_names()
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(roles.get_group_names(user), {roles.MANAGER})
+
+    @shared_cache
+    def test_invalidated_on_clear(self):
+        self.get_group_names()
+        self.user.groups.clear()
+        self.assertEqual(self.get_group_names(), frozenset())
+
+        self.user.groups.add(Group.objects.get(name=roles.MANAGER))
+        self.assertEqual(self.get_group_names(), {roles.MANAGER})
+        Group.objects.get(name=roles.MANAGER).user_set.clear()
+        self.assertEqual(self.get_group_names(), frozenset())
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_customer_gets_429_over_rate(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('customer', password='secret'))
+        statuses = [client.get('/api/orders/').status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    @override_settings(DELIVERY_EVENTS={'BACKEND': 'api.events.InMemoryPubSub'})
+    def test_scoped_rate(self):
+        delivery_crew = User.objects.create_user('crew', password='secret')
+        delivery_crew.groups.add(Group.objects.create(name=roles.DELIVERY_CREW))
+        client = APIClient()
+        client.force_authenticate(delivery_crew)
+        rest_framework = {**settings.REST_FRAMEWORK}
+        rest_framework['DEFAULT_THROTTLE_RATES'] = {**rest_framework['DEFAULT_THROTTLE_RATES'], 'events': '2/min'}
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            statuses = [client.get('/api/orders/events/').status_code for _ in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+            # The delivery crew rate is counted separately
+            statuses = [client.get('/api/orders/').status_code for _ in range(6)]
+            self.assertEqual(statuses, [200] * 5 + [429])
+
+    def test_stress_sqlite_store(self):
+        # Fails with CommandError unless exactly the requests over the limit are throttled
+        for algorithm in GroupBasedThrottle.algorithms:
+            with self.subTest(algorithm=algorithm):
+                call_command(
+                    'stress_throttle', store='sqlite', algorithm=algorithm, rate='50/hour', processes=4, requests=30,
+                    stdout=StringIO(),
+                )
+
+    def test_stress_cache_store(self):
+        for algorithm in GroupBasedThrottle.algorithms:
+            with self.subTest(algorithm=algorithm):
+                call_command(
+                    'stress_throttle', store='cache', algorithm=algorithm, rate='50/hour', processes=4, requests=30,
+                    stdout=StringIO(),
+                )
+
+
+class CartBulkTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu(2)
+        self.customer = self.create_user('customer')
+        self.client.force_authenticate(self.customer)
+
+    def test_merges_repeated_items(self):
+        response = self.client.post(
+            '/api/cart/menu-items/', [{'menuitem_id': self.menu_items[0].pk, 'quantity': 2}] * 2, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(models.Cart.objects.get().quantity, 4)
+
+    def test_rejects_merged_quantity_over_limit(self):
+        cheap = self.menu_items[0]
+        cheap.price = Decimal('0.01')
+        cheap.save()
+        response = self.client.post(
+            '/api/cart/menu-items/', [{'menuitem_id': cheap.pk, 'quantity': 20000}] * 2, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.data[0])
+        self.assertFalse(models.Cart.objects.exists())
+
+    def test_rejects_quantity_added_to_cart_over_limit(self):
+        cheap = self.menu_items[0]
+        cheap.price = Decimal('0.01')
+        cheap.save()
+        models.Cart.objects.create(
+            user=self.customer, menuitem=cheap, quantity=30000, unit_price=cheap.price, price=cheap.price * 30000
+        )
+        response = self.client.post('/api/cart/menu-items/', [{'menuitem_id': cheap.pk, 'quantity': 5000}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(models.Cart.objects.get().quantity, 30000)
+
+    def test_rejects_price_over_limit(self):
+        response = self.client.post(
+            '/api/cart/menu-items/', [{'menuitem_id': self.menu_items[0].pk, 'quantity': 5000}], format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.Cart.objects.exists())
+
+
+class MenuImportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu(2)
+        self.client.force_authenticate(self.create_user('manager', roles.MANAGER))
+
+    def test_update_without_featured_keeps_it(self):
+        featured = self.menu_items[0]
+        row = {'id': featured.pk, 'title': featured.title, 'price': '9.99', 'category_id': featured.category_id}
+        response = self.client.post('/api/menu-items/import/?dry_run=true', [row], format='json')
+        self.assertEqual(response.data['changes'], [{'action': 'update', 'id': featured.pk, 'changes': {'price': ['2.50', '9.99']}}])
+
+        response = self.client.post('/api/menu-items/import/', [row], format='json')
+        self.assertEqual(response.data['updated'], 1)
+        featured.refresh_from_db()
+        self.assertTrue(featured.featured)
+        self.assertEqual(featured.price, Decimal('9.99'))
+
+    def test_create_without_featured(self):
+        row = {'title': 'New', 'price': '1.00', 'category_id': self.menu_items[0].category_id}
+        response = self.client.post('/api/menu-items/import/', [row], format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertFalse(models.MenuItem.objects.get(title='New').featured)
+
+
+def serializer_list(self, request, *args, **kwargs):
+    return generics.ListAPIView.list(self, request, *args, **kwargs)
+
+
+class ValuesSerializerParityTests(APITestCase):
+    """
+    List views serialize values() rows with ValuesListMixin. Their responses must be
+    byte for byte the same as the view's DRF serializer would produce.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu(7)
+        drinks = models.Category.objects.create(slug='drinks', title='Drinks')
+        models.MenuItem.objects.create(title='Lemonade', price=Decimal('3.00'), featured=True, category=drinks)
+
+        self.customer = self.create_user('customer')
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.delivery_crew = self.create_user('crew', roles.DELIVERY_CREW)
+        self.create_orders(self.customer, self.menu_items, 4, delivery_crew=self.delivery_crew)
+        self.create_orders(self.customer, self.menu_items[2:], 3)
+        models.Order.objects.filter(pk__in=[2, 5]).update(status=True, total=Decimal('12.50'))
+        for menu_item in self.menu_items[:4]:
+            models.Cart.objects.create(
+                user=self.customer, menuitem=menu_item, quantity=3, unit_price=menu_item.price, price=menu_item.price * 3
+            )
+
+    def assert_parity(self, user, url):
+        self.authenticate(user)
+        values_response = self.client.get(url)
+        cache.clear()
+        with mock.patch.object(ValuesListMixin, 'list', serializer_list):
+            serializer_response = self.client.get(url)
+
+        self.assertEqual(values_response.status_code, 200, url)
+        self.assertEqual(serializer_response.status_code, 200, url)
+        self.assertEqual(values_response.content, serializer_response.content, url)
+        return values_response.json()
+
+    def assert_all_pages(self, user, url):
+        while url:
+            url = self.assert_parity(user, url)['next']
+
+    def test_categories(self):
+        for user in (None, self.customer, self.manager):
+            self.assert_all_pages(user, '/api/categories/')
+            self.assert_parity(user, '/api/categories/?ordering=-title')
+
+    def test_menu_items(self):
+        urls = [
+            '/api/menu-items/',
+            '/api/menu-items/?ordering=-price',
+            '/api/menu-items/?ordering=title&page=2',
+            '/api/menu-items/?search=item',
+            '/api/menu-items/?search=drinks',
+            '/api/menu-items/?cursor=',
+            '/api/menu-items/?cursor=&page_size=5',
+        ]
+        for user in (None, self.customer, self.delivery_crew, self.manager):
+            for url in urls:
+                self.assert_parity(user, url)
+        self.assert_all_pages(None, '/api/menu-items/')
+        self.assert_all_pages(None, '/api/menu-items/?cursor=&page_size=2')
+
+    def test_cart(self):
+        for url in ['/api/cart/menu-items/', '/api/cart/menu-items/?page=2', '/api/cart/menu-items/?cursor=&page_size=3']:
+            self.assert_all_pages(self.customer, url)
+
+    def test_orders(self):
+        urls = [
+            '/api/orders/',
+            '/api/orders/?page=2',
+            '/api/orders/?status=true',
+            '/api/orders/?status=false&ordering=-id',
+            '/api/orders/?ordering=-total',
+            '/api/orders/?cursor=',
+            '/api/orders/?cursor=&page_size=2',
+        ]
+        for user in (self.customer, self.delivery_crew, self.manager):
+            for url in urls:
+                self.assert_parity(user, url)
+            self.assert_all_pages(user, '/api/orders/?cursor=&page_size=2')
+
+
+# The primary stands in for the replica, and the router reports which one it chose
+@mock.patch('api.routers.get_replica_alias', return_value='replica')
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = self.create_user('customer')
+        self.create_orders(self.customer, self.create_menu(), 2)
+        self.token = Token.objects.create(user=self.customer)
+
+        self.order_reads = []
+        db_for_read = routers.ReplicaRouter.db_for_read
+
+        def record_read(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            if model is models.Order:
+                self.order_reads.append(alias)
+            return None
+
+        patcher = mock.patch.object(routers.ReplicaRouter, 'db_for_read', record_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url, asgi=False):
+        self.order_reads.clear()
+        headers = {'Authorization': f'Token {self.token.key}'}
+        if not asgi:
+            return self.client.get(url, headers=headers)
+        with override_settings(ROOT_URLCONF='littlelemon.asgi_urls'):
+            return async_to_sync(self.aget)(url, headers)
+
+    async def aget(self, url, headers):
+        return await AsyncClient().get(url, headers=headers)
+
+    def test_reads_from_replica(self, get_replica_alias):
+        for asgi in (False, True):
+            for url in ('/api/orders/', '/api/orders/1/'):
+                with self.subTest(url=url, asgi=asgi):
+                    self.assertEqual(self.get(url, asgi).status_code, 200)
+                    self.assertEqual(set(self.order_reads), {'replica'})
+
+    def test_pinned_user_reads_from_primary(self, get_replica_alias):
+        routers.pin(routers.get_user_scope(self.customer.pk))
+        for asgi in (False, True):
+            for url in ('/api/orders/', '/api/orders/1/'):
+                with self.subTest(url=url, asgi=asgi):
+                    self.assertEqual(self.get(url, asgi).status_code, 200)
+                    self.assertEqual(set(self.order_reads), {None})
+
+
+class TokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('customer')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_not_cached_without_shared_cache(self):
+        self.client.get('/api/cart/menu-items/')
+        # Token, group names, and the count of the empty cart
+        with self.assertNumQueries(3):
+            self.client.get('/api/cart/menu-items/')
+
+    @shared_cache
+    def test_cached_with_shared_cache(self):
+        self.client.get('/api/cart/menu-items/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/cart/menu-items/').status_code, 200)
+
+    @shared_cache
+    def test_logout_and_deactivation_take_effect(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items/').status_code, 200)
+        self.client.post('/auth/token/logout/')
+        self.assertEqual(self.client.get('/api/cart/menu-items/').status_code, 401)
+
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get('/api/cart/menu-items/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/cart/menu-items/').status_code, 401)
+
+    @shared_cache
+    def test_cached_entry(self):
+        self.client.get('/api/cart/menu-items/')
+        # Plain values, not the pickled token and user
+        entry = cache.get(authentication.get_cache_key(self.token.key))
+        self.assertEqual(entry, ((self.user.pk, True, False, False), frozenset()))
+
+        # Fields left out of the entry are loaded when read
+        response = self.client.get('/auth/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'customer')
+
+    @shared_cache
+    def test_group_changes_take_effect(self):
+        self.assertEqual(self.client.get('/api/stats/requests/').status_code, 403)
+        manager = Group.objects.create(name=roles.MANAGER)
+        self.user.groups.add(manager)
+        self.assertEqual(self.client.get('/api/stats/requests/').status_code, 200)
+        manager.user_set.clear()
+        self.assertEqual(self.client.get('/api/stats/requests/').status_code, 403)
+
+    def test_nothing_to_invalidate_without_shared_cache(self):
+        group = Group.objects.create(name=roles.MANAGER)
+        # The write only, without looking up the tokens and group members to invalidate
+        with self.assertNumQueries(1):
+            self.user.save()
+        with self.assertNumQueries(1):
+            group.save()
+        with self.assertNumQueries(1):
+            group.user_set.clear()
+
+
+class OrderEventsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.delivery_crew = self.create_user('crew', roles.DELIVERY_CREW)
+        self.notifier = events.get_notifier()
+
+    def test_wsgi_returns_without_waiting(self):
+        self.client.force_authenticate(self.delivery_crew)
+        self.notifier.publish(self.delivery_crew.pk, 'order.assigned', {'order': 1, 'status': False})
+        after = self.notifier.recent[self.delivery_crew.pk][-1]['id'] - 1
+
+        with mock.patch.object(events.Subscription, 'wait', autospec=True, side_effect=events.Subscription.wait) as wait:
+            response = self.client.get(f'/api/orders/events/?wait=30&after={after}')
+        self.assertEqual(wait.call_args.args[1], 0)
+        self.assertEqual([event['type'] for event in response.data['events']], ['order.assigned'])
+
+    async def test_stream_subscribes_before_first_chunk(self):
+        view = async_views.OrderEventsView()
+        view.heartbeat = 0.1
+        stream = view.stream(self.delivery_crew.pk, None)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+
+        self.notifier.publish(self.delivery_crew.pk, 'order.assigned', {'order': 1, 'status': False})
+        self.assertIn('event: order.assigned', await anext(stream))
+        await stream.aclose()
+
+
+class DatabasePubSubTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.delivery_crew = self.create_user('crew', roles.DELIVERY_CREW)
+
+    def create_notifier(self, **options):
+        # One notifier per process, polled by hand
+        return events.Notifier(events.DatabasePubSub(poll_interval=None, **options))
+
+    def subscribe(self, notifier, after=None):
+        received = []
+        notifier.subscribe(self.delivery_crew.pk, received.append, after)
+        return received
+
+    def test_reaches_other_processes(self):
+        publisher, other = self.create_notifier(), self.create_notifier()
+        published, received = self.subscribe(publisher), self.subscribe(other)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publisher.publish(self.delivery_crew.pk, 'order.assigned', {'order': 1, 'status': False})
+        self.assertEqual([message['type'] for message in published], ['order.assigned'])
+        self.assertEqual(received, [])
+
+        with self.assertNumQueries(1):
+            other.pubsub.poll()
+        self.assertEqual(received, published)
+        # Each message is delivered once, and not again to the process that published it
+        other.pubsub.poll()
+        publisher.pubsub.poll()
+        self.assertEqual(len(received), 1)
+        self.assertEqual(len(published), 1)
+
+        # Later processes start from the messages published once they listen
+        late = self.create_notifier()
+        late_received = self.subscribe(late)
+        late.pubsub.poll()
+        self.assertEqual(late_received, [])
+        publisher.publish(self.delivery_crew.pk, 'order.status', {'order': 1, 'status': True})
+        late.pubsub.poll()
+        other.pubsub.poll()
+        self.assertEqual([message['type'] for message in late_received], ['order.status'])
+        self.assertEqual([message['type'] for message in received], ['order.assigned', 'order.status'])
+
+        # And keep them for clients that reconnect with the last event id they saw
+        self.assertEqual(self.subscribe(other, after=received[0]['id']), [])
+        self.assertEqual(other.subscribe(self.delivery_crew.pk, lambda message: None, received[0]['id']), received[1:])
+
+    def test_order_updates_reach_other_processes(self):
+        customer = self.create_user('customer')
+        self.create_orders(customer, self.create_menu(), 1)
+        order = models.Order.objects.get()
+        with override_settings(DELIVERY_EVENTS={'BACKEND': 'api.events.DatabasePubSub', 'OPTIONS': {'poll_interval': None}}):
+            other = self.create_notifier()
+            received = self.subscribe(other)
+            self.authenticate(self.create_user('manager', roles.MANAGER))
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f'/api/orders/{order.pk}/', {'delivery_crew_id': self.delivery_crew.pk})
+            self.assertEqual(response.status_code, 200)
+            other.pubsub.poll()
+
+        self.assertEqual(received, [models.DeliveryEvent.objects.get().message])
+        self.assertEqual(received[0]['type'], 'order.assigned')
+        self.assertEqual(received[0]['data'], {'order': order.pk, 'status': False})
+
+    def test_prunes_old_messages(self):
+        notifier = self.create_notifier(retention=60)
+        notifier.publish(self.delivery_crew.pk, 'order.assigned', {'order': 1, 'status': False})
+        notifier.publish(self.delivery_crew.pk, 'order.assigned', {'order': 2, 'status': False})
+        old = models.DeliveryEvent.objects.order_by('id').first()
+        models.DeliveryEvent.objects.filter(pk=old.pk).update(created=old.created - timedelta(seconds=61))
+
+        notifier.pubsub.poll()
+        self.assertEqual(models.DeliveryEvent.objects.count(), 2)
+        notifier.pubsub.pruned -= events.DatabasePubSub.prune_interval
+        notifier.pubsub.poll()
+        self.assertEqual(list(models.DeliveryEvent.objects.values_list('message__data__order', flat=True)), [2])
+
+    def test_polls_from_one_thread(self):
+        with mock.patch.object(events.threading, 'Thread') as thread:
+            self.assertIsNone(self.create_notifier().pubsub.thread)
+            notifier = events.Notifier(events.DatabasePubSub(poll_interval=0.5))
+            notifier.subscribe(self.delivery_crew.pk, lambda message: None)
+            notifier.subscribe(self.delivery_crew.pk, lambda message: None)
+        thread.assert_called_once_with(target=notifier.pubsub.run, name='delivery-events', daemon=True)
+        thread.return_value.start.assert_called_once_with()
+
+class SparseFieldsetTests(APITestCase):
+    # query string: (keys, whether category is nested, whether the category table is read)
+    menu_item_fieldsets = {
+        '': (['id', 'title', 'price', 'category', 'featured'], True),
+        'fields=id,title': (['id', 'title'], None),
+        'fields=id,category': (['id', 'category'], True),
+        'expand=': (['id', 'title', 'price', 'category', 'featured'], False),
+        'expand=category': (['id', 'title', 'price', 'category', 'featured'], True),
+        'fields=id,category&expand=': (['id', 'category'], False),
+        'fields=price,featured&expand=category': (['price', 'featured'], None),
+    }
+    # query string: (keys, whether order items are read)
+    order_fieldsets = {
+        '': (['id', 'user', 'delivery_crew', 'order_items', 'status', 'total', 'date'], True),
+        'fields=id,status,total': (['id', 'status', 'total'], False),
+        'expand=': (['id', 'user', 'delivery_crew', 'status', 'total', 'date'], False),
+        'expand=order_items': (['id', 'user', 'delivery_crew', 'order_items', 'status', 'total', 'date'], True),
+        'fields=id,order_items': (['id', 'order_items'], True),
+        'fields=id,order_items&expand=': (['id'], False),
+        'fields=user,delivery_crew': (['user', 'delivery_crew'], False),
+        'fields=date&expand=order_items': (['date'], False),
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu()
+        self.customer = self.create_user('customer')
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.delivery_crew = self.create_user('crew', roles.DELIVERY_CREW)
+        self.create_orders(self.customer, self.menu_items, 3, delivery_crew=self.delivery_crew)
+
+    def get(self, url, queries, user=None):
+        self.authenticate(user)
+        with self.assertNumQueries(queries) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, ' '.join(query['sql'] for query in context.captured_queries)
+
+    def assert_menu_item(self, data, keys, nested):
+        self.assertEqual(list(data), keys)
+        if 'category' in keys:
+            self.assertEqual(data['category'], {'id': 1, 'title': 'Mains'} if nested else 1)
+
+    def test_menu_items(self):
+        full_size = None
+        for query, (keys, nested) in self.menu_item_fieldsets.items():
+            with self.subTest(query=query):
+                # Count and page
+                response, sql = self.get(f'/api/menu-items/?{query}', 2)
+                for data in response.data['results']:
+                    self.assert_menu_item(data, keys, nested)
+                self.assertEqual('api_category' in sql, bool(nested))
+
+                full_size = full_size or len(response.content)
+                if keys != self.menu_item_fieldsets[''][0] or nested is False:
+                    self.assertLess(len(response.content), full_size)
+
+    def test_menu_item_detail(self):
+        for query, (keys, nested) in self.menu_item_fieldsets.items():
+            with self.subTest(query=query):
+                response, sql = self.get(f'/api/menu-items/1/?{query}', 1)
+                self.assert_menu_item(response.data, keys, nested)
+                self.assertEqual('api_category' in sql, bool(nested))
+
+    def test_orders(self):
+        full_size = None
+        for query, (keys, items) in self.order_fieldsets.items():
+            with self.subTest(query=query):
+                # Group names, count, page, and the order items if they are returned
+                response, sql = self.get(f'/api/orders/?{query}', 4 if items else 3, self.manager)
+                for data in response.data['results']:
+                    self.assertEqual(list(data), keys)
+                    if items:
+                        self.assertEqual(len(data['order_items']), 3)
+                self.assertEqual('api_orderitem' in sql, items)
+                self.assertEqual('auth_user' in sql.split('"api_order"', 1)[1], 'user' in keys)
+
+                full_size = full_size or len(response.content)
+                if query and query != 'expand=order_items':
+                    self.assertLess(len(response.content), full_size)
+
+    def test_order_detail(self):
+        for query, (keys, items) in self.order_fieldsets.items():
+            with self.subTest(query=query):
+                # Group names, order, and its order items if they are returned
+                response, sql = self.get(f'/api/orders/1/?{query}', 3 if items else 2, self.customer)
+                self.assertEqual(list(response.data), keys)
+                self.assertEqual('api_orderitem' in sql, items)
+
+    def test_rejects_unknown_names(self):
+        self.authenticate(self.manager)
+        response = self.client.get('/api/orders/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+        self.assertEqual(self.client.get('/api/orders/1/?expand=user').status_code, 400)
+        self.assertEqual(self.client.get('/api/menu-items/?fields=category_id').status_code, 400)
+
+    def test_writes_return_every_field(self):
+        self.authenticate(self.manager)
+        response = self.client.patch('/api/orders/1/?fields=id', {'status': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), self.order_fieldsets[''][0])
+
+
+class CheckoutTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu()
+        self.customer = self.create_user('customer')
+
+    def fill_cart(self, count):
+        for menu_item in self.menu_items[:count]:
+            models.Cart.objects.create(
+                user=self.customer, menuitem=menu_item, quantity=2, unit_price=menu_item.price, price=menu_item.price * 2
+            )
+
+    def test_creates_order_from_cart(self):
+        self.fill_cart(3)
+        self.authenticate(self.customer)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        order = models.Order.objects.get()
+        self.assertEqual(order.user, self.customer)
+        self.assertEqual(order.total, Decimal('21.00'))
+        self.assertEqual(response.data['total'], '21.00')
+        self.assertEqual(
+            [(item['menuitem'], item['quantity'], item['price']) for item in response.data['order_items']],
+            [('Item 0', 2, '5.00'), ('Item 1', 2, '7.00'), ('Item 2', 2, '9.00')],
+        )
+        self.assertEqual(
+            [item['id'] for item in response.data['order_items']],
+            list(order.orderitem_set.order_by('id').values_list('id', flat=True)),
+        )
+        self.assertFalse(models.Cart.objects.exists())
+
+    def test_queries_do_not_grow_with_the_cart(self):
+        for count in (1, 5):
+            with self.subTest(count=count):
+                self.fill_cart(count)
+                self.authenticate(self.customer)
+                # Cart check, group names, savepoint, locked cart, order, order items, daily
+                # and menu item sales upserts, cart delete, release; the response reads nothing
+                with self.assertNumQueries(10):
+                    response = self.client.post('/api/orders/')
+                self.assertEqual(len(response.data['order_items']), count)
+
+    def test_empty_cart(self):
+        self.authenticate(self.customer)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'detail': 'Cart is empty.'})
+        self.assertFalse(models.Order.objects.exists())
+
+
+class MenuCacheTests(APITestCase):
+    urls = ['/api/menu-items/', '/api/menu-items/?page=2', '/api/categories/']
+
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu()
+        self.manager = self.create_user('manager', roles.MANAGER)
+
+    def get_etags(self):
+        return {url: self.client.get(url)['ETag'] for url in self.urls}
+
+    def assert_etags_changed(self, etags):
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag, url)
+
+    def as_manager(self, method, url, data):
+        # Without authenticate(), which would clear the cache
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.client.force_authenticate(None)
+        return response
+
+    def test_not_modified_without_queries(self):
+        for url, etag in self.get_etags().items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+
+    def test_cached_without_queries(self):
+        data = {url: self.client.get(url).data for url in self.urls}
+        for url in self.urls:
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.data, data[url])
+
+    def test_menu_write_changes_etag(self):
+        etags = self.get_etags()
+        response = self.as_manager('post', '/api/menu-items/', {
+            'title': 'New', 'price': '1.00', 'category_id': self.menu_items[0].category_id, 'featured': False,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assert_etags_changed(etags)
+        self.assertEqual(self.client.get('/api/menu-items/?page=2').data['results'][-1]['title'], 'New')
+
+    def test_category_write_changes_etag(self):
+        etags = self.get_etags()
+        category = self.menu_items[0].category
+        self.assertEqual(self.as_manager('patch', f'/api/categories/{category.pk}/', {'title': 'Dinner'}).status_code, 200)
+        self.assert_etags_changed(etags)
+        self.assertEqual(self.client.get('/api/categories/').data['results'][0]['title'], 'Dinner')
+
+    def test_import_changes_etag(self):
+        etags = self.get_etags()
+        menu_item = self.menu_items[0]
+        response = self.as_manager('post', '/api/menu-items/import/', [{
+            'id': menu_item.pk, 'title': menu_item.title, 'price': '9.99', 'category_id': menu_item.category_id,
+        }])
+        self.assertEqual(response.data['updated'], 1)
+        self.assert_etags_changed(etags)
+        self.assertEqual(self.client.get('/api/menu-items/').data['results'][0]['price'], '9.99')
+
+    def test_dry_run_import_keeps_etag(self):
+        etags = self.get_etags()
+        menu_item = self.menu_items[0]
+        self.as_manager('post', '/api/menu-items/import/?dry_run=true', [{
+            'id': menu_item.pk, 'title': menu_item.title, 'price': '9.99', 'category_id': menu_item.category_id,
+        }])
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class AsyncViewTests(APITestCase):
+    """
+    The async views served under ASGI (littlelemon.asgi_urls) must return what the
+    synchronous views return, with the same queries.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu(7)
+        self.customer = self.create_user('customer')
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.delivery_crew = self.create_user('crew', roles.DELIVERY_CREW)
+        self.create_orders(self.customer, self.menu_items, 4, delivery_crew=self.delivery_crew)
+        self.create_orders(self.customer, self.menu_items[3:], 2)
+        models.Order.objects.filter(pk=2).update(status=True)
+
+    def get_headers(self, user):
+        if user is None:
+            return {}
+        return {'Authorization': f'Token {Token.objects.get_or_create(user=user)[0].key}'}
+
+    def get(self, url, user, asgi):
+        # Both paths authenticate with a token, and start from an empty cache
+        headers = self.get_headers(user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            if asgi:
+                with override_settings(ROOT_URLCONF='littlelemon.asgi_urls'):
+                    response = async_to_sync(self.aget)(url, headers)
+                    # resolver_match is resolved lazily, so check it against the ASGI URLconf now
+                    self.assertTrue(issubclass(response.resolver_match.func.view_class, async_views.AsyncReadView))
+            else:
+                response = self.client.get(url, headers=headers)
+        return response, len(context)
+
+    async def aget(self, url, headers):
+        return await AsyncClient().get(url, headers=headers)
+
+    def assert_same(self, url, user, queries):
+        sync_response, sync_queries = self.get(url, user, asgi=False)
+        async_response, async_queries = self.get(url, user, asgi=True)
+        self.assertEqual(async_response.status_code, sync_response.status_code, url)
+        self.assertEqual(async_response.content, sync_response.content, url)
+        self.assertEqual((sync_queries, async_queries), (queries, queries), url)
+
+    def test_menu_lists(self):
+        urls = [
+            '/api/categories/',
+            '/api/menu-items/',
+            '/api/menu-items/?page=2',
+            '/api/menu-items/?search=item&ordering=-price',
+            '/api/menu-items/?featured=true',
+            '/api/menu-items/?fields=id,category&expand=',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                # Count and page
+                self.assert_same(url, None, 2)
+
+    def test_order_lists(self):
+        urls = [
+            '/api/orders/',
+            '/api/orders/?page=2',
+            '/api/orders/?status=false&ordering=-id',
+            '/api/orders/?expand=order_items',
+        ]
+        for user in (self.customer, self.delivery_crew, self.manager):
+            for url in urls:
+                with self.subTest(url=url, user=user.username):
+                    # Token, group names, count, page, order items
+                    self.assert_same(url, user, 5)
+            with self.subTest(url='fields', user=user.username):
+                self.assert_same('/api/orders/?fields=id,status,total', user, 4)
+
+    def test_order_detail(self):
+        for user in (self.customer, self.delivery_crew, self.manager):
+            with self.subTest(user=user.username):
+                # Token, group names, order, order items
+                self.assert_same('/api/orders/1/', user, 4)
+                self.assert_same('/api/orders/1/?fields=id,total', user, 3)
+        self.assert_same('/api/orders/999/', self.manager, 3)
+
+    def test_unauthenticated(self):
+        self.assert_same('/api/orders/', None, 0)
+
+    def test_afetch_prefetches_reverse_foreign_keys(self):
+        queryset = models.Order.objects.select_related('user').prefetch_related(
+            Prefetch('orderitem_set', queryset=models.OrderItem.objects.select_related('menuitem').order_by('-id'))
+        ).order_by('id')
+        with self.assertNumQueries(2):
+            orders = async_to_sync(async_views.afetch)(queryset)
+
+        expected = [
+            (order.pk, order.user.username, [(item.pk, item.menuitem.title) for item in order.orderitem_set.all()])
+            for order in queryset
+        ]
+        with self.assertNumQueries(0):
+            self.assertEqual([
+                (order.pk, order.user.username, [(item.pk, item.menuitem.title) for item in order.orderitem_set.all()])
+                for order in orders
+            ], expected)
+            self.assertTrue(all(item.order is order for order in orders for item in order.orderitem_set.all()))
+
+    def test_aprefetch_related(self):
+        with self.assertNumQueries(0):
+            async_to_sync(async_views.aprefetch_related)([], ['orderitem_set'])
+
+        orders = list(models.Order.objects.filter(pk__in=[1, 5]).order_by('id'))
+        with self.assertNumQueries(1):
+            async_to_sync(async_views.aprefetch_related)(orders, ['orderitem_set'])
+        with self.assertNumQueries(0):
+            self.assertEqual([len(order.orderitem_set.all()) for order in orders], [3, 3])
+
+        with self.assertRaises(NotSupportedError):
+            async_to_sync(async_views.aprefetch_related)(orders, ['orderitem_set__menuitem'])
+
+
+class OrderExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu()
+        self.customer = self.create_user('customer')
+        self.other_customer = self.create_user('other')
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.delivery_crew = self.create_user('crew', roles.DELIVERY_CREW)
+        self.create_orders(self.customer, self.menu_items, 2, delivery_crew=self.delivery_crew)
+        self.create_orders(self.other_customer, [], 1)
+        self.create_orders(self.other_customer, self.menu_items[3:], 1, delivery_crew=self.delivery_crew)
+        self.order_ids = {
+            self.customer: [1, 2],
+            self.other_customer: [3, 4],
+            self.delivery_crew: [1, 2, 4],
+            self.manager: [1, 2, 3, 4],
+        }
+
+    def export(self, user, format, asgi, query=''):
+        """
+        Returns the export and the chunks it was streamed in.
+        """
+        url = f'/api/orders/export/?format={format}&{query}'
+        headers = {'Authorization': f'Token {Token.objects.get_or_create(user=user)[0].key}'}
+        if not asgi:
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            chunks = list(response.streaming_content)
+        else:
+            with override_settings(ROOT_URLCONF='littlelemon.asgi_urls'):
+                response, chunks = async_to_sync(self.aexport)(url, headers)
+                self.assertIs(response.resolver_match.func.view_class, async_views.OrderExportView)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="orders.{format}"')
+        return b''.join(chunks).decode(), chunks
+
+    async def aexport(self, url, headers):
+        response = await AsyncClient().get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        return response, [chunk async for chunk in response.streaming_content]
+
+    def test_csv(self):
+        for asgi in (False, True):
+            with self.subTest(asgi=asgi):
+                content, _ = self.export(self.manager, 'csv', asgi)
+                rows = list(csv.DictReader(content.splitlines()))
+                self.assertEqual(list(rows[0]), views.OrderExportView.csv_header)
+                self.assertEqual([row['order_id'] for row in rows], ['1', '1', '1', '2', '2', '2', '3', '4', '4'])
+                self.assertEqual(rows[0], {
+                    'order_id': '1', 'user': 'customer', 'delivery_crew': 'crew', 'status': 'False',
+                    'total': '0.00', 'date': str(models.Order.objects.get(pk=1).date), 'order_item_id': '1',
+                    'menuitem': 'Item 0', 'quantity': '2', 'unit_price': '2.50', 'price': '5.00',
+                })
+                # The order without items still gets a row
+                self.assertEqual(rows[6]['delivery_crew'], '')
+                self.assertEqual([rows[6][key] for key in views.OrderExportView.csv_header[6:]], [''] * 5)
+
+    def test_ndjson(self):
+        for asgi in (False, True):
+            with self.subTest(asgi=asgi):
+                content, _ = self.export(self.manager, 'ndjson', asgi)
+                orders = [json.loads(line) for line in content.splitlines()]
+                self.assertEqual([order['id'] for order in orders], [1, 2, 3, 4])
+                self.assertEqual(list(orders[0]), ['id', 'user', 'delivery_crew', 'order_items', 'status', 'total', 'date'])
+                self.assertEqual([len(order['order_items']) for order in orders], [3, 3, 0, 2])
+
+                # The serializer gets the request, so sparse fieldsets apply
+                content, _ = self.export(self.manager, 'ndjson', asgi, 'fields=id,total')
+                self.assertEqual(json.loads(content.splitlines()[0]), {'id': 1, 'total': '0.00'})
+
+    def test_role_scoping(self):
+        for asgi in (False, True):
+            for user, order_ids in self.order_ids.items():
+                with self.subTest(asgi=asgi, user=user.username):
+                    content, _ = self.export(user, 'ndjson', asgi)
+                    self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], order_ids)
+                    content, _ = self.export(user, 'csv', asgi)
+                    self.assertEqual(
+                        sorted({int(row['order_id']) for row in csv.DictReader(content.splitlines())}), order_ids
+                    )
+
+    def test_filters(self):
+        models.Order.objects.filter(pk=2).update(status=True)
+        for asgi in (False, True):
+            with self.subTest(asgi=asgi):
+                content, _ = self.export(self.manager, 'ndjson', asgi, 'status=false')
+                self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], [1, 3, 4])
+
+    @mock.patch.object(views.OrderExportView, 'chunk_size', 3)
+    def test_asgi_streams_chunks(self):
+        # The header, then one chunk per 3 orders
+        content, chunks = self.export(self.manager, 'csv', asgi=True)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0].decode().splitlines(), [','.join(views.OrderExportView.csv_header)])
+        self.assertEqual(content, self.export(self.manager, 'csv', asgi=False)[0])
+
+        content, chunks = self.export(self.manager, 'ndjson', asgi=True)
+        self.assertEqual([len(chunk.decode().splitlines()) for chunk in chunks], [3, 1])
+
+
+class SalesSummaryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_items = self.create_menu(3)
+        # Cents that binary floating point cannot represent
+        models.MenuItem.objects.filter(pk=1).update(price=Decimal('0.10'))
+        models.MenuItem.objects.filter(pk=2).update(price=Decimal('0.20'))
+        models.MenuItem.objects.filter(pk=3).update(price=Decimal('0.70'))
+        self.customer = self.create_user('customer')
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.crew = [self.create_user(f'crew{i}', roles.DELIVERY_CREW) for i in range(2)]
+
+    def get_summaries(self):
+        # Rows whose counters all went back to zero are left by the incremental updates only
+        return (
+            list(models.DailySales.objects.exclude(orders=0, revenue=0).order_by('date').values_list(
+                'date', 'orders', 'revenue'
+            )),
+            list(models.DailyMenuItemSales.objects.exclude(quantity=0, revenue=0).order_by('date', 'menuitem').values_list(
+                'date', 'menuitem', 'quantity', 'revenue'
+            )),
+            list(models.DailyDeliveries.objects.exclude(delivered=0).order_by('date', 'delivery_crew').values_list(
+                'date', 'delivery_crew', 'delivered'
+            )),
+        )
+
+    def assert_rebuilt_summaries_equal(self):
+        summaries = self.get_summaries()
+        call_command('rebuild_sales_summaries', stdout=StringIO())
+        self.assertEqual(summaries, self.get_summaries())
+        return summaries
+
+    def checkout(self, quantities):
+        for menu_item in models.MenuItem.objects.filter(pk__in=quantities):
+            quantity = quantities[menu_item.pk]
+            models.Cart.objects.create(
+                user=self.customer, menuitem=menu_item, quantity=quantity, unit_price=menu_item.price,
+                price=menu_item.price * quantity,
+            )
+        self.authenticate(self.customer)
+        self.assertEqual(self.client.post('/api/orders/').status_code, 201)
+
+    def request(self, user, method, url, data=None):
+        self.authenticate(user)
+        response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+
+    def test_summaries_match_rebuild(self):
+        for _ in range(7):
+            self.checkout({1: 1, 2: 2})
+        self.checkout({3: 3})
+        sales, menu_item_sales, deliveries = self.assert_rebuilt_summaries_equal()
+        # Seven orders of 0.50 and one of 2.10, with exact decimals
+        self.assertEqual(sales, [(date.today(), 8, Decimal('5.60'))])
+        self.assertEqual(menu_item_sales, [
+            (date.today(), 1, 7, Decimal('0.70')),
+            (date.today(), 2, 14, Decimal('2.80')),
+            (date.today(), 3, 3, Decimal('2.10')),
+        ])
+        self.assertTrue(all(isinstance(value, Decimal) for value in (sales[0][2], *(row[3] for row in menu_item_sales))))
+
+        # Detail PATCH: assign, deliver, then move a delivered order to another crew member
+        self.request(self.manager, 'patch', '/api/orders/1/', {'delivery_crew_id': self.crew[0].pk})
+        self.request(self.crew[0], 'patch', '/api/orders/1/', {'status': True})
+        self.assertEqual(self.assert_rebuilt_summaries_equal()[2], [(date.today(), self.crew[0].pk, 1)])
+        self.request(self.manager, 'patch', '/api/orders/1/', {'delivery_crew_id': self.crew[1].pk})
+        self.assertEqual(self.assert_rebuilt_summaries_equal()[2], [(date.today(), self.crew[1].pk, 1)])
+
+        # Batch PATCH: assign and deliver several orders, then reopen one
+        self.request(self.manager, 'patch', '/api/orders/batch/', {'ids': [2, 3, 4], 'delivery_crew_id': self.crew[0].pk})
+        self.request(self.crew[0], 'patch', '/api/orders/batch/', {'ids': [2, 3, 4], 'status': True})
+        self.request(self.manager, 'patch', '/api/orders/batch/', {'ids': [1, 3], 'status': False})
+        self.assertEqual(self.assert_rebuilt_summaries_equal()[2], [(date.today(), self.crew[0].pk, 2)])
+
+        # Automatic assignment of the remaining open orders
+        assigner = CrewAssigner()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(assigner.assign(), 4)
+        self.assert_rebuilt_summaries_equal()
+        self.request(self.manager, 'patch', '/api/orders/batch/', {'ids': [5, 6, 7, 8], 'status': True})
+
+        # Detail DELETE of a delivered order, and of the order with the other menu item
+        self.request(self.manager, 'delete', '/api/orders/2/')
+        self.request(self.manager, 'delete', '/api/orders/8/')
+        sales, menu_item_sales, deliveries = self.assert_rebuilt_summaries_equal()
+        self.assertEqual(sales, [(date.today(), 6, Decimal('3.00'))])
+        self.assertEqual([row[3] for row in menu_item_sales], [Decimal('0.60'), Decimal('2.40')])
+        self.assertEqual(sum(row[2] for row in deliveries), 4)
+
+    def test_endpoint(self):
+        self.checkout({1: 1, 2: 2})
+        self.checkout({3: 3})
+        self.request(self.manager, 'patch', '/api/orders/batch/', {'ids': [1, 2], 'delivery_crew_id': self.crew[0].pk})
+        self.request(self.crew[0], 'patch', '/api/orders/2/', {'status': True})
+
+        self.authenticate(self.manager)
+        response = self.client.get('/api/analytics/sales/?top=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['daily_revenue'], [{'date': str(date.today()), 'orders': 2, 'revenue': '2.60'}])
+        self.assertEqual(
+            response.data['top_menu_items'], [{'menuitem_id': 3, 'title': 'Item 2', 'quantity': 3, 'revenue': '2.10'}]
+        )
+        self.assertEqual(
+            response.data['deliveries_per_crew'],
+            [{'delivery_crew_id': self.crew[0].pk, 'username': 'crew0', 'delivered': 1}],
+        )
+
+    def test_date_range(self):
+        self.checkout({1: 1})
+        self.authenticate(self.manager)
+        today = date.today()
+
+        response = self.client.get('/api/analytics/sales/')
+        self.assertEqual((response.data['start'], response.data['end']), (today - timedelta(days=29), today))
+        response = self.client.get(f'/api/analytics/sales/?end={today - timedelta(days=1)}')
+        self.assertEqual(response.data['start'], today - timedelta(days=30))
+        self.assertEqual(response.data['daily_revenue'], [])
+        response = self.client.get(f'/api/analytics/sales/?start={today}&end={today}')
+        self.assertEqual(len(response.data['daily_revenue']), 1)
+
+        for query, field in [
+            (f'start={today}&end={today - timedelta(days=1)}', 'start'),
+            (f'start={today + timedelta(days=1)}', 'start'),
+            ('start=yesterday', 'start'),
+            ('end=2024-02-30', 'end'),
+            ('top=0', 'top'),
+            ('top=101', 'top'),
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/analytics/sales/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+
+    def test_managers_only(self):
+        for user in (self.customer, self.crew[0]):
+            self.authenticate(user)
+            self.assertEqual(self.client.get('/api/analytics/sales/').status_code, 403)
+
+
+class MenuSearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        mains = models.Category.objects.create(slug='mains', title='Mains')
+        self.specials = models.Category.objects.create(slug='specials', title='Lemon Specials')
+        for title, category in [
+            ('Lemon Chicken', mains),
+            ('Lemon lemon tart', mains),
+            ('Grilled fish', self.specials),
+            ('Chickpea salad', mains),
+            ('Beef stew', mains),
+        ]:
+            models.MenuItem.objects.create(title=title, price=Decimal('5.00'), featured=False, category=category)
+
+    def search(self, term, **params):
+        # Keyset pages are ordered by id and can hold every match
+        cache.clear()
+        response = self.client.get('/api/menu-items/', {'search': term, 'page_size': 100, 'cursor': '', **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.data['results']]
+
+    def search_ranked(self, term):
+        # Numbered pages keep the rank ordering
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/menu-items/', {'search': term})
+        return [item['id'] for item in response.data['results']]
+
+    def get_bm25_order(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM api_menuitem_fts WHERE api_menuitem_fts MATCH %s '
+                'ORDER BY bm25(api_menuitem_fts, 10.0, 1.0), rowid',
+                [query],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_ordered_by_bm25(self):
+        ids = self.search_ranked('lemon')
+        self.assertEqual(ids, self.get_bm25_order('"lemon"*'))
+        # Two title matches, then the match of the category title only
+        self.assertEqual(ids, [2, 1, 3])
+        self.assertEqual(self.search_ranked('chick'), self.get_bm25_order('"chick"*'))
+
+    def test_ordering_parameter_replaces_rank(self):
+        cache.clear()
+        response = self.client.get('/api/menu-items/', {'search': 'lemon', 'ordering': '-id'})
+        self.assertEqual([item['id'] for item in response.data['results']], [3, 2, 1])
+
+    def test_matches(self):
+        self.assertEqual(self.search('chick'), ['Lemon Chicken', 'Chickpea salad'])
+        self.assertEqual(self.search('lemon chick'), ['Lemon Chicken'])
+        self.assertEqual(self.search('specials'), ['Grilled fish'])
+        self.assertEqual(self.search('citron'), [])
+        # Operators and quotes in the input are matched literally
+        self.assertEqual(self.search('lemon OR beef'), [])
+        self.assertEqual(self.search('"beef" NEAR'), [])
+        self.assertEqual(self.search('beef"'), ['Beef stew'])
+
+    def test_index_follows_writes(self):
+        menu_item = models.MenuItem.objects.create(
+            title='Orange juice', price=Decimal('3.00'), featured=False, category=self.specials
+        )
+        self.assertEqual(self.search('orange'), ['Orange juice'])
+
+        menu_item.title = 'Apple juice'
+        menu_item.save()
+        self.assertEqual(self.search('orange'), [])
+        self.assertEqual(self.search('apple'), ['Apple juice'])
+
+        # Writes that send no signals
+        models.MenuItem.objects.filter(pk=5).update(title='Lamb stew')
+        self.assertEqual(self.search('beef'), [])
+        self.assertEqual(self.search('lamb'), ['Lamb stew'])
+        models.MenuItem.objects.bulk_create([
+            models.MenuItem(title='Lemonade', price=Decimal('2.00'), featured=False, category=self.specials),
+        ])
+        self.assertEqual(self.search('lemonade'), ['Lemonade'])
+
+        models.MenuItem.objects.filter(pk=4).update(category=self.specials)
+        self.assertIn('Chickpea salad', self.search('specials'))
+        self.specials.title = 'Drinks'
+        self.specials.save()
+        self.assertEqual(self.search('specials'), [])
+        self.assertEqual(self.search('lemon'), ['Lemon Chicken', 'Lemon lemon tart', 'Lemonade'])
+
+        menu_item.delete()
+        self.assertEqual(self.search('apple'), [])
+        models.MenuItem.objects.filter(title__startswith='Lemon').delete()
+        self.assertEqual(self.search('lemon'), [])
+
+    def test_falls_back_without_index(self):
+        with mock.patch.object(MenuSearchFilter, 'has_index', return_value=False):
+            self.assertEqual(self.search('chick'), ['Lemon Chicken', 'Chickpea salad'])
+            self.assertEqual(self.search('lemon'), ['Lemon Chicken', 'Lemon lemon tart', 'Grilled fish'])
+            self.assertEqual(self.search('stew beef'), ['Beef stew'])
+
+    def test_has_fts_table(self):
+        has_fts_table = search.has_fts_table.__wrapped__
+        self.assertTrue(has_fts_table('default', None))
+        with mock.patch.object(search, 'FTS_TABLE', 'api_missing_fts'):
+            self.assertFalse(has_fts_table('default', None))
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertFalse(has_fts_table('default', None))
+
+
+class RequestTimingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.customer = self.create_user('customer')
+        self.create_orders(self.customer, self.create_menu(), 1)
+        self.order = models.Order.objects.get()
+        self.token = Token.objects.create(user=self.manager)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        stats.reset()
+        self.addCleanup(stats.reset)
+
+    def get_server_timing(self, response):
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, duration, *desc = entry.split(';')
+            metrics[name] = (float(duration.removeprefix('dur=')), *desc)
+        return metrics
+
+    def test_server_timing_off_by_default(self):
+        response = self.client.get(f'/api/orders/{self.order.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/orders/{self.order.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+        metrics = self.get_server_timing(response)
+        self.assertEqual(list(metrics)[0], 'db')
+        self.assertEqual(list(metrics)[-1], 'total')
+        self.assertTrue({'auth', 'roles', 'permissions', 'serialize'} <= set(metrics))
+        self.assertEqual(metrics['db'][1], f'desc="{len(queries)} queries"')
+        for name, (duration, *_) in metrics.items():
+            self.assertLessEqual(duration, metrics['total'][0], name)
+
+    def test_request_stats(self):
+        self.client.get('/api/menu-items/')
+        self.client.get('/api/menu-items/', {'search': 'item'})
+        self.client.get(f'/api/orders/{self.order.pk}/')
+        # Neither other apps nor unmatched URLs are recorded
+        self.client.get('/admin/login/')
+        self.client.get('/api/missing/')
+        self.client.get('/auth/users/me/')
+
+        response = self.client.get('/api/stats/requests/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['window'], 60 * 60)
+        self.assertEqual(response.data['interval'], 60)
+        url_names = response.data['url_names']
+        self.assertEqual(list(url_names), ['api:menu-items', 'api:order-detail'])
+
+        menu_items = url_names['api:menu-items']
+        self.assertEqual(menu_items['total']['count'], 2)
+        self.assertEqual(menu_items['queries']['count'], 2)
+        order_detail = url_names['api:order-detail']
+        self.assertTrue({'auth', 'db', 'permissions', 'queries', 'roles', 'serialize', 'total'} <= set(order_detail))
+        self.assertEqual(sum(order_detail['queries']['buckets'].values()), 1)
+
+        # The stats request itself is recorded once it has been answered
+        self.assertIn('api:request-stats', self.client.get('/api/stats/requests/').data['url_names'])
+
+    def test_request_stats_managers_only(self):
+        self.client.credentials()
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/stats/requests/').status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/stats/requests/').status_code, 401)
+
+
+class CrewAssignerTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = self.create_user('customer')
+        self.crew = [self.create_user(f'crew{i}', roles.DELIVERY_CREW) for i in range(3)]
+        # Neither inactive crew members nor other users are given orders
+        inactive = self.create_user('inactive', roles.DELIVERY_CREW)
+        inactive.is_active = False
+        inactive.save()
+        self.create_user('manager', roles.MANAGER)
+
+        # Open orders: two for the first crew member, one for the third, who also delivered five
+        for delivery_crew, status, count in [
+            (self.crew[0], False, 2), (self.crew[2], False, 1), (self.crew[2], True, 5), (None, True, 1),
+        ]:
+            models.Order.objects.filter(pk__in=self.create_unassigned(count)).update(
+                delivery_crew=delivery_crew, status=status
+            )
+
+    def create_unassigned(self, count):
+        last = models.Order.objects.order_by('id').last()
+        first_id = last.pk + 1 if last else 1
+        self.create_orders(self.customer, [], count)
+        return list(range(first_id, first_id + count))
+
+    def get_open_orders(self):
+        return {
+            user.pk: user.delivery_crew.filter(status=False).count() for user in self.crew
+        }
+
+    def assign(self, assigner, limit=None):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            assigned = assigner.assign(limit)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        return assigned, updates
+
+    def test_balances_open_orders(self):
+        self.create_unassigned(6)
+        assigner = CrewAssigner()
+        self.assertEqual(self.assign(assigner), (6, mock.ANY))
+        crew_ids = [user.pk for user in self.crew]
+        self.assertEqual(assigner.loads(), dict.fromkeys(crew_ids, 3))
+        self.assertEqual(self.get_open_orders(), dict.fromkeys(crew_ids, 3))
+        # Delivered orders are left unassigned
+        self.assertEqual(models.Order.objects.filter(delivery_crew__isnull=True).count(), 1)
+
+    def test_fewest_open_orders_first(self):
+        ids = self.create_unassigned(3)
+        self.assign(CrewAssigner())
+        # The second crew member has no open orders, and ties go to the lowest user id
+        self.assertEqual(
+            list(models.Order.objects.filter(pk__in=ids).order_by('id').values_list('delivery_crew', flat=True)),
+            [self.crew[1].pk, self.crew[1].pk, self.crew[2].pk],
+        )
+
+    def test_one_update_per_batch(self):
+        ids = self.create_unassigned(5)
+        assigner = CrewAssigner(batch_size=2)
+
+        assigned, updates = self.assign(assigner, limit=3)
+        self.assertEqual(assigned, 3)
+        self.assertEqual(len(updates), 2)
+        for sql in updates:
+            self.assertRegex(
+                sql,
+                r'^UPDATE "api_order" SET "delivery_crew_id" = assignment\.column2 '
+                r'FROM \(VALUES \(\d+, \d+\)(, \(\d+, \d+\))*\) AS assignment WHERE "api_order"\."id" = assignment\.column1$',
+            )
+        self.assertEqual(updates[0].count('), ('), 1)
+        self.assertEqual(updates[1].count('), ('), 0)
+        # The oldest orders first
+        unassigned = models.Order.objects.filter(delivery_crew__isnull=True, status=False)
+        self.assertEqual(list(unassigned.order_by('id').values_list('id', flat=True)), ids[3:])
+
+        self.assertEqual(self.assign(assigner)[0], 2)
+        self.assertEqual(self.assign(assigner), (0, []))
+        self.assertFalse(unassigned.exists())
+
+    def test_no_crew(self):
+        ids = self.create_unassigned(2)
+        User.objects.filter(groups__name=roles.DELIVERY_CREW).update(is_active=False)
+        assigner = CrewAssigner()
+        with self.assertNumQueries(1):
+            self.assertEqual(assigner.assign(), 0)
+        self.assertEqual(assigner.heap, [])
+        self.assertFalse(models.Order.objects.filter(pk__in=ids, delivery_crew__isnull=False).exists())
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('assign_orders', stdout=stdout, stderr=stderr)
+        self.assertEqual(stderr.getvalue(), 'There are no active delivery crew members.\n')
+
+    def test_command(self):
+        self.create_unassigned(6)
+        stdout = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('assign_orders', batch_size=4, stdout=stdout)
+        self.assertRegex(
+            stdout.getvalue(), r'^Assigned 6 orders to 3 crew members in \d+\.\d\ds; open orders per crew member: 3-3\.\n$'
+        )
+
+    def test_events_reach_serving_processes(self):
+        ids = self.create_unassigned(4)
+        with override_settings(DELIVERY_EVENTS={'BACKEND': 'api.events.DatabasePubSub', 'OPTIONS': {'poll_interval': None}}):
+            # A notifier of a process serving the crew's connections
+            server = events.Notifier(events.DatabasePubSub(poll_interval=None))
+            received = []
+            server.subscribe(self.crew[1].pk, received.append)
+            self.assign(CrewAssigner())
+            server.pubsub.poll()
+
+        # The second crew member has no open orders, so gets two of the four
+        self.assertEqual([message['type'] for message in received], ['order.assigned'] * 2)
+        self.assertEqual([message['data'] for message in received], [{'order': id, 'status': False} for id in ids[:2]])
+        self.assertEqual(models.DeliveryEvent.objects.count(), 4)
+
+
+class OrderBatchUpdateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = self.create_user('customer')
+        self.manager = self.create_user('manager', roles.MANAGER)
+        self.crew = [self.create_user(f'crew{i}', roles.DELIVERY_CREW) for i in range(2)]
+        # Orders 1-3 for the first crew member, 4-5 for the second, 6 unassigned
+        menu_items = self.create_menu(1)
+        self.create_orders(self.customer, menu_items, 3, delivery_crew=self.crew[0])
+        self.create_orders(self.customer, menu_items, 2, delivery_crew=self.crew[1])
+        self.create_orders(self.customer, menu_items, 1)
+
+    def patch(self, user, data):
+        self.authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/orders/batch/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def get_results(self, data):
+        return {result['id']: result['result'] for result in data['results']}
+
+    def get_orders(self):
+        return list(models.Order.objects.order_by('id').values_list('id', 'delivery_crew', 'status'))
+
+    def get_deliveries(self):
+        return list(models.DailyDeliveries.objects.exclude(delivered=0).order_by('delivery_crew').values_list(
+            'date', 'delivery_crew', 'delivered'
+        ))
+
+    def test_crew_scope(self):
+        data = self.patch(self.crew[0], {'ids': [1, 2, 4, 6, 999], 'status': True})
+        self.assertEqual(data['updated'], 2)
+        self.assertEqual(self.get_results(data), {
+            1: 'updated', 2: 'updated', 4: 'not_found', 6: 'not_found', 999: 'not_found',
+        })
+        self.assertEqual([order[2] for order in self.get_orders()], [True, True, False, False, False, False])
+
+        self.authenticate(self.customer)
+        self.assertEqual(self.client.patch('/api/orders/batch/', {'ids': [1], 'status': True}, format='json').status_code, 403)
+
+    def test_updated_and_unchanged(self):
+        self.patch(self.manager, {'ids': [1, 2], 'status': True})
+        data = self.patch(self.manager, {'ids': [1, 2, 3], 'status': True})
+        self.assertEqual(data['updated'], 1)
+        self.assertEqual(self.get_results(data), {1: 'unchanged', 2: 'unchanged', 3: 'updated'})
+
+        data = self.patch(self.manager, {'ids': [1, 4, 6], 'delivery_crew_id': self.crew[1].pk})
+        self.assertEqual(self.get_results(data), {1: 'updated', 4: 'unchanged', 6: 'updated'})
+        # Only the fields sent are changed, and an order counts as updated if either changes
+        data = self.patch(self.manager, {'ids': [1, 5], 'delivery_crew_id': self.crew[1].pk, 'status': True})
+        self.assertEqual(self.get_results(data), {1: 'unchanged', 5: 'updated'})
+        data = self.patch(self.manager, {'ids': [6], 'delivery_crew_id': None})
+        self.assertEqual(self.get_results(data), {6: 'updated'})
+
+        crew0, crew1 = self.crew[0].pk, self.crew[1].pk
+        self.assertEqual(self.get_orders(), [
+            (1, crew1, True), (2, crew0, True), (3, crew0, True), (4, crew1, False), (5, crew1, True), (6, None, False),
+        ])
+
+    def test_duplicate_ids(self):
+        data = self.patch(self.manager, {'ids': [3, 1, 3, 1], 'status': True})
+        self.assertEqual(data, {'updated': 2, 'results': [{'id': 3, 'result': 'updated'}, {'id': 1, 'result': 'updated'}]})
+        self.assertEqual(self.get_deliveries(), [(date.today(), self.crew[0].pk, 2)])
+
+    def test_daily_deliveries(self):
+        received = []
+        events.get_notifier().subscribe(self.crew[0].pk, received.append)
+
+        self.patch(self.crew[0], {'ids': [1, 2, 3], 'status': True})
+        self.assertEqual(self.get_deliveries(), [(date.today(), self.crew[0].pk, 3)])
+        # Moving delivered orders moves their deliveries, reopening them removes them
+        self.patch(self.manager, {'ids': [1], 'delivery_crew_id': self.crew[1].pk})
+        self.assertEqual(self.get_deliveries(), [(date.today(), self.crew[0].pk, 2), (date.today(), self.crew[1].pk, 1)])
+        self.patch(self.manager, {'ids': [2, 4], 'status': False})
+        self.assertEqual(self.get_deliveries(), [(date.today(), self.crew[0].pk, 1), (date.today(), self.crew[1].pk, 1)])
+        self.patch(self.manager, {'ids': [4, 5], 'status': True})
+        self.assertEqual(self.get_deliveries(), [(date.today(), self.crew[0].pk, 1), (date.today(), self.crew[1].pk, 3)])
+
+        self.assertEqual(
+            [(message['type'], message['data']['order']) for message in received],
+            [('order.status', 1), ('order.status', 2), ('order.status', 3), ('order.unassigned', 1), ('order.status', 2)],
+        )
+
+    def test_queries_per_batch(self):
+        models.Order.objects.bulk_create(
+            models.Order(user=self.customer, delivery_crew=self.crew[0], total=Decimal('0.00')) for _ in range(494)
+        )
+        ids = list(models.Order.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(len(ids), 500)
+
+        # Groups, savepoint, orders, update, deliveries upsert, release: as many for 500 orders as for 5
+        for batch, updated in ((ids[:5], 5), (ids, 495)):
+            self.authenticate(self.manager)
+            with self.subTest(size=len(batch)), self.assertNumQueries(6):
+                response = self.client.patch('/api/orders/batch/', {'ids': batch, 'status': True}, format='json')
+            self.assertEqual(response.data['updated'], updated)
+            self.assertEqual(len(response.data['results']), len(batch))
+        self.assertFalse(models.Order.objects.filter(status=False).exists())
+        self.assertEqual(self.get_deliveries(), [(date.today(), self.crew[0].pk, 497), (date.today(), self.crew[1].pk, 2)])
+
+        response = self.client.patch('/api/orders/batch/', {'ids': list(range(1, 502)), 'status': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CartSummaryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # Prices 2.50, 3.50 and 4.50
+        self.menu_items = self.create_menu(3)
+        self.customer = self.create_user('customer')
+        self.client.force_authenticate(self.customer)
+
+    def get_summary(self, query=''):
+        response = self.client.get(f'/api/cart/summary/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def assert_summary(self, lines, quantity, subtotal):
+        self.assertEqual(self.get_summary(), {'lines': lines, 'quantity': quantity, 'subtotal': subtotal})
+
+    def add(self, menu_item, quantity):
+        response = self.client.post('/api/cart/menu-items/', {'menuitem_id': menu_item.pk, 'quantity': quantity})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_summary(self):
+        self.assert_summary(0, 0, '0.00')
+        self.add(self.menu_items[0], 2)
+        self.add(self.menu_items[2], 1)
+        self.assert_summary(2, 3, '9.50')
+
+        self.assertEqual(self.get_summary('?items=true')['items'], [
+            {'id': 1, 'menuitem_id': 1, 'title': 'Item 0', 'quantity': 2, 'unit_price': '2.50', 'price': '5.00'},
+            {'id': 2, 'menuitem_id': 3, 'title': 'Item 2', 'quantity': 1, 'unit_price': '4.50', 'price': '4.50'},
+        ])
+        # Other users' carts are left out
+        other = self.create_user('other')
+        models.Cart.objects.create(user=other, menuitem=self.menu_items[1], quantity=5, unit_price=3, price=15)
+        self.assert_summary(2, 3, '9.50')
+
+    def test_not_cached_without_shared_cache(self):
+        self.add(self.menu_items[0], 2)
+        self.assert_summary(1, 2, '5.00')
+        # Not even a write that skips the views is missed
+        models.Cart.objects.update(quantity=3, price=Decimal('7.50'))
+        with self.assertNumQueries(1):
+            self.assert_summary(1, 3, '7.50')
+
+    @shared_cache
+    def test_cached_until_the_cart_changes(self):
+        cart_id = self.add(self.menu_items[0], 2)
+        self.assert_summary(1, 2, '5.00')
+        self.get_summary('?items=true')
+        with self.assertNumQueries(0):
+            self.assert_summary(1, 2, '5.00')
+            self.assertEqual(len(self.get_summary('?items=true')['items']), 1)
+
+        # Bulk upsert, adding to the quantity of an item already in the cart
+        response = self.client.post(
+            '/api/cart/menu-items/',
+            [{'menuitem_id': self.menu_items[0].pk, 'quantity': 1}, {'menuitem_id': self.menu_items[1].pk, 'quantity': 2}],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assert_summary(2, 5, '14.50')
+        self.assertEqual([item['quantity'] for item in self.get_summary('?items=true')['items']], [3, 2])
+
+        self.assertEqual(self.client.patch(f'/api/cart/menu-items/{cart_id}/', {'quantity': 1}).status_code, 200)
+        self.assert_summary(2, 3, '9.50')
+
+        self.assertEqual(self.client.delete(f'/api/cart/menu-items/{cart_id}/').status_code, 204)
+        self.assert_summary(1, 2, '7.00')
+
+        self.add(self.menu_items[2], 1)
+        self.assert_summary(2, 3, '11.50')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/orders/').status_code, 201)
+        self.assert_summary(0, 0, '0.00')
+
+        self.add(self.menu_items[2], 1)
+        self.assert_summary(1, 1, '4.50')
+        self.assertEqual(self.client.delete('/api/cart/menu-items/').status_code, 200)
+        self.assert_summary(0, 0, '0.00')
+
+    def test_update_reprices(self):
+        cart_id = self.add(self.menu_items[0], 2)
+        models.MenuItem.objects.filter(pk=self.menu_items[0].pk).update(price=Decimal('3.00'))
+
+        response = self.client.patch(f'/api/cart/menu-items/{cart_id}/', {'quantity': 3})
+        self.assertEqual((response.data['unit_price'], response.data['price']), ('3.00', '9.00'))
+        response = self.client.patch(f'/api/cart/menu-items/{cart_id}/', {'menuitem_id': self.menu_items[1].pk})
+        self.assertEqual((response.data['unit_price'], response.data['price']), ('3.50', '10.50'))
+        self.assertEqual(
+            models.Cart.objects.values_list('menuitem', 'quantity', 'unit_price', 'price').get(),
+            (self.menu_items[1].pk, 3, Decimal('3.50'), Decimal('10.50')),
+        )
+        self.assert_summary(1, 3, '10.50')
@@ -1,31 +1,58 @@
+import math
+import time
 from rest_framework.throttling import BaseThrottle
 from rest_framework.exceptions import Throttled
-from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.conf import settings
 from django.utils.timezone import now, timedelta
+from . import roles
+from .request_stats import span
+from .throttle_stores import get_throttle_store
 
 
 class GroupBasedThrottle(BaseThrottle):
+    """
+    Throttles authenticated users by group. Rates are read from DEFAULT_THROTTLE_RATES
+    and may select an algorithm with a suffix, e.g. '1000/hour:gcra'.
+
+    - sliding_log: keeps the timestamp of every request in the window (default)
+    - fixed_window: one counter per window, incremented atomically
+    - sliding_window: current and previous window counters, weighted by overlap
+    - gcra: generic cell rate algorithm, a token bucket storing one timestamp
+
+    State is kept in the store configured by THROTTLE_STORE, and each check runs
+    under the store's lock, so the read-modify-write is atomic.
+
+    Views with a throttle_scope, like those of DRF's ScopedRateThrottle, are throttled
+    by the rate of that name for every group, and count their requests separately.
+    """
+    algorithms = ('sliding_log', 'fixed_window', 'sliding_window', 'gcra')
+    default_algorithm = 'sliding_log'
+
     def __init__(self):
-        self.cache = cache
+        self.store = get_throttle_store()
         self.history = None
         self.rate = None
         self.num_requests = None
         self.duration = None
+        self.algorithm = self.default_algorithm
 
     def get_cache_key(self, request, view):
         if not request.user.is_authenticated:
             return None
         user = request.user
-        group_name = self.get_user_group(user)
-        return f'throttle_{group_name}_{user.id}'
+        scope = self.get_scope(request, view)
+        return f'throttle_{scope}_{user.id}'
+
+    def get_scope(self, request, view):
+        return getattr(view, 'throttle_scope', None) or self.get_user_group(request.user)
 
     def get_user_group(self, user):
         if user.is_superuser:
             return 'super_user'
-        elif user.groups.filter(name='Manager').exists():
+        elif roles.is_manager(user):
             return 'manager'
-        elif user.groups.filter(name='DeliveryCrew').exists():
+        elif roles.is_delivery_crew(user):
             return 'delivery_crew'
         return 'default'
 
@@ -39,10 +66,18 @@ class GroupBasedThrottle(BaseThrottle):
         except ValueError:
             return None, None
 
-    def get_rate(self, request):
-        group_name = self.get_user_group(request.user)
+    def parse_algorithm(self, rate):
+        rate, _, algorithm = (rate or '').partition(':')
+        algorithm = algorithm.strip() or self.default_algorithm
+        if algorithm not in self.algorithms:
+            raise ImproperlyConfigured(f'Unknown throttle algorithm: {algorithm}')
+        return rate.strip(), algorithm
+
+    def get_rate(self, request, view=None):
+        scope = self.get_scope(request, view)
         rates = getattr(settings, 'REST_FRAMEWORK', {}).get('DEFAULT_THROTTLE_RATES', {})
-        rate = rates.get(group_name, rates.get('default', '3/min'))
+        rate = rates.get(scope, rates.get('default', '3/min'))
+        rate, self.algorithm = self.parse_algorithm(rate)
         return self.parse_rate(rate)
 
     def allow_request(self, request, view):
@@ -51,25 +86,89 @@ class GroupBasedThrottle(BaseThrottle):
             return True  # Allow requests for unauthenticated users or no key
 
         # Fetch rate limit
-        self.num_requests, self.duration = self.get_rate(request)
+        self.num_requests, self.duration = self.get_rate(request, view)
         if not self.num_requests or not self.duration:
             return True  # No throttling if rate or duration is undefined
 
-        self.history = self.cache.get(key, [])
+        with span('throttle'), self.store.lock(key):
+            retry_after = getattr(self, self.algorithm)(key)
+        if retry_after is not None:
+            # User has hit the rate limit
+            self.throttle_failure(retry_after)
+        return True
+
+    def sliding_log(self, key):
+        self.history = self.store.get(key, [])
 
         # Clean up history to only include requests within the current window
         window_start = now() - timedelta(seconds=self.duration)
         self.history = [timestamp for timestamp in self.history if timestamp > window_start]
 
         if len(self.history) >= self.num_requests:
-            # User has hit the rate limit
-            retry_after = (self.history[0] + timedelta(seconds=self.duration) - now()).total_seconds()
-            self.throttle_failure(retry_after)
+            return (self.history[0] + timedelta(seconds=self.duration) - now()).total_seconds()
 
         # Add the current request to the history and save it back
         self.history.append(now())
-        self.cache.set(key, self.history, timeout=self.duration)
-        return True
+        self.store.set(key, self.history, self.duration)
+        return None
+
+    def fixed_window(self, key):
+        timestamp = time.time()
+        window = int(timestamp // self.duration)
+        window_key = f'{key}_fixed_{window}'
+
+        self.store.add(window_key, 0, self.duration)
+        try:
+            count = self.store.incr(window_key)
+        except ValueError:
+            # The counter expired between add() and incr()
+            self.store.set(window_key, 1, self.duration)
+            count = 1
+
+        if count > self.num_requests:
+            return (window + 1) * self.duration - timestamp
+        return None
+
+    def sliding_window(self, key):
+        timestamp = time.time()
+        window = int(timestamp // self.duration)
+        current_key = f'{key}_sliding_{window}'
+        previous_key = f'{key}_sliding_{window - 1}'
+
+        counts = self.store.get_many([current_key, previous_key])
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+
+        # Weight the previous window by how much of it still overlaps the sliding window
+        elapsed = timestamp - window * self.duration
+        overlap = 1 - elapsed / self.duration
+        if previous * overlap + current >= self.num_requests:
+            if current >= self.num_requests or not previous:
+                return self.duration - elapsed
+            return self.duration * (1 - (self.num_requests - current) / previous) - elapsed
+
+        # Keep each counter for two windows, so it can serve as the previous window
+        self.store.add(current_key, 0, self.duration * 2)
+        try:
+            self.store.incr(current_key)
+        except ValueError:
+            self.store.set(current_key, 1, self.duration * 2)
+        return None
+
+    def gcra(self, key):
+        timestamp = time.time()
+        interval = self.duration / self.num_requests
+        gcra_key = f'{key}_gcra'
+
+        # Theoretical arrival time: when the bucket will be empty again
+        tat = max(self.store.get(gcra_key, timestamp), timestamp)
+        new_tat = tat + interval
+        allow_at = new_tat - self.duration
+        if timestamp < allow_at:
+            return allow_at - timestamp
+
+        self.store.set(gcra_key, new_tat, math.ceil(new_tat - timestamp))
+        return None
 
     def throttle_failure(self, retry_after):
         raise Throttled(detail=f'Request limit exceeded. Try again in {int(retry_after)} seconds.')
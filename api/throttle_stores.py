@@ -0,0 +1,140 @@
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class CacheThrottleStore:
+    """
+    Keeps throttle state in the Django cache. The lock only serializes threads of the
+    current process, so limits are exact across workers only if they share one process.
+    Keys are spread over `lock_count` locks, so checks for different users rarely wait
+    on each other.
+    """
+    lock_count = 64
+
+    def __init__(self, cache=cache):
+        self.cache = cache
+        self.locks = [threading.Lock() for _ in range(self.lock_count)]
+
+    @contextmanager
+    def lock(self, key):
+        with self.locks[hash(key) % self.lock_count]:
+            yield
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout=timeout)
+
+    def add(self, key, value, timeout):
+        return self.cache.add(key, value, timeout=timeout)
+
+    def incr(self, key):
+        return self.cache.incr(key)
+
+
+class SQLiteThrottleStore:
+    """
+    Keeps throttle state in a SQLite file shared by every worker process. Each check
+    runs inside a BEGIN IMMEDIATE transaction, so the read-modify-write of a throttle
+    algorithm is atomic across processes and threads.
+    """
+    cleanup_probability = 0.01
+
+    def __init__(self, path, timeout=5):
+        self.path = str(path)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)'
+            )
+            self.local.connection = connection
+        return connection
+
+    @contextmanager
+    def lock(self, key):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        else:
+            if random.random() < self.cleanup_probability:
+                connection.execute('DELETE FROM throttle WHERE expires < ?', (time.time(),))
+            connection.execute('COMMIT')
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, value FROM throttle WHERE key IN ({placeholders}) AND expires >= ?', (*keys, time.time())
+        )
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO throttle (key, value, expires) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value), time.time() + timeout)
+        )
+
+    def add(self, key, value, timeout):
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, timeout)
+        return True
+
+    def incr(self, key):
+        row = self.connection.execute(
+            'SELECT value, expires FROM throttle WHERE key = ? AND expires >= ?', (key, time.time())
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        value = pickle.loads(row[0]) + 1
+        self.connection.execute('UPDATE throttle SET value = ? WHERE key = ?', (pickle.dumps(value), key))
+        return value
+
+
+_store = None
+
+
+def get_throttle_store():
+    """
+    Returns the store configured by THROTTLE_STORE, created once per process.
+    """
+    global _store
+    if _store is None:
+        config = getattr(settings, 'THROTTLE_STORE', {})
+        backend = import_string(config.get('BACKEND', 'api.throttle_stores.CacheThrottleStore'))
+        _store = backend(**config.get('OPTIONS', {}))
+    return _store
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    global _store
+    if setting == 'THROTTLE_STORE':
+        _store = None
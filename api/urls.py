@@ -2,19 +2,29 @@ from django.urls import path, include
 from . import views
 
 
+app_name = 'api'
+
 urlpatterns = [
     path('categories/', views.CategoriesView.as_view(), name='categories'),
     path('categories/<int:pk>/', views.CategoriesDetailView.as_view(), name='categories-detail'),
 
     path('menu-items/', views.MenuItemsView.as_view(), name='menu-items'),
+    path('menu-items/import/', views.MenuItemImportView.as_view(), name='menu-item-import'),
     path('menu-items/<int:pk>/', views.MenuItemDetailView.as_view(), name='menu-item-detail'),
 
     path('cart/menu-items/', views.CartView.as_view(), name='cart-items'),
+    path('cart/summary/', views.CartSummaryView.as_view(), name='cart-summary'),
     path('cart/menu-items/<int:pk>/', views.CartItemDetailView.as_view(), name='cart-item-detail'),
 
     path('orders/', views.OrderView.as_view(), name='order-list-create'),
+    path('orders/export/', views.OrderExportView.as_view(), name='order-export'),
+    path('orders/batch/', views.OrderBatchUpdateView.as_view(), name='order-batch-update'),
+    path('orders/events/', views.OrderEventsView.as_view(), name='order-events'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
 
+    path('analytics/sales/', views.SalesAnalyticsView.as_view(), name='sales-analytics'),
+    path('stats/requests/', views.RequestStatsView.as_view(), name='request-stats'),
+
     path('groups/manager/users/', views.ManagerGroupListView.as_view(), name='manager-users'),
     path('groups/manager/users/<int:user_id>/', views.ManagerGroupDetailView.as_view(), name='manager-user-detail'),
 
@@ -1,17 +1,41 @@
+import csv
 from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.db.models import F, Prefetch, Sum
+from django.http import StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import NotAcceptable, ValidationError
 from rest_framework import status
 from . import models
+from . import analytics
+from . import cart
+from . import events
 from . import filters
 from . import serializers
 from . import permissions
-
-
-class CategoriesView(generics.ListCreateAPIView):
+from . import renderers
+from . import roles
+from . import fast_serializers
+from .pagination import OptionalKeysetPagination
+from .search import MenuSearchFilter
+from .caching import MenuCacheMixin
+from .fast_serializers import FieldsetQuerysetMixin, ValuesListMixin
+from .routers import ReplicaReadMixin
+from .menu_import import MenuImport, parse_menu_file
+from .request_stats import TimedViewMixin, stats
+
+
+class CategoriesView(TimedViewMixin, ReplicaReadMixin, MenuCacheMixin, ValuesListMixin, generics.ListCreateAPIView):
     queryset = models.Category.objects.all().order_by('id')
     serializer_class = serializers.CategorySerializer
+    values_serializer_class = fast_serializers.CategoryValuesSerializer
+    replica_pin_scopes = ('menu',)
 
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -21,7 +45,7 @@ class CategoriesView(generics.ListCreateAPIView):
             return [IsAuthenticated(), permissions.IsManagerOrSuperuser()]
 
 
-class CategoriesDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoriesDetailView(TimedViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = models.Category.objects.all().order_by('id')
     serializer_class = serializers.CategorySerializer
 
@@ -33,11 +57,15 @@ class CategoriesDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [IsAuthenticated(), permissions.IsManagerOrSuperuser()]
 
 
-class MenuItemsView(generics.ListCreateAPIView):
-    queryset = models.MenuItem.objects.all().order_by('id')
+class MenuItemsView(TimedViewMixin, ReplicaReadMixin, MenuCacheMixin, ValuesListMixin, generics.ListCreateAPIView):
+    queryset = models.MenuItem.objects.select_related('category').order_by('id')
     serializer_class = serializers.MenuItemSerializer
+    values_serializer_class = fast_serializers.MenuItemValuesSerializer
+    replica_pin_scopes = ('menu',)
+    pagination_class = OptionalKeysetPagination
+    filter_backends = [OrderingFilter, MenuSearchFilter, DjangoFilterBackend]
 
-    search_fields = ['title']
+    search_fields = ['title', 'category__title']
 
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -47,9 +75,10 @@ class MenuItemsView(generics.ListCreateAPIView):
             return [IsAuthenticated(), permissions.IsManagerOrSuperuser()]
 
 
-class MenuItemDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = models.MenuItem.objects.all().order_by('id')
+class MenuItemDetailView(TimedViewMixin, FieldsetQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = models.MenuItem.objects.select_related('category').order_by('id')
     serializer_class = serializers.MenuItemSerializer
+    values_serializer_class = fast_serializers.MenuItemValuesSerializer
 
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -59,16 +88,68 @@ class MenuItemDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [IsAuthenticated(), permissions.IsManagerOrSuperuser()]
 
 
-class CartView(generics.ListCreateAPIView):
+class MenuItemImportView(TimedViewMixin, generics.GenericAPIView):
+    """
+    Creates and updates menu items in bulk, from a JSON list or an uploaded CSV/JSON
+    file. With ?dry_run=true nothing is written and the changes are returned.
+    """
+    serializer_class = serializers.MenuImportSerializer
+    permission_classes = [IsAuthenticated, permissions.IsManagerOrSuperuser]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is not None:
+            format = 'csv' if upload.name.lower().endswith('.csv') else 'json'
+            try:
+                data = parse_menu_file(upload, format)
+            except (ValueError, csv.Error) as exc:
+                raise ValidationError({'file': [f'Could not read the menu file: {exc}']})
+        else:
+            data = request.data
+
+        serializer = self.get_serializer(data=data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        menu_import = MenuImport(serializer.validated_data)
+
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        if not dry_run:
+            menu_import.apply()
+        return Response(menu_import.summary(include_changes=dry_run), status=status.HTTP_200_OK)
+
+
+class CartView(TimedViewMixin, ValuesListMixin, generics.ListCreateAPIView):
     queryset = models.Cart.objects.all().order_by('id')
     serializer_class = serializers.CartSerializer
+    values_serializer_class = fast_serializers.CartValuesSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = [IsAuthenticated, permissions.IsCustomer]
+    max_bulk_items = 100
 
     def get_queryset(self):
-        return models.Cart.objects.filter(user=self.request.user).order_by('id')
+        return models.Cart.objects.select_related('menuitem').filter(user=self.request.user).order_by('id')
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        # Bulk mode: a list of {menuitem_id, quantity} is upserted in a constant number of queries
+        serializer = serializers.CartBulkSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.max_bulk_items
+        )
+        serializer.is_valid(raise_exception=True)
+        cart_items = serializer.save(user=request.user)
+        cart.invalidate_cart_summary(request.user.pk)
+        data = self.get_serializer(cart_items, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        cart.invalidate_cart_summary(self.request.user.pk)
 
     def delete(self, request, *args, **kwargs):
         deleted_count, _ = models.Cart.objects.filter(user=request.user).delete()
+        cart.invalidate_cart_summary(request.user.pk)
 
         if deleted_count > 0:
             return Response(
@@ -82,7 +163,7 @@ class CartView(generics.ListCreateAPIView):
             )
 
 
-class CartItemDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CartItemDetailView(TimedViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = models.Cart.objects.all().order_by('id')
     serializer_class = serializers.CartSerializer
     permission_classes = [IsAuthenticated, permissions.IsCustomer]
@@ -90,42 +171,84 @@ class CartItemDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return models.Cart.objects.filter(user=self.request.user).order_by('id')
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        cart.invalidate_cart_summary(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        cart.invalidate_cart_summary(self.request.user.pk)
+
+
+class CartSummaryView(TimedViewMixin, generics.GenericAPIView):
+    """
+    Line count, total quantity and subtotal of the user's cart from one aggregate
+    query, so clients need not page through the cart to add it up. With ?items=true
+    the lines are included in a compact form.
+    """
+    permission_classes = [IsAuthenticated, permissions.IsCustomer]
+
+    def get(self, request, *args, **kwargs):
+        include_items = request.query_params.get('items', '').lower() in ('1', 'true', 'yes')
+        return Response(cart.get_cart_summary(request.user, include_items))
 
-class OrderView(generics.ListCreateAPIView):
-    serializer_class = serializers.OrderSerializer
-    filterset_class = filters.OrderStatusFilter
-    permission_classes = [IsAuthenticated]
+
+class OrderQuerysetMixin:
+    """
+    Scopes orders to the requesting user's role: managers see every order, delivery
+    crew the orders assigned to them, and customers their own orders.
+    """
 
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name='Manager').exists() or user.is_superuser:
-            return models.Order.objects.all().order_by('id')
-        elif user.groups.filter(name='DeliveryCrew').exists():
-            return models.Order.objects.filter(delivery_crew=user).order_by('id')
-        return models.Order.objects.filter(user=user).order_by('id')
+        orders = models.Order.objects.select_related('user', 'delivery_crew').prefetch_related(
+            Prefetch('orderitem_set', queryset=models.OrderItem.objects.select_related('menuitem').order_by('id'))
+        )
+        if roles.is_manager(user):
+            return orders.all().order_by('id')
+        elif roles.is_delivery_crew(user):
+            return orders.filter(delivery_crew=user).order_by('id')
+        return orders.filter(user=user).order_by('id')
+
+
+class OrderView(TimedViewMixin, ReplicaReadMixin, OrderQuerysetMixin, ValuesListMixin, generics.ListCreateAPIView):
+    serializer_class = serializers.OrderSerializer
+    values_serializer_class = fast_serializers.OrderValuesSerializer
+    pagination_class = OptionalKeysetPagination
+    filterset_class = filters.OrderStatusFilter
+    permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
         user = self.request.user
-        if not user.groups.exists():
-            cart_items = models.Cart.objects.filter(user=self.request.user).order_by('id')
-            order = serializer.save(user=self.request.user)
-            total_price = 0
-
-            for item in cart_items:
-                price = item.menuitem.price * item.quantity
-                models.OrderItem.objects.create(
-                    order=order,
-                    menuitem=item.menuitem,
-                    quantity=item.quantity,
-                    unit_price=item.unit_price,
-                    price = item.menuitem.price * item.quantity
+        if roles.is_customer(user):
+            with transaction.atomic():
+                cart_items = list(
+                    models.Cart.objects.select_for_update().select_related('menuitem').filter(user=user).order_by('id')
                 )
-                total_price += price
-
-            order.total = total_price
-            order.save()
-
-            cart_items.delete()
+                if not cart_items:
+                    raise ValidationError({'detail': 'Cart is empty.'})
+
+                order_items = [
+                    models.OrderItem(
+                        menuitem=item.menuitem,
+                        quantity=item.quantity,
+                        unit_price=item.unit_price,
+                        price=item.menuitem.price * item.quantity
+                    )
+                    for item in cart_items
+                ]
+                total_price = sum(order_item.price for order_item in order_items)
+
+                order = serializer.save(user=user, total=total_price)
+                for order_item in order_items:
+                    order_item.order = order
+                models.OrderItem.objects.bulk_create(order_items)
+                analytics.record_order(order, order_items)
+                # Serialize the response from the created items, which hold their menu items
+                serializer.context['order_items'] = {order.pk: order_items}
+
+                models.Cart.objects.filter(user=user).delete()
+                transaction.on_commit(lambda: cart.invalidate_cart_summary(user.pk))
 
             return order
 
@@ -140,17 +263,70 @@ class OrderView(generics.ListCreateAPIView):
         return super().create(request, *args, **kwargs)
 
 
-class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
+class OrderExportView(TimedViewMixin, OrderQuerysetMixin, generics.ListAPIView):
+    """
+    Streams every order visible to the user, with its items, as CSV (one row per
+    order item, or one row for an order without items) or NDJSON (one order per
+    line). Rows are read in chunks, so memory use does not depend on the number of
+    orders. Under ASGI the export is streamed by async_views.OrderExportView.
+    """
+    serializer_class = serializers.OrderSerializer
+    filterset_class = filters.OrderStatusFilter
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [renderers.CSVRenderer, renderers.NDJSONRenderer]
+    pagination_class = None
+
+    csv_header = [
+        'order_id', 'user', 'delivery_crew', 'status', 'total', 'date',
+        'order_item_id', 'menuitem', 'quantity', 'unit_price', 'price',
+    ]
+    chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        orders = self.filter_queryset(self.get_queryset()).iterator(chunk_size=self.chunk_size)
+        return self.get_streaming_response(self.get_rows(orders))
+
+    def get_streaming_response(self, rows):
+        renderer = self.request.accepted_renderer
+        response = StreamingHttpResponse(rows, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="orders.{renderer.format}"'
+        return response
+
+    def get_rows(self, orders):
+        yield from self.get_header_rows()
+        yield from self.get_order_rows(orders)
+
+    def get_header_rows(self):
+        if self.request.accepted_renderer.format == renderers.CSVRenderer.format:
+            return [csv.writer(renderers.Echo()).writerow(self.csv_header)]
+        return []
+
+    def get_order_rows(self, orders):
+        if self.request.accepted_renderer.format == renderers.NDJSONRenderer.format:
+            return self.get_ndjson_rows(orders)
+        return self.get_csv_rows(orders)
+
+    def get_csv_rows(self, orders):
+        writer = csv.writer(renderers.Echo())
+        for order in orders:
+            columns = [order.id, order.user, order.delivery_crew or '', order.status, order.total, order.date]
+            items = order.orderitem_set.all()
+            for item in items:
+                yield writer.writerow(columns + [item.id, item.menuitem, item.quantity, item.unit_price, item.price])
+            if not items:
+                yield writer.writerow(columns + [''] * 5)
+
+    def get_ndjson_rows(self, orders):
+        # One serializer for every order, so its fields are only built once
+        serializer = self.get_serializer()
+        for order in orders:
+            yield renderers.NDJSONRenderer.dumps(serializer.to_representation(order))
+
+
+class OrderDetailView(TimedViewMixin, ReplicaReadMixin, FieldsetQuerysetMixin, OrderQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = models.Order.objects.all().order_by('id')
     serializer_class = serializers.OrderSerializer
-
-    def get_queryset(self):
-        user = self.request.user
-        if user.groups.filter(name='Manager').exists() or user.is_superuser:
-            return models.Order.objects.all().order_by('id')
-        elif user.groups.filter(name='DeliveryCrew').exists():
-            return models.Order.objects.filter(delivery_crew=user).order_by('id')
-        return models.Order.objects.filter(user=user).order_by('id')
+    values_serializer_class = fast_serializers.OrderValuesSerializer
 
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -160,8 +336,172 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
         else:
             return [IsAuthenticated(), permissions.IsNotCustomer()]
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Read the stored values under a row lock, so concurrent updates are counted once
+            old_delivery_crew_id, old_status = models.Order.objects.select_for_update().values_list(
+                'delivery_crew_id', 'status'
+            ).get(pk=serializer.instance.pk)
+            order = serializer.save()
+            analytics.record_order_update(order, old_delivery_crew_id, old_status)
+            transaction.on_commit(lambda: events.publish_order_update(order, old_delivery_crew_id, old_status))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            analytics.remove_order(instance)
+            instance.delete()
+
+
+class OrderBatchUpdateView(TimedViewMixin, ReplicaReadMixin, OrderQuerysetMixin, generics.GenericAPIView):
+    """
+    Sets the status and/or delivery crew of many orders at once, for the orders the
+    user could update one by one through OrderDetailView. The orders are checked and
+    locked with one query and changed with one UPDATE; the response has a result per
+    id instead of the serialized orders.
+    """
+    serializer_class = serializers.OrderBatchUpdateSerializer
+    permission_classes = [IsAuthenticated, permissions.IsNotCustomer]
+
+    def patch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        changes = {}
+        if 'status' in serializer.validated_data:
+            changes['status'] = serializer.validated_data['status']
+        if 'delivery_crew' in serializer.validated_data:
+            delivery_crew = serializer.validated_data['delivery_crew']
+            changes['delivery_crew_id'] = delivery_crew.pk if delivery_crew is not None else None
+
+        with transaction.atomic():
+            # Orders outside the user's scope are reported as not found, like in OrderDetailView
+            found = {
+                order_id: (delivery_crew_id, order_status, date)
+                for order_id, delivery_crew_id, order_status, date in self.get_queryset().select_for_update().filter(
+                    id__in=ids
+                ).values_list('id', 'delivery_crew_id', 'status', 'date')
+            }
+            updates = []
+            for order_id, (old_delivery_crew_id, old_status, date) in found.items():
+                order = models.Order(
+                    id=order_id, date=date,
+                    delivery_crew_id=changes.get('delivery_crew_id', old_delivery_crew_id),
+                    status=changes.get('status', old_status),
+                )
+                if (order.delivery_crew_id, order.status) != (old_delivery_crew_id, old_status):
+                    updates.append((order, old_delivery_crew_id, old_status))
+
+            if updates:
+                models.Order.objects.filter(id__in=[order.pk for order, _, _ in updates]).update(**changes)
+                analytics.record_order_updates(updates)
+                transaction.on_commit(lambda: self.publish(updates))
+
+        updated = {order.pk for order, _, _ in updates}
+        results = [
+            {'id': order_id, 'result': 'updated' if order_id in updated else 'unchanged' if order_id in found else 'not_found'}
+            for order_id in ids
+        ]
+        return Response({'updated': len(updated), 'results': results})
+
+    def publish(self, updates):
+        # One transaction for the whole batch, with backends that store the events
+        with transaction.atomic():
+            for order, old_delivery_crew_id, old_status in updates:
+                events.publish_order_update(order, old_delivery_crew_id, old_status)
+
+
+class OrderEventsView(TimedViewMixin, generics.GenericAPIView):
+    """
+    Delivery crew events: orders assigned to or taken from the user, and status changes
+    of their orders. Returns the events after the `after` event id (or the Last-Event-ID
+    header) right away, since waiting would hold a worker thread. Under ASGI the async
+    view long-polls for up to `wait` seconds, or serves the events as a Server-Sent
+    Events stream; see async_views.OrderEventsView.
+    """
+    serializer_class = serializers.OrderEventsQuerySerializer
+    permission_classes = [IsAuthenticated, permissions.IsDeliveryCrew]
+    throttle_scope = 'events'
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, renderers.EventStreamRenderer]
+
+    def get_query(self):
+        data = self.request.query_params.copy()
+        if 'after' not in data and 'Last-Event-ID' in self.request.headers:
+            data['after'] = self.request.headers['Last-Event-ID']
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['wait'], serializer.validated_data.get('after')
+
+    def get_response(self, messages, after):
+        last_event_id = messages[-1]['id'] if messages else after
+        return Response({
+            'events': [events.serialize_event(message) for message in messages],
+            'last_event_id': last_event_id,
+        })
+
+    def get(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == renderers.EventStreamRenderer.format:
+            # A stream would hold a worker thread for as long as it is open
+            raise NotAcceptable('Event streams are only served under ASGI.')
+
+        # Like streams, long-polls are left to ASGI: `wait` is ignored here
+        _, after = self.get_query()
+        with events.Subscription(request.user.pk, after) as subscription:
+            messages = subscription.wait(0)
+        return self.get_response(messages, after)
+
+
+class SalesAnalyticsView(TimedViewMixin, generics.GenericAPIView):
+    """
+    Revenue per day, top menu items and deliveries per crew member over a date range.
+    Reads only the daily summary tables maintained by the analytics module, so the
+    cost grows with the number of days and not with the number of orders.
+    """
+    serializer_class = serializers.SalesReportQuerySerializer
+    permission_classes = [IsAuthenticated, permissions.IsManagerOrSuperuser]
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start, end, top = (serializer.validated_data[key] for key in ('start', 'end', 'top'))
+        dates = {'date__gte': start, 'date__lte': end}
+
+        daily_revenue = models.DailySales.objects.filter(**dates).order_by('date').values('date', 'orders', 'revenue')
+        top_menu_items = models.DailyMenuItemSales.objects.filter(**dates).values(
+            'menuitem_id', title=F('menuitem__title')
+        ).annotate(quantity=Sum('quantity'), revenue=Sum('revenue')).filter(quantity__gt=0).order_by(
+            '-revenue', 'menuitem_id'
+        )[:top]
+        deliveries = models.DailyDeliveries.objects.filter(**dates).values(
+            'delivery_crew_id', username=F('delivery_crew__username')
+        ).annotate(delivered=Sum('delivered')).filter(delivered__gt=0).order_by('-delivered', 'delivery_crew_id')
+
+        return Response({
+            'start': start,
+            'end': end,
+            'daily_revenue': serializers.DailyRevenueSerializer(daily_revenue, many=True).data,
+            'top_menu_items': serializers.MenuItemSalesSerializer(top_menu_items, many=True).data,
+            'deliveries_per_crew': serializers.CrewDeliveriesSerializer(deliveries, many=True).data,
+        })
+
+
+class RequestStatsView(TimedViewMixin, generics.GenericAPIView):
+    """
+    Rolling histograms of request time, query count and time, and the time spent in
+    authentication, throttling, permission checks, role lookups and serialization,
+    per URL name of the API. The figures come from the worker process that serves
+    the request.
+    """
+    permission_classes = [IsAuthenticated, permissions.IsManagerOrSuperuser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'window': stats.get_window(),
+            'interval': stats.get_interval(),
+            'url_names': stats.snapshot(),
+        })
+
 
-class ManagerGroupListView(generics.ListCreateAPIView):
+class ManagerGroupListView(TimedViewMixin, generics.ListCreateAPIView):
     serializer_class = serializers.UserSerializer
     permission_classes = [IsAuthenticated, permissions.IsManagerOrSuperuser]
 
@@ -174,7 +514,7 @@ class ManagerGroupListView(generics.ListCreateAPIView):
             user = User.objects.get(username=username)
             group, _ = Group.objects.get_or_create(name='Manager')
 
-            if user.groups.filter(name='Manager').exists():
+            if roles.MANAGER in roles.get_group_names(user):
                 return Response({'detail': f'User {user.username} is already in Manager group.'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
@@ -190,7 +530,7 @@ class ManagerGroupListView(generics.ListCreateAPIView):
                             status=status.HTTP_404_NOT_FOUND)
 
 
-class ManagerGroupDetailView(generics.DestroyAPIView):
+class ManagerGroupDetailView(TimedViewMixin, generics.DestroyAPIView):
     permission_classes = [IsAuthenticated, permissions.IsManagerOrSuperuser]
 
     def destroy(self, request, *args, **kwargs):
@@ -199,7 +539,7 @@ class ManagerGroupDetailView(generics.DestroyAPIView):
             user = User.objects.get(id=user_id)
             group = Group.objects.get(name='Manager')
 
-            if not user.groups.filter(name='Manager').exists():
+            if roles.MANAGER not in roles.get_group_names(user):
                 return Response({'detail': f'User {user.username} not in Manager group.'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
@@ -214,7 +554,7 @@ class ManagerGroupDetailView(generics.DestroyAPIView):
                             status=status.HTTP_404_NOT_FOUND)
 
 
-class DeliveryCrewGroupListView(generics.ListCreateAPIView):
+class DeliveryCrewGroupListView(TimedViewMixin, generics.ListCreateAPIView):
     serializer_class = serializers.UserSerializer
     permission_classes = [IsAuthenticated, permissions.IsManagerOrSuperuser]
 
@@ -227,7 +567,7 @@ class DeliveryCrewGroupListView(generics.ListCreateAPIView):
             user = User.objects.get(username=username)
             group, _ = Group.objects.get_or_create(name='DeliveryCrew')
 
-            if user.groups.filter(name='DeliveryCrew').exists():
+            if roles.DELIVERY_CREW in roles.get_group_names(user):
                 return Response({'detail': f'User {user.username} is already in Delivery Crew group.'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
@@ -243,7 +583,7 @@ class DeliveryCrewGroupListView(generics.ListCreateAPIView):
                             status=status.HTTP_404_NOT_FOUND)
 
 
-class DeliveryCrewGroupDetailView(generics.DestroyAPIView):
+class DeliveryCrewGroupDetailView(TimedViewMixin, generics.DestroyAPIView):
     permission_classes = [IsAuthenticated, permissions.IsManagerOrSuperuser]
 
     def destroy(self, request, *args, **kwargs):
@@ -252,7 +592,7 @@ class DeliveryCrewGroupDetailView(generics.DestroyAPIView):
             user = User.objects.get(id=user_id)
             group = Group.objects.get(name='DeliveryCrew')
 
-            if not user.groups.filter(name='DeliveryCrew').exists():
+            if roles.DELIVERY_CREW not in roles.get_group_names(user):
                 return Response({'detail': f'User {user.username} not in Delivery Crew group.'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
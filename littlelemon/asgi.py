@@ -9,8 +9,24 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'littlelemon.settings')
 
+
+class AsyncURLconfRequest(ASGIRequest):
+    # Resolve ASGI requests against the URLconf with the async read views
+    urlconf = 'littlelemon.asgi_urls'
+
+
+class AsyncURLconfASGIHandler(ASGIHandler):
+    request_class = AsyncURLconfRequest
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return AsyncURLconfASGIHandler()
+
+
 application = get_asgi_application()
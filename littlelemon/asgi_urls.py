@@ -0,0 +1,13 @@
+"""
+URL configuration used when the project is served under ASGI.
+
+It routes the API through api.asgi_urls, which serves the read-heavy endpoints
+with async views, and is otherwise identical to littlelemon.urls.
+"""
+from django.urls import path, include
+from . import urls
+
+
+urlpatterns = [
+    path('api/', include('api.asgi_urls')),
+] + urls.urlpatterns
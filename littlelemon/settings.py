@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,6 +93,46 @@ DATABASES = {
     }
 }
 
+# SQLite tuned for concurrent requests: WAL lets readers run while an order is written,
+# connections are kept open (and health checked) between requests, and transactions take
+# the write lock up front instead of failing with "database is locked" when upgrading.
+# PRAGMAS are applied to every new connection by api.signals.configure_sqlite_connection.
+# Enable it with DATABASE_PROFILE=production.
+SQLITE_PRODUCTION_PROFILE = {
+    'ENGINE': 'api.backends.sqlite3',
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'PRAGMAS': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # ms
+        'cache_size': -64000,  # KiB
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+if os.environ.get('DATABASE_PROFILE') == 'production':
+    DATABASES['default'].update(SQLITE_PRODUCTION_PROFILE)
+
+# Read replica: GET requests of the menu, category and order views are served from it
+# (see api.routers). Set DATABASE_REPLICA to the path of a SQLite copy of the primary,
+# which `manage.py sync_replica` keeps up to date when testing locally.
+if os.environ.get('DATABASE_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+REPLICA_DATABASE = 'replica'
+
+# How long reads stay on the primary after a user's write, or after a menu change;
+# should exceed the replication lag
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -139,7 +181,7 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         # 'rest_framework.authentication.SessionAuthentication', # Only for Development Environment (Testing)
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -155,11 +197,14 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_CLASSES': [
         'api.throttle.GroupBasedThrottle',
     ],
+    # Append ':fixed_window', ':sliding_window' or ':gcra' to a rate to change the throttle algorithm
     'DEFAULT_THROTTLE_RATES': {
         'super_user': '15/min',
         'manager': '10/min',
         'delivery_crew': '5/min',
         'default': '3/min',
+        # Views with this throttle_scope: delivery crew apps poll /api/orders/events/
+        'events': '120/min',
     },
 }
 
@@ -172,3 +217,48 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# LocMemCache is local to each process. When running several worker processes, set
+# REDIS_URL (e.g. redis://127.0.0.1:6379/0, needs the redis package) so that cache
+# invalidation reaches all of them; see api.checks
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+MENU_CACHE_TIMEOUT = 60 * 60
+
+ROLE_CACHE_TIMEOUT = 5 * 60
+
+# Cart summaries are cached this long, if the cache is shared between processes
+CART_SUMMARY_CACHE_TIMEOUT = 5 * 60
+
+# Tokens, with their user's id, flags and group names, are cached this long by
+# CachedTokenAuthentication, if the cache is shared between processes
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+
+# Use 'api.throttle_stores.SQLiteThrottleStore' with {'path': BASE_DIR / 'throttle.sqlite3'}
+# to share throttle state between worker processes
+THROTTLE_STORE = {
+    'BACKEND': 'api.throttle_stores.CacheThrottleStore',
+    'OPTIONS': {},
+}
+
+# Pub/sub backend for the delivery crew events of /api/orders/events/. DatabasePubSub passes
+# events between processes through a table that each process polls every poll_interval
+# seconds; 'api.events.InMemoryPubSub' only reaches connections of the process that saved
+# the order. BACKLOG events per user are kept for clients that reconnect
+DELIVERY_EVENTS = {
+    'BACKEND': 'api.events.DatabasePubSub',
+    'OPTIONS': {'poll_interval': 1.0, 'retention': 60 * 60},
+    'BACKLOG': 50,
+}
+
+# Request metrics are kept per URL name for REQUEST_STATS_WINDOW seconds, in intervals
+# of REQUEST_STATS_INTERVAL seconds; see /api/stats/requests/
+REQUEST_STATS_WINDOW = 60 * 60
+REQUEST_STATS_INTERVAL = 60
+
+# Add a Server-Timing header with the request metrics to every response
+SERVER_TIMING = False